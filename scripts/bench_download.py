@@ -0,0 +1,265 @@
+"""
+下载流程基准测试
+在本地多下载源模拟器上运行完整的下载流程 (测速 benchmark_download_sources + download_release_files),
+统计吞吐量、首字节时间、失败重试次数与下载源选择质量, 并与保存的基线比对, 出现性能退化时以非 0 退出
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 在导入 config 之前将临时目录与管理工具数据目录指向沙盒, 避免读写真实的评分表与缓存
+SANDBOX = Path(tempfile.mkdtemp(prefix="aura-bench-"))
+for name in ("TMPDIR", "TEMP", "TMP", "LOCALAPPDATA"):
+    os.environ[name] = str(SANDBOX)
+tempfile.tempdir = None
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from loguru import logger as log  # noqa: E402
+
+from config import config  # noqa: E402
+from utils import downloadEngine, downloadHedging, fileDownloader, mirrorScoreboard  # noqa: E402
+from mirror_simulator import MirrorProfile, MirrorSimulator, ideal_order  # noqa: E402
+
+
+BASELINE_PATH = Path(__file__).parent / "bench_download_baseline.json"
+TAG = "vBench"
+MB = 1024 * 1024
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    profiles: List[MirrorProfile]
+
+
+def build_scenarios() -> List[Scenario]:
+    return [
+        Scenario(
+            "healthy",
+            "4 个带宽不同的正常下载源",
+            [
+                MirrorProfile("fast", latency=0.02, bandwidth=8 * MB),
+                MirrorProfile("medium", latency=0.05, bandwidth=4 * MB),
+                MirrorProfile("slow", latency=0.10, bandwidth=2 * MB),
+                MirrorProfile("crawl", latency=0.20, bandwidth=1 * MB),
+            ],
+        ),
+        Scenario(
+            "stall",
+            "最快的下载源在传输中途停顿",
+            [
+                MirrorProfile("fast-stall", latency=0.02, bandwidth=8 * MB, stall_after=512 * 1024),
+                MirrorProfile("medium", latency=0.05, bandwidth=4 * MB),
+                MirrorProfile("slow", latency=0.10, bandwidth=2 * MB),
+            ],
+        ),
+        Scenario(
+            "reset",
+            "下载源在传输中途重置连接",
+            [
+                MirrorProfile("fast-reset", latency=0.02, bandwidth=8 * MB, reset_after=512 * 1024, resets=2),
+                MirrorProfile("medium-reset", latency=0.05, bandwidth=4 * MB, reset_after=1 * MB),
+                MirrorProfile("slow", latency=0.10, bandwidth=2 * MB),
+            ],
+        ),
+        Scenario(
+            "degraded",
+            "部分下载源返回 404 或不支持 Range",
+            [
+                MirrorProfile("missing-1", latency=0.02, missing=True),
+                MirrorProfile("no-range", latency=0.05, bandwidth=6 * MB, range_support=False),
+                MirrorProfile("slow", latency=0.10, bandwidth=2 * MB),
+                MirrorProfile("crawl", latency=0.20, bandwidth=1 * MB),
+                MirrorProfile("missing-2", latency=0.02, missing=True),
+            ],
+        ),
+    ]
+
+
+def selection_quality(ranked: List[str], ideal: List[str]) -> float:
+    """排序与理想排序一致的下载源对所占的比例 (1.0 为完全一致)"""
+    position = {name: i for i, name in enumerate(ranked)}
+    pairs = concordant = 0
+    for i, better in enumerate(ideal):
+        for worse in ideal[i + 1 :]:
+            pairs += 1
+            concordant += position[better] < position[worse]
+    return concordant / pairs if pairs else 1.0
+
+
+def reset_state():
+    """每个场景从空的评分表、对冲统计与临时文件夹开始"""
+    for path in (config.TEMP_INSTALL_DIR, config.INSTALLER_DATA_DIR):
+        shutil.rmtree(path, ignore_errors=True)
+    mirrorScoreboard._scoreboard = None
+    downloadHedging._metrics = None
+
+
+def run_scenario(scenario: Scenario, files: Dict[str, bytes]) -> Dict:
+    reset_state()
+    with MirrorSimulator(TAG, files, scenario.profiles) as simulator:
+        names = {url: simulator.profile_of(url).name for url in simulator.base_urls}
+        config.BASE_DOWNLOAD_URLS[:] = simulator.base_urls
+        config.GITHUB_API_URL = simulator.api_url
+
+        probe_start = time.perf_counter()
+        ranked = downloadEngine.get_engine().run(fileDownloader.benchmark_download_sources(TAG))
+        probe_seconds = time.perf_counter() - probe_start
+        ideal = [
+            name
+            for name, _ in ideal_order(scenario.profiles, config.MIRROR_SCORE_REFERENCE_BYTES)
+        ]
+        ranked_names = [names[url] for url in ranked]
+        before = simulator.stats()
+
+        start = time.perf_counter()
+        core_path, aura_path = fileDownloader.download_release_files(TAG, use_cache=False)
+        seconds = time.perf_counter() - start
+        first_byte = simulator.first_byte_after(start)
+        after = simulator.stats()
+
+    ok = bool(core_path and aura_path)
+    for name, path in ((config.CORE_FILENAME, core_path), (config.AURA_FILENAME, aura_path)):
+        if path and hashlib.sha256(Path(path).read_bytes()).digest() != hashlib.sha256(files[name]).digest():
+            ok = False
+
+    total_bytes = sum(len(data) for data in files.values())
+    return {
+        "ok": ok,
+        "download_seconds": round(seconds, 3),
+        "throughput_mbps": round(total_bytes / MB / seconds, 2),
+        "ttfb_seconds": round(first_byte - start, 3) if first_byte else None,
+        "probe_seconds": round(probe_seconds, 3),
+        "requests": sum(after[n].requests - before[n].requests for n in after),
+        "retries": sum(after[n].failed - before[n].failed for n in after),
+        "wasted_mb": round(
+            (sum(after[n].bytes_sent - before[n].bytes_sent for n in after) - total_bytes) / MB, 2
+        ),
+        "selection_quality": round(selection_quality(ranked_names, ideal), 3),
+        "best_mirror_first": ranked_names[0] == ideal[0],
+        "ranking": ranked_names,
+    }
+
+
+def find_regressions(result: Dict, baseline: Optional[Dict], tolerance: float) -> List[str]:
+    problems = []
+    if not result["ok"]:
+        problems.append("下载失败或内容不一致")
+    if not baseline:
+        return problems
+    # 时间类指标允许 tolerance 的相对波动, 外加少量绝对余量以容忍计时抖动
+    for key, slack in (("download_seconds", 0.5), ("ttfb_seconds", 0.2)):
+        if result[key] is None or baseline.get(key) is None:
+            continue
+        limit = baseline[key] * (1 + tolerance) + slack
+        if result[key] > limit:
+            problems.append(f"{key} {result[key]} > {limit:.3f} (基线 {baseline[key]})")
+    if result["retries"] > baseline["retries"] + 2:
+        problems.append(f"retries {result['retries']} > {baseline['retries']} + 2")
+    if result["selection_quality"] < baseline["selection_quality"] - 0.15:
+        problems.append(
+            f"selection_quality {result['selection_quality']} < {baseline['selection_quality']} - 0.15"
+        )
+    return problems
+
+
+def print_result(scenario: Scenario, result: Dict, problems: List[str]):
+    status = "✅" if not problems else "❌"
+    print(f"{status} {scenario.name}: {scenario.description}")
+    print(
+        f"    耗时 {result['download_seconds']:.2f}s  吞吐量 {result['throughput_mbps']:.2f} MB/s  "
+        f"首字节 {result['ttfb_seconds']}s  测速 {result['probe_seconds']:.2f}s"
+    )
+    print(
+        f"    请求 {result['requests']}  失败重试 {result['retries']}  额外流量 {result['wasted_mb']} MB  "
+        f"选择质量 {result['selection_quality']:.2f}  "
+        f"首选最优: {'是' if result['best_mirror_first'] else '否'}"
+    )
+    print(f"    排序: {' > '.join(result['ranking'])}")
+    for problem in problems:
+        print(f"    ⚠️ {problem}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载流程基准测试 (本地模拟下载源)")
+    parser.add_argument("--core-size", help="core.zip 大小 (MB)", type=float, default=2)
+    parser.add_argument("--aura-size", help="aura.zip 大小 (MB)", type=float, default=8)
+    parser.add_argument("--scenario", help="只运行指定场景", action="append")
+    parser.add_argument("--tolerance", help="时间类指标允许的相对退化", type=float, default=0.3)
+    parser.add_argument("--baseline", help="基线文件路径", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", help="以本次结果更新基线", action="store_true")
+    parser.add_argument("--verbose", help="输出下载日志", action="store_true")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        log.remove()
+        log.add(sys.stderr, level="CRITICAL")
+
+    # 只测量模拟下载源, 不受局域网内其他安装程序影响
+    config.PEER_CACHE_ENABLED = False
+    files = {
+        config.CORE_FILENAME: os.urandom(int(args.core_size * MB)),
+        config.AURA_FILENAME: os.urandom(int(args.aura_size * MB)),
+    }
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline and baseline.get("sizes") != [args.core_size, args.aura_size]:
+        print("⚠️ 文件大小与基线不同, 不进行退化比对")
+        baseline = {}
+
+    scenarios = [
+        s for s in build_scenarios() if not args.scenario or s.name in args.scenario
+    ]
+    results = {}
+    failed = False
+    try:
+        for scenario in scenarios:
+            result = run_scenario(scenario, files)
+            problems = find_regressions(
+                result,
+                None if args.update_baseline else baseline.get("scenarios", {}).get(scenario.name),
+                args.tolerance,
+            )
+            print_result(scenario, result, problems)
+            failed |= bool(problems)
+            results[scenario.name] = result
+    finally:
+        shutil.rmtree(SANDBOX, ignore_errors=True)
+
+    if args.update_baseline and not failed:
+        stored = baseline.get("scenarios", {}) if baseline else {}
+        stored.update(
+            {
+                name: {key: value for key, value in result.items() if key not in ("ok", "ranking")}
+                for name, result in results.items()
+            }
+        )
+        args.baseline.write_text(
+            json.dumps(
+                {"sizes": [args.core_size, args.aura_size], "scenarios": stored},
+                ensure_ascii=False,
+                indent=2,
+            )
+            + "\n",
+            encoding="utf-8",
+        )
+        print(f"📝 基线已更新: {args.baseline}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
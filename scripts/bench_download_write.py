@@ -0,0 +1,88 @@
+"""
+下载写入路径基准测试
+对比旧的 8 KB 直接写入循环与 DownloadWriter (预分配 + 自适应缓冲区) 的写盘耗时与写入次数
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Iterator
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config.config import DOWNLOAD_READ_CHUNK_SIZE  # noqa: E402
+from utils.downloadWriter import DownloadWriter  # noqa: E402
+
+
+def chunk_source(total_size: int, chunk_size: int) -> Iterator[bytes]:
+    """模拟网络响应, 按 chunk_size 产出数据块"""
+    block = os.urandom(chunk_size)
+    sent = 0
+    while sent < total_size:
+        size = min(chunk_size, total_size - sent)
+        yield block[:size]
+        sent += size
+
+
+def legacy_loop(path: Path, total_size: int) -> int:
+    """改动前 download_file 的写入方式: 8 KB 数据块逐个写入, 不预分配"""
+    writes = 0
+    with open(path, "wb") as f:
+        for chunk in chunk_source(total_size, 8192):
+            if chunk:
+                f.write(chunk)
+                writes += 1
+    return writes
+
+
+def writer_loop(path: Path, total_size: int) -> int:
+    async def write() -> int:
+        async with DownloadWriter(path, 0, total_size) as writer:
+            for chunk in chunk_source(total_size, DOWNLOAD_READ_CHUNK_SIZE):
+                await writer.write(chunk)
+        return writer.write_calls
+
+    return asyncio.run(write())
+
+
+def run(name: str, func: Callable[[Path, int], int], total_size: int, rounds: int):
+    timings = []
+    writes = 0
+    for _ in range(rounds):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "bench.bin"
+            start = time.perf_counter()
+            writes = func(path, total_size)
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(
+        f"{name:<16} 最佳 {best:.3f}s  {total_size / 1024 / 1024 / best:>8.1f} MB/s  "
+        f"写入次数 {writes}"
+    )
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载写入路径基准测试")
+    parser.add_argument("--size", help="测试文件大小 (MB)", type=int, default=64)
+    parser.add_argument("--rounds", help="每种方式的测试轮数", type=int, default=3)
+    args = parser.parse_args()
+
+    total_size = args.size * 1024 * 1024
+    print(f"📦 测试文件大小: {args.size} MB, 轮数: {args.rounds}")
+    legacy = run("旧循环 (8 KB)", legacy_loop, total_size, args.rounds)
+    writer = run("DownloadWriter", writer_loop, total_size, args.rounds)
+    print(f"📊 加速比: {legacy / writer:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+本地多下载源模拟器
+为每个下载源启动一个本地 HTTP 服务, 可分别配置响应延迟、带宽、Range 支持、传输中途停顿、
+连接重置与 404, 并模拟 GitHub API 返回资源文件的 SHA-256。供 bench_download.py 使用
+"""
+
+import hashlib
+import http.server
+import json
+import re
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+
+SEND_CHUNK_SIZE = 16 * 1024
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    block_on_close = False
+
+    def handle_error(self, request, client_address):
+        # 重置连接与客户端中途断开均属预期, 不输出异常
+        pass
+
+
+@dataclass
+class MirrorProfile:
+    name: str
+    latency: float = 0.02  # 每个请求的响应延迟 (秒)
+    bandwidth: float = 4 * 1024 * 1024  # 单个连接的带宽 (字节 / 秒)
+    range_support: bool = True
+    stall_after: Optional[int] = None  # 响应在发送该字节数后停顿, 每个文件只停顿一次
+    stall_seconds: float = 60.0
+    reset_after: Optional[int] = None  # 响应在发送该字节数后重置连接
+    resets: int = 1  # 每个文件最多重置的次数
+    missing: bool = False  # 所有文件均返回 404
+
+
+@dataclass
+class MirrorStats:
+    requests: int = 0
+    completed: int = 0
+    failed: int = 0  # 404、被重置或客户端中途断开的请求
+    stalls: int = 0
+    bytes_sent: int = 0
+    first_byte_times: List[float] = field(default_factory=list)  # perf_counter 时间
+
+
+class _Mirror:
+    def __init__(self, profile: MirrorProfile, files: Dict[str, bytes], stop: threading.Event):
+        self.profile = profile
+        self.files = files
+        self.stop = stop
+        self.stats = MirrorStats()
+        self.lock = threading.Lock()
+        self.stalled_files = set()
+        self.reset_counts: Dict[str, int] = {}
+        self.server = _Server(("127.0.0.1", 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/{profile.name}"
+
+    def _handler(self):
+        mirror = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                mirror.serve(self)
+
+        return Handler
+
+    def _count(self, **changes):
+        with self.lock:
+            for name, value in changes.items():
+                setattr(self.stats, name, getattr(self.stats, name) + value)
+
+    def serve(self, request: http.server.BaseHTTPRequestHandler):
+        profile = self.profile
+        self._count(requests=1)
+        self.stop.wait(profile.latency)
+
+        key = request.path.split("?")[0].split(f"/{profile.name}/", 1)[-1]
+        data = self.files.get(key)
+        if profile.missing or data is None:
+            self._count(failed=1)
+            request.send_response(404)
+            request.send_header("Content-Length", "0")
+            request.end_headers()
+            return
+
+        start, end = 0, len(data) - 1
+        range_header = request.headers.get("Range")
+        if range_header and profile.range_support:
+            m = re.match(r"bytes=(\d*)-(\d*)", range_header)
+            if m and m.group(1):
+                start = int(m.group(1))
+                end = min(int(m.group(2)), end) if m.group(2) else end
+            elif m and m.group(2):
+                start = max(len(data) - int(m.group(2)), 0)
+            if start >= len(data):
+                request.send_response(416)
+                request.send_header("Content-Range", f"bytes */{len(data)}")
+                request.send_header("Content-Length", "0")
+                request.end_headers()
+                return
+            request.send_response(206)
+            request.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        else:
+            request.send_response(200)
+        request.send_header("Content-Length", str(end - start + 1))
+        request.send_header("ETag", '"' + hashlib.md5(data).hexdigest() + '"')
+        request.end_headers()
+        self._send_body(request, key, data, start, end + 1)
+
+    def _should(self, kind: str, key: str, sent: int, remaining: int) -> bool:
+        profile = self.profile
+        with self.lock:
+            if kind == "stall":
+                if (
+                    profile.stall_after is None
+                    or sent < profile.stall_after
+                    or remaining <= 0
+                    or key in self.stalled_files
+                ):
+                    return False
+                self.stalled_files.add(key)
+                self.stats.stalls += 1
+                return True
+            if (
+                profile.reset_after is None
+                or sent < profile.reset_after
+                or remaining <= 0
+                or self.reset_counts.get(key, 0) >= profile.resets
+            ):
+                return False
+            self.reset_counts[key] = self.reset_counts.get(key, 0) + 1
+            return True
+
+    def _send_body(self, request, key: str, data: bytes, start: int, end: int):
+        profile = self.profile
+        began = time.perf_counter()
+        sent = 0
+        try:
+            while start + sent < end:
+                if self._should("reset", key, sent, end - start - sent):
+                    # SO_LINGER 为 0 时 close 会发送 RST
+                    request.connection.setsockopt(
+                        socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+                    )
+                    request.connection.close()
+                    request.close_connection = True
+                    self._count(failed=1)
+                    return
+                if self._should("stall", key, sent, end - start - sent):
+                    self.stop.wait(profile.stall_seconds)
+                    began += profile.stall_seconds
+                chunk = data[start + sent : min(start + sent + SEND_CHUNK_SIZE, end)]
+                request.wfile.write(chunk)
+                if sent == 0:
+                    with self.lock:
+                        self.stats.first_byte_times.append(time.perf_counter())
+                sent += len(chunk)
+                self._count(bytes_sent=len(chunk))
+                # 按带宽限速
+                delay = began + sent / profile.bandwidth - time.perf_counter()
+                if delay > 0 and self.stop.wait(delay):
+                    raise ConnectionAbortedError
+            self._count(completed=1)
+        except (ConnectionError, OSError):
+            request.close_connection = True
+            self._count(failed=1)
+
+
+class _GitHubApi:
+    """模拟 /releases/tags/<tag>, 返回带 digest 字段的资源列表"""
+
+    def __init__(self, tag: str, files: Dict[str, bytes]):
+        body = json.dumps(
+            {
+                "tag_name": tag,
+                "assets": [
+                    {"name": name, "digest": "sha256:" + hashlib.sha256(data).hexdigest()}
+                    for name, data in files.items()
+                ],
+            }
+        ).encode()
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                found = self.path.rstrip("/").endswith(f"/tags/{tag}")
+                self.send_response(200 if found else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body) if found else 0))
+                self.end_headers()
+                if found:
+                    self.wfile.write(body)
+
+        self.server = _Server(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/releases"
+
+
+class MirrorSimulator:
+    """
+    本地多下载源模拟器
+
+    Args:
+        tag: 版本 Tag
+        files: 文件名 -> 内容
+        profiles: 各下载源的配置
+    """
+
+    def __init__(self, tag: str, files: Dict[str, bytes], profiles: List[MirrorProfile]):
+        self._stop = threading.Event()
+        served = {f"{tag}/{name}": data for name, data in files.items()}
+        self.mirrors = [_Mirror(profile, served, self._stop) for profile in profiles]
+        self.api = _GitHubApi(tag, files)
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def base_urls(self) -> List[str]:
+        return [mirror.base_url for mirror in self.mirrors]
+
+    @property
+    def api_url(self) -> str:
+        return self.api.url
+
+    def profile_of(self, base_url: str) -> MirrorProfile:
+        return next(m.profile for m in self.mirrors if m.base_url == base_url)
+
+    def stats(self) -> Dict[str, MirrorStats]:
+        result = {}
+        for mirror in self.mirrors:
+            with mirror.lock:
+                result[mirror.profile.name] = MirrorStats(
+                    **{**mirror.stats.__dict__, "first_byte_times": list(mirror.stats.first_byte_times)}
+                )
+        return result
+
+    def first_byte_after(self, timestamp: float) -> Optional[float]:
+        """timestamp 之后第一个响应发出首字节的时间"""
+        times = [
+            t
+            for stats in self.stats().values()
+            for t in stats.first_byte_times
+            if t >= timestamp
+        ]
+        return min(times) if times else None
+
+    def start(self):
+        for server in [m.server for m in self.mirrors] + [self.api.server]:
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def close(self):
+        self._stop.set()
+        for server in [m.server for m in self.mirrors] + [self.api.server]:
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def ideal_order(profiles: List[MirrorProfile], reference_bytes: int) -> List[Tuple[str, float]]:
+    """按配置计算下载源的理想排序 (下载 reference_bytes 所需时间), 返回 (名称, 预计耗时)"""
+    def expected(profile: MirrorProfile) -> float:
+        if profile.missing:
+            return float("inf")
+        return profile.latency + reference_bytes / profile.bandwidth
+
+    return sorted(((p.name, expected(p)) for p in profiles), key=lambda item: item[1])
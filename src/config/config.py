@@ -30,6 +30,34 @@ BASE_DOWNLOAD_URLS = [
     f"https://github.com/{GITHUB_OWNER}/{GITHUB_DL_REPO}/releases/download",
 ]
 
+# 下载请求头
+DOWNLOAD_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36"
+
+# 下载进度汇报
+DOWNLOAD_PROGRESS_INTERVAL = 0.1  # 进度事件最短间隔 (秒), 即最多 10 Hz
+DOWNLOAD_SPEED_EWMA_ALPHA = 0.3
+
+# 下载写入配置
+DOWNLOAD_READ_CHUNK_SIZE = 64 * 1024  # 每次从网络读取的数据块大小
+DOWNLOAD_BUFFER_MIN_SIZE = 64 * 1024  # 写盘缓冲区初始 / 最小大小
+DOWNLOAD_BUFFER_MAX_SIZE = 8 * 1024 * 1024  # 写盘缓冲区最大大小
+DOWNLOAD_BUFFER_FILL_TARGET = 0.25  # 缓冲区填满时间短于该值 (秒) 时扩大缓冲区
+DOWNLOAD_FREE_SPACE_MARGIN = 64 * 1024 * 1024  # 下载前要求额外保留的磁盘空间
+
+# 下载连接池配置
+DOWNLOAD_POOL_LIMIT_PER_HOST = 8
+DOWNLOAD_KEEPALIVE_TIMEOUT = 30
+DOWNLOAD_READ_TIMEOUT = 60  # 单次读取的超时时间 (秒)
+
+# 分段下载配置
+SEGMENTED_DOWNLOAD_ENABLED = True
+SEGMENTED_DOWNLOAD_MIN_SIZE = 4 * 1024 * 1024  # 小于该大小的文件直接单连接下载
+SEGMENTED_DOWNLOAD_SEGMENT_SIZE = 2 * 1024 * 1024
+SEGMENTED_DOWNLOAD_MAX_MIRRORS = 4  # 同时参与分段下载的下载源数量上限
+SEGMENTED_DOWNLOAD_MAX_CONN_PER_MIRROR = 4  # 单个下载源的并发连接上限
+SEGMENTED_DOWNLOAD_MAX_SEGMENT_RETRIES = 5
+SEGMENTED_DOWNLOAD_MAX_MIRROR_FAILURES = 3  # 连续失败该次数后停用下载源
+
 # GitHub API URL
 GITHUB_API_URL = f"https://api.github.com/repos/{GITHUB_OWNER}/{GITHUB_REPO}/releases"
 
@@ -40,10 +68,99 @@ SWASS_PATH_PATTERN = r"C:\\Program Files (x86)\\Seewo\\SeewoService\\SeewoServic
 TEMP_DIR_NAME = "Aura-Install-Temp"
 TEMP_INSTALL_DIR = os.path.join(tempfile.gettempdir(), TEMP_DIR_NAME)
 
+# 未完成的下载文件及断点续传日志所在目录, 清理临时文件夹时保留
+PARTIAL_DOWNLOAD_DIR_NAME = "partial"
+PARTIAL_DOWNLOAD_DIR = os.path.join(TEMP_INSTALL_DIR, PARTIAL_DOWNLOAD_DIR_NAME)
+# 临时文件夹与安装目录不在同一磁盘时, 在安装目录旁建立的暂存目录 (见 utils/stagingArea.py)
+STAGING_DIR_NAME = ".HugoAura-Staging"
+DOWNLOAD_JOURNAL_FLUSH_BYTES = 1024 * 1024  # 每写入该大小的数据更新一次续传日志
+
 # HugoAura 数据路径
 HUGOAURA_USER_DATA_DIR = os.path.join(os.path.expanduser("~"), "Documents", "HugoAura")
 HUGOAURA_REGISTRY_KEY = r"SOFTWARE\\HugoAura"
 
+# 管理工具自身的持久化数据 (位于临时文件夹之外, 不随安装结束清理)
+INSTALLER_DATA_DIR = os.path.join(
+    os.environ.get("LOCALAPPDATA", tempfile.gettempdir()), "HugoAura-Install"
+)
+
+# 解压配置 (见 utils/parallelUnzip.py)
+EXTRACT_WORKERS = min(8, os.cpu_count() or 1)  # 解压线程数
+EXTRACT_MAX_TOTAL_BYTES = 4 * 1024 * 1024 * 1024  # 单个 ZIP 解压后的大小上限
+EXTRACT_MAX_RATIO = 200  # 单个条目的压缩比上限
+
+# ASAR 修改: 直接从原 ASAR 流式重新打包; 关闭时解包到临时目录后重新打包 (见 utils/asarPatcher.py)
+ASAR_STREAMING_REPACK = True
+ASAR_INTEGRITY_WORKERS = min(8, os.cpu_count() or 1)  # 计算 integrity 的线程数 (见 utils/asarIntegrity.py)
+
+# 增量同步: 已安装旧版本时按 aura.zip 的中央目录只解压有变化的条目, 暂存目录与安装目录在同一磁盘时改名替换 (见 utils/incrementalSync.py)
+INCREMENTAL_SYNC_ENABLED = True
+INCREMENTAL_SYNC_HASH_WORKERS = 4  # 计算已安装文件 CRC32 的线程数
+
+# 资源文件缓存
+ARTIFACT_CACHE_DIR = os.path.join(INSTALLER_DATA_DIR, "cache")
+ARTIFACT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# 修补后的 ASAR 缓存, 可设为共享的网络路径 (见 utils/patchedAsarCache.py)
+PATCHED_ASAR_CACHE_DIR = os.path.join(INSTALLER_DATA_DIR, "patched-asar")
+PATCHED_ASAR_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# 本机原始 ASAR 的 (大小, 修改时间) -> SHA-256, 文件未变化时无需重新计算
+PATCHED_ASAR_FINGERPRINTS_PATH = os.path.join(INSTALLER_DATA_DIR, "asar-fingerprints.json")
+
+# 下载源评分表
+MIRROR_SCOREBOARD_PATH = os.path.join(INSTALLER_DATA_DIR, "mirrors.json")
+MIRROR_SCORE_TTL_SECONDS = 6 * 60 * 60  # 超过该时间的统计数据需重新测速
+MIRROR_SCORE_EWMA_ALPHA = 0.3
+MIRROR_SCORE_REFERENCE_BYTES = 16 * 1024 * 1024  # 评分时按下载该大小所需时间比较
+MIRROR_PROBE_BYTES = 256 * 1024  # 测速时下载的字节数
+MIRROR_PROBE_TIMEOUT = 15
+MIRROR_QUARANTINE_SECONDS = 24 * 60 * 60  # 返回内容校验失败的下载源在该时间内不再使用
+
+# 慢速下载对冲: 单连接下载的吞吐量在一个窗口内低于下限时, 从下一个下载源并行获取剩余部分, 先完成者胜出
+DOWNLOAD_HEDGE_ENABLED = True
+DOWNLOAD_HEDGE_MIN_THROUGHPUT = 64 * 1024  # 字节 / 秒
+DOWNLOAD_HEDGE_WINDOW = 5.0  # 吞吐量统计窗口 (秒)
+DOWNLOAD_HEDGE_CHECK_INTERVAL = 0.5
+DOWNLOAD_HEDGE_METRICS_PATH = os.path.join(INSTALLER_DATA_DIR, "hedging.json")
+
+# 批量部署: 限速、随机启动延迟与共享目录中的下载名额 (见 utils/downloadCoordinator.py)
+DOWNLOAD_RATE_LIMIT = 0  # 所有下载连接的总速率上限 (字节 / 秒), 0 为不限速
+DOWNLOAD_RATE_BURST_SECONDS = 1.0  # 令牌桶容量, 以该时长的限速流量计
+DOWNLOAD_START_JITTER = 0  # 开始下载前的最大随机延迟 (秒)
+DOWNLOAD_COORDINATION_DIR = ""  # 下载名额所在的共享目录, 为空时不限制并发
+DOWNLOAD_MAX_CONCURRENT = 4  # 同时下载的机器数量上限
+DOWNLOAD_SLOT_HEARTBEAT = 15  # 刷新名额的间隔 (秒)
+DOWNLOAD_SLOT_STALE_SECONDS = 120  # 超过该时间未刷新的名额可被接管
+DOWNLOAD_SLOT_POLL_INTERVAL = 5  # 等待名额时的轮询间隔 (秒)
+DOWNLOAD_SLOT_TIMEOUT = 60 * 60  # 最长等待时间 (秒), 超时后直接下载; 0 为不限
+
+# 资源文件完整性校验: 期望摘要取自 GitHub Release 资源的 digest 字段, 或下载源上随版本发布的清单
+RELEASE_DIGEST_MANIFEST = "SHA256SUMS"
+RELEASE_DIGEST_MANIFEST_MIRRORS = 3  # 最多尝试从几个下载源获取清单
+RELEASE_DIGEST_TIMEOUT = 15
+
+# 增量升级: 资源文件缓存中有其他版本的 aura.zip 时, 只下载新版本 aura.zip 中有变化的部分 (见 utils/deltaUpgrade.py)
+DELTA_UPGRADE_ENABLED = True
+DELTA_MAX_MIRRORS = 3  # 最多尝试从几个下载源读取中央目录
+DELTA_MAX_CHANGED_RATIO = 0.5  # 需下载的部分超过完整大小的该比例时改为完整下载
+DELTA_MERGE_GAP = 64 * 1024  # 间隔小于该大小的条目合并为一次 Range 请求
+DELTA_MAX_REQUEST_BYTES = 16 * 1024 * 1024  # 合并后单次 Range 请求的大小上限
+DELTA_MAX_CONCURRENCY = 4
+DELTA_MAX_BASES = 3  # 最多比对缓存中几个旧版本的 aura.zip
+
+# 离线安装包: 不压缩的 ZIP, 包含 core.zip、aura.zip、版本目录与 SHA256SUMS 清单
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_INFO_NAME = "bundle.json"
+BUNDLE_CATALOG_NAME = "versions.json"
+
+# 局域网共享: 向局域网提供缓存的资源文件, 下载前先查询局域网内的其他安装程序 (见 utils/peerCache.py)
+# 会在所有网卡上监听 HTTP 与 UDP 端口, 默认关闭; 由 --peers / --serve-peers 开启
+PEER_CACHE_ENABLED = False
+PEER_DISCOVERY_ADDRESS = "239.255.42.99"  # 查询发送的组播地址, 也可设为广播地址 (如 255.255.255.255)
+PEER_DISCOVERY_PORT = 47320
+PEER_DISCOVERY_TIMEOUT = 1.0  # 等待回复的时间 (秒)
+PEER_HTTP_PORT = 47321  # 提供资源文件的 HTTP 端口, 被占用时改用随机端口
+
 # 进程杀死间隔
 PROCESS_KILL_INTERVAL_SECONDS = 0.5
 
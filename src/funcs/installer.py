@@ -7,9 +7,9 @@ import sys
 import winreg
 import requests
 from pathlib import Path
-from typing import Optional, Tuple, Dict, Any, Callable
+from typing import Optional, Tuple, Dict, Any, Callable, Union
 from loguru import logger as log
-from utils import dirSearch, fileDownloader, killer, asarPatcher
+from utils import dirSearch, fileDownloader, killer, asarPatcher, streamingUnzip, offlineBundle, peerCache, incrementalSync, stagingArea, patchedAsarCache, asarArchive, mainjsPatcher, downloadDigest
 from config import config
 import lifecycle as lifecycleMgr
 import typeDefs.lifecycle as lifecycleTypes
@@ -190,10 +190,101 @@ def get_download_source(args) -> Tuple[str, bool]:
     return download_source, is_download_src_from_local
 
 
+def create_streaming_extractors(
+    staging_dir: Optional[Path] = None,
+    include_aura: bool = True
+) -> Dict[str, streamingUnzip.StreamingExtractor]:
+    """
+    为 core.zip 与 aura.zip 创建边下载边解压器, 解压目标与 extract_resource_files 一致
+
+    参数:
+        staging_dir: 暂存目录, 默认为临时文件夹
+        include_aura: 是否解压 aura.zip; 从 ZIP 增量同步时 aura.zip 不在暂存目录中解压
+
+    返回:
+        Dict[str, StreamingExtractor]: 文件名 -> 解压器
+    """
+    partial_dir = Path(config.PARTIAL_DOWNLOAD_DIR)
+    temp_dir = staging_dir or Path(config.TEMP_INSTALL_DIR)
+    extractors = {
+        config.CORE_FILENAME: streamingUnzip.StreamingExtractor(
+            partial_dir / config.CORE_FILENAME, temp_dir / "core"
+        ),
+    }
+    if include_aura:
+        extractors[config.AURA_FILENAME] = streamingUnzip.StreamingExtractor(
+            partial_dir / config.AURA_FILENAME, temp_dir / "aura"
+        )
+    return extractors
+
+
+def use_zip_sync(install_dir_path: Path, staging_dir: Path, args=None) -> bool:
+    """
+    是否按 aura.zip 的中央目录增量同步已安装的 aura 目录 (不边下载边完整解压 aura.zip)
+
+    同步时只解压有变化的条目: 暂存目录与安装目录位于同一磁盘时解压到暂存目录后改名替换, 否则直接写入安装目录,
+    见 move_aura_folder
+
+    参数:
+        install_dir_path: 安装目录路径
+        staging_dir: 暂存目录
+        args: 命令行参数对象
+
+    返回:
+        bool: 已安装旧版本且启用增量同步
+    """
+    if not config.INCREMENTAL_SYNC_ENABLED or getattr(args, "no_incremental", False):
+        return False
+    return (install_dir_path / config.EXTRACTED_FOLDER_NAME).is_dir()
+
+
+def load_offline_bundle(bundle_path: str) -> offlineBundle.OfflineBundle:
+    """
+    打开并校验离线安装包
+
+    参数:
+        bundle_path: 离线安装包路径
+
+    返回:
+        OfflineBundle: 离线安装包
+    """
+    try:
+        bundle = offlineBundle.OfflineBundle(bundle_path)
+    except offlineBundle.BundleError as e:
+        log.critical(str(e))
+        raise Exception("无效的离线安装包")
+    log.info(
+        f"已选择离线安装包: {bundle_path} (版本 {bundle.tag}, 生成于 {bundle.info.get('created_at')})"
+    )
+    if not bundle.verify():
+        bundle.close()
+        raise Exception("离线安装包校验失败")
+    return bundle
+
+
+def use_delta_upgrade(args=None) -> bool:
+    """
+    是否以本地资源文件缓存中其他版本的 aura.zip 为基础增量下载 aura.zip
+
+    参数:
+        args: 命令行参数对象
+
+    返回:
+        bool: 已启用增量升级且未禁用本地资源文件缓存
+    """
+    if not config.DELTA_UPGRADE_ENABLED or getattr(args, "no_delta", False):
+        return False
+    return not getattr(args, "no_cache", False)
+
+
 def download_resource_files(
     download_source: str,
     is_local: bool,
-    progress_callback: Optional[Callable] = None
+    progress_callback: Optional[Callable] = None,
+    use_cache: bool = True,
+    extractors: Optional[Dict[str, streamingUnzip.StreamingExtractor]] = None,
+    delta: bool = False,
+    context: Optional[fileDownloader.ReleaseContext] = None
 ) -> Tuple[Optional[Path], Optional[Path]]:
     """
     下载资源文件
@@ -202,14 +293,19 @@ def download_resource_files(
         download_source: 下载源
         is_local: 是否来自本地文件
         progress_callback: 进度回调函数
+        use_cache: 是否使用本地资源文件缓存
+        extractors: 边下载边解压器, 由 create_streaming_extractors 创建
+        delta: 是否增量下载 aura.zip, 见 use_delta_upgrade
+        context: 接收下载时计算的 SHA-256, 见 core_zip_sha256
 
     返回:
         Tuple[Optional[Path], Optional[Path]]: (core.zip路径, aura.zip路径)
     """
-    def rep_dl_progress(curDownloadSize, fullSize, fileName):
-        progress = round(curDownloadSize / fullSize * 100, 2)
+    def rep_dl_progress(event):
         if progress_callback:
-            progress_callback(progress, f"[3 / 10] {fileName} 文件下载中, 进度: {progress} %")
+            progress_callback(
+                round(event.percent, 2), f"[3 / 10] 资源文件下载中: {event.describe()}"
+            )
 
     if is_local:
         if os.path.exists(download_source) and os.path.isdir(download_source):
@@ -229,7 +325,9 @@ def download_resource_files(
     else:
         lifecycleMgr.callbacks[lifecycleTypes.GLOBAL_CALLBACKS.REPORT_DOWNLOAD_PROGRESS.value] = rep_dl_progress
         downloaded_core_zip_path, downloaded_aura_zip_path = (
-            fileDownloader.download_release_files(download_source)
+            fileDownloader.download_release_files(
+                download_source, use_cache, extractors, delta, context
+            )
         )
         lifecycleMgr.callbacks[lifecycleTypes.GLOBAL_CALLBACKS.REPORT_DOWNLOAD_PROGRESS.value] = None
 
@@ -242,29 +340,58 @@ def download_resource_files(
 
 def extract_resource_files(
     downloaded_core_zip_path: Path,
-    downloaded_aura_zip_path: Path
-) -> Tuple[Path, Path]:
+    downloaded_aura_zip_path: Path,
+    extractors: Optional[Dict[str, streamingUnzip.StreamingExtractor]] = None,
+    bundle: Optional[offlineBundle.OfflineBundle] = None,
+    staging_dir: Optional[Path] = None,
+    skip_aura: bool = False
+) -> Tuple[Optional[Path], Path]:
     """
     解压资源文件
 
     参数:
         downloaded_core_zip_path: core.zip文件路径
         downloaded_aura_zip_path: aura.zip文件路径
+        extractors: 边下载边解压器; 等待其完成, 失败时回退为完整解压
+        bundle: 离线安装包, 指定时直接从安装包中解压, 忽略前两个参数
+        staging_dir: 解压目标所在的暂存目录, 默认为临时文件夹
+        skip_aura: 不解压 aura.zip (将从 ZIP 增量同步, 见 use_zip_sync)
 
     返回:
-        Tuple[Path, Path]: (aura解压路径, core解压路径)
+        Tuple[Optional[Path], Path]: (aura解压路径, core解压路径); 跳过 aura.zip 时第一项为 None
     """
-    temp_extract_path = Path(config.TEMP_INSTALL_DIR) / "aura"
-    temp_extract_path_core = Path(config.TEMP_INSTALL_DIR) / "core"
+    staging_dir = staging_dir or Path(config.TEMP_INSTALL_DIR)
+    temp_extract_path = staging_dir / "aura"
+    temp_extract_path_core = staging_dir / "core"
+    skip_aura = skip_aura and (
+        bundle is not None or (downloaded_aura_zip_path is not None and downloaded_aura_zip_path.is_file())
+    )
 
-    if not fileDownloader.unzip_file(
-        downloaded_aura_zip_path, temp_extract_path
-    ) or not fileDownloader.unzip_file(
-        downloaded_core_zip_path, temp_extract_path_core
+    for zip_path, extract_to, filename in (
+        (downloaded_aura_zip_path, temp_extract_path, config.AURA_FILENAME),
+        (downloaded_core_zip_path, temp_extract_path_core, config.CORE_FILENAME),
     ):
-        error_detail = "资源文件解压失败"
-        log.critical(error_detail)
-        raise Exception(error_detail)
+        if skip_aura and filename == config.AURA_FILENAME:
+            continue
+        if bundle:
+            if extract_to.exists():
+                shutil.rmtree(extract_to)
+            extracted = bundle.extract(filename, extract_to)
+        else:
+            extractor = (extractors or {}).get(filename)
+            if extractor:
+                if extractor.wait():
+                    continue
+                if extract_to.exists():
+                    shutil.rmtree(extract_to)
+            extracted = fileDownloader.unzip_file(zip_path, extract_to)
+        if not extracted:
+            error_detail = "资源文件解压失败"
+            log.critical(error_detail)
+            raise Exception(error_detail)
+
+    if skip_aura:
+        return None, temp_extract_path_core
 
     # 检查解压后的目录结构
     expected_aura_source_path = temp_extract_path
@@ -274,7 +401,7 @@ def extract_resource_files(
         )
         potential_nested_path = (
             temp_extract_path
-            / Path(downloaded_aura_zip_path.stem)
+            / Path(config.AURA_FILENAME).stem
             / config.EXTRACTED_FOLDER_NAME
         )
         if potential_nested_path.is_dir():
@@ -317,18 +444,45 @@ def unload_filesystem_filter_driver(dry_run: bool = False) -> None:
         log.error(f"调用 fltmc 时发生未知错误: {e}")
 
 
+def aura_zip_source(
+    downloaded_aura_zip_path: Optional[Path],
+    bundle: Optional[offlineBundle.OfflineBundle]
+) -> Union[Path, Callable, None]:
+    """
+    获取用于增量同步的 aura.zip
+
+    参数:
+        downloaded_aura_zip_path: aura.zip 文件路径
+        bundle: 离线安装包
+
+    返回:
+        Union[Path, Callable, None]: ZIP 文件路径或打开安装包中 aura.zip 的函数; 没有 ZIP 文件时为 None
+    """
+    if bundle:
+        return lambda: bundle.open_member(config.AURA_FILENAME)
+    if downloaded_aura_zip_path and downloaded_aura_zip_path.is_file():
+        return downloaded_aura_zip_path
+    return None
+
+
 def move_aura_folder(
-    expected_aura_source_path: Path,
+    expected_aura_source_path: Optional[Path],
     install_dir_path: Path,
-    dry_run: bool = False
+    dry_run: bool = False,
+    incremental: bool = False,
+    aura_zip: Union[Path, Callable, None] = None,
+    staging_dir: Optional[Path] = None
 ) -> Tuple[str, bool]:
     """
     移动 Aura 文件夹
 
     参数:
-        expected_aura_source_path: 源Aura文件夹路径
+        expected_aura_source_path: 源Aura文件夹路径; 为 None 时从 aura_zip 增量同步
         install_dir_path: 安装目录路径
         dry_run: 是否为干跑模式
+        incremental: 已安装旧版本时不删除后整体移动: 从 aura_zip 同步时只写入有变化的文件, 源目录与安装目录在同一磁盘时改名替换
+        aura_zip: 未解压的 aura.zip, 见 aura_zip_source
+        staging_dir: 暂存目录; 与安装目录在同一磁盘时, 从 aura_zip 同步的新版本先在其中生成再改名替换
 
     返回:
         Tuple[str, bool]: (asar文件名, 是否需要patch)
@@ -342,13 +496,45 @@ def move_aura_folder(
     if_patch = True
 
     try:
+        synced = False
         if target_aura_path.exists():
-            log.warning(
-                f"发现旧版本 HugoAura 目录: {target_aura_path}, 即将清理..."
+            incremental = incremental and target_aura_path.is_dir() and (
+                expected_aura_source_path is None
+                or stagingArea.same_volume(expected_aura_source_path, target_aura_path)
             )
-            if not dry_run:
-                shutil.rmtree(target_aura_path)
-                time.sleep(0.1)
+            if incremental:
+                if expected_aura_source_path is None and staging_dir and stagingArea.same_volume(
+                    staging_dir, target_aura_path
+                ):
+                    log.info(f"发现旧版本 HugoAura 目录: {target_aura_path}, 即将按 {config.AURA_FILENAME} 的中央目录在暂存目录中生成新版本后改名替换...")
+                    staged_aura_path = staging_dir / "aura"
+                    stats = incrementalSync.stage_from_zip(
+                        aura_zip, target_aura_path, staged_aura_path, dry_run
+                    )
+                    if not dry_run:
+                        incrementalSync.replace_tree(staged_aura_path, target_aura_path)
+                elif expected_aura_source_path is None:
+                    log.info(f"发现旧版本 HugoAura 目录: {target_aura_path}, 即将按 {config.AURA_FILENAME} 的中央目录增量同步...")
+                    stats = incrementalSync.sync_from_zip(aura_zip, target_aura_path, dry_run)
+                else:
+                    log.info(f"发现旧版本 HugoAura 目录: {target_aura_path}, 新版本已在同一磁盘上解压, 即将改名替换...")
+                    if not dry_run:
+                        incrementalSync.replace_tree(expected_aura_source_path, target_aura_path)
+                    stats = None
+                if stats and stats.errors:
+                    for error in stats.errors[:10]:
+                        log.error(f"同步失败: {error}")
+                    raise Exception(f"{len(stats.errors)} 个文件同步失败")
+                if stats:
+                    log.success(f"增量同步完成: {stats.describe()}")
+                synced = True
+            else:
+                log.warning(
+                    f"发现旧版本 HugoAura 目录: {target_aura_path}, 即将清理..."
+                )
+                if not dry_run:
+                    shutil.rmtree(target_aura_path)
+                    time.sleep(0.1)
             ssa_asar = "app.asar.bak"
             if os.path.exists(install_dir_path / ssa_asar):
                 log.warning(
@@ -363,7 +549,7 @@ def move_aura_folder(
                 )
                 if_patch = False
 
-        if not dry_run:
+        if not dry_run and not synced:
             shutil.move(str(expected_aura_source_path), str(target_aura_path))
         log.success(f"成功移动文件夹 '{config.EXTRACTED_FOLDER_NAME}'")
 
@@ -376,11 +562,40 @@ def move_aura_folder(
         raise Exception(error_detail)
 
 
+def core_zip_sha256(
+    downloaded_core_zip_path: Optional[Path],
+    bundle: Optional[offlineBundle.OfflineBundle] = None,
+    context: Optional[fileDownloader.ReleaseContext] = None
+) -> Optional[str]:
+    """
+    core.zip 的 SHA-256, 用作修补后 ASAR 缓存的键
+
+    离线安装包与下载 (含缓存命中) 的文件使用已有的摘要, 只有本地文件 (--path) 需要读取计算
+
+    参数:
+        downloaded_core_zip_path: core.zip 文件路径
+        bundle: 离线安装包
+        context: 下载时使用的 ReleaseContext
+
+    返回:
+        Optional[str]: 无法取得 (如 core.zip 不存在) 时为 None
+    """
+    if bundle:
+        return bundle.digests.get(config.CORE_FILENAME)
+    if context:
+        return context.downloaded_digests.get(config.CORE_FILENAME)
+    if downloaded_core_zip_path and downloaded_core_zip_path.is_file():
+        return downloadDigest.sha256_file(downloaded_core_zip_path)
+    return None
+
+
 def patch_asar_file(
     install_dir_path: Path,
     ssa_asar: str,
     temp_extract_path_core: Path,
-    dry_run: bool = False
+    dry_run: bool = False,
+    staging_dir: Optional[Path] = None,
+    core_sha256: Optional[str] = None
 ) -> Optional[str]:
     """
     修补 ASAR 文件
@@ -390,16 +605,36 @@ def patch_asar_file(
         ssa_asar: ASAR文件名
         temp_extract_path_core: core解压路径
         dry_run: 是否为干跑模式
+        staging_dir: 修补后的 ASAR 输出所在的暂存目录, 默认为临时文件夹
+        core_sha256: core.zip 的 SHA-256; 指定时先查找修补后 ASAR 缓存, 修补完成后写入缓存
 
     返回:
         Optional[str]: 修补后的ASAR文件路径
     """
+    staging_dir = staging_dir or Path(config.TEMP_INSTALL_DIR)
+    input_asar_path = install_dir_path / ssa_asar
+    output_asar_path = staging_dir / config.ASAR_FILENAME
+
+    cache, asar_sha256, asar_size, patcher_version = None, None, 0, None
+    if core_sha256:
+        try:
+            patcher_version = asarPatcher.patcher_version(input_asar_path)
+            asar_size = input_asar_path.stat().st_size
+            cache = patchedAsarCache.PatchedAsarCache()
+            # 先以大小与修改时间判断, 只有可能命中时才读取整个原始 ASAR 计算 SHA-256
+            asar_sha256 = patchedAsarCache.known_sha256(input_asar_path)
+            if not asar_sha256 and cache.has_candidate(core_sha256, patcher_version, asar_size):
+                asar_sha256 = patchedAsarCache.input_sha256(input_asar_path)
+        except (OSError, asarArchive.AsarFormatError, mainjsPatcher.PatchError) as e:
+            log.warning(f"无法读取 {input_asar_path}, 不使用修补后 ASAR 缓存: {e}")
+            cache = None
+        if cache and asar_sha256 and cache.fetch(asar_sha256, core_sha256, patcher_version, output_asar_path):
+            return str(output_asar_path)
+
     patchResult = asarPatcher.patch_asar_file(
-        input_asar_path=str(install_dir_path / ssa_asar),
-        temp_extract_dir=str(Path(config.TEMP_INSTALL_DIR) / "asar_temp"),
-        output_asar_path=str(
-            Path(config.TEMP_INSTALL_DIR) / config.ASAR_FILENAME
-        ),
+        input_asar_path=str(input_asar_path),
+        temp_extract_dir=str(staging_dir / "asar_temp"),
+        output_asar_path=str(output_asar_path),
         core_dir=str(temp_extract_path_core),
     )
 
@@ -409,6 +644,12 @@ def patch_asar_file(
         raise Exception(error_detail)
 
     log.info(f"ASAR 文件修改成功, 输出路径: {patchResult[1]}")
+    if cache:
+        try:
+            asar_sha256 = asar_sha256 or patchedAsarCache.input_sha256(input_asar_path)
+            cache.store(asar_sha256, core_sha256, patcher_version, output_asar_path, asar_size)
+        except OSError as e:
+            log.warning(f"无法读取 {input_asar_path}, 不写入修补后 ASAR 缓存: {e}")
     return patchResult[1]
 
 
@@ -533,18 +774,21 @@ def write_registry_info(
         log.warning(f"写入注册表失败: {e}")
 
 
-def cleanup_temp_files(temp_dir: Path, dry_run: bool = False) -> None:
+def cleanup_temp_files(
+    temp_dir: Path, dry_run: bool = False, keep_partial: bool = False
+) -> None:
     """
     清理临时文件
 
     参数:
         temp_dir: 临时目录路径
         dry_run: 是否为干跑模式
+        keep_partial: 是否保留未完成的下载文件, 以便下次运行时续传
     """
     if temp_dir.exists():
         try:
             if not dry_run:
-                shutil.rmtree(temp_dir)
+                fileDownloader.clear_temp_dir(temp_dir, keep_partial)
             else:
                 log.info(f"临时文件夹目录: {temp_dir}")
                 log.info("可前往该目录检查 Dry Run 下载 / 解压产物")
@@ -567,6 +811,8 @@ def run_installation(args, installerClassIns=None) -> Dict[str, Any]:
     install_success = False
     error_detail = ""
     temp_asar_path = None
+    bundle = None
+    staging_dir = None
 
     # 获取进度回调函数
     progress_callback = getattr(args, "progress_callback", None)
@@ -594,21 +840,48 @@ def run_installation(args, installerClassIns=None) -> Dict[str, Any]:
         update_progress(10, "[1 / 10] 查找希沃管家安装目录")
         install_dir_path_str = find_installation_directory(args)
         install_dir_path = Path(install_dir_path_str)
+        # 在安装目录所在的磁盘上解压, 使最后的移动成为重命名
+        staging_dir = stagingArea.prepare_staging_dir(
+            install_dir_path, args.dry_run if args else False
+        )
+
+        zip_sync = use_zip_sync(install_dir_path, staging_dir, args)
 
         # 步骤 3: 选择版本
         update_progress(20, "[2 / 10] 选择 HugoAura 版本")
-        download_source, is_local = get_download_source(args)
+        if getattr(args, "bundle", None):
+            bundle = load_offline_bundle(args.bundle)
+            download_source, is_local = bundle.tag, False
+        else:
+            download_source, is_local = get_download_source(args)
 
-        # 步骤 4: 下载资源文件
+        # 步骤 4: 下载资源文件 (同时边下载边解压)
         update_progress(30, "[3 / 10] 获取资源文件")
-        downloaded_core_zip_path, downloaded_aura_zip_path = download_resource_files(
-            download_source, is_local, lambda p, s: update_progress(30 + p*0.02, s)
-        )
+        extractors = {}
+        release_context = None
+        if bundle:
+            log.info("使用离线安装包, 跳过下载")
+            downloaded_core_zip_path, downloaded_aura_zip_path = None, None
+        else:
+            if not is_local and not getattr(args, "no_cache", False):
+                # 安装期间向局域网内的其他安装程序提供本地缓存的资源文件
+                peerCache.start_peer_server()
+            extractors = {} if is_local else create_streaming_extractors(staging_dir, not zip_sync)
+            release_context = None if is_local else fileDownloader.ReleaseContext(download_source)
+            downloaded_core_zip_path, downloaded_aura_zip_path = download_resource_files(
+                download_source,
+                is_local,
+                lambda p, s: update_progress(30 + p*0.02, s),
+                not getattr(args, "no_cache", False),
+                extractors,
+                not is_local and use_delta_upgrade(args),
+                release_context
+            )
 
         # 步骤 5: 解压资源文件
         update_progress(40, "[4 / 10] 解压资源文件")
         expected_aura_source_path, temp_extract_path_core = extract_resource_files(
-            downloaded_core_zip_path, downloaded_aura_zip_path
+            downloaded_core_zip_path, downloaded_aura_zip_path, extractors, bundle, staging_dir, zip_sync
         )
 
         # 步骤 6: 卸载文件系统过滤驱动
@@ -617,10 +890,14 @@ def run_installation(args, installerClassIns=None) -> Dict[str, Any]:
 
         # 步骤 7: 移动 Aura 文件夹
         update_progress(60, "[6 / 10] 移动 Aura 文件夹")
+        incremental = config.INCREMENTAL_SYNC_ENABLED and not getattr(args, "no_incremental", False)
         ssa_asar, if_patch = move_aura_folder(
             expected_aura_source_path,
             install_dir_path,
-            args.dry_run if args else False
+            args.dry_run if args else False,
+            incremental,
+            aura_zip_source(downloaded_aura_zip_path, bundle),
+            staging_dir
         )
 
         # 步骤 8: 修补 ASAR 文件（如果需要）
@@ -630,7 +907,11 @@ def run_installation(args, installerClassIns=None) -> Dict[str, Any]:
                 install_dir_path,
                 ssa_asar,
                 temp_extract_path_core,
-                args.dry_run if args else False
+                args.dry_run if args else False,
+                staging_dir,
+                None
+                if getattr(args, "no_cache", False)
+                else core_zip_sha256(downloaded_core_zip_path, bundle, release_context)
             )
 
         # 步骤 9: 启动进程结束任务
@@ -685,9 +966,17 @@ def run_installation(args, installerClassIns=None) -> Dict[str, Any]:
         if args and not args.dry_run:
             killer.stop_killing_process()
 
+        if bundle:
+            bundle.close()
+        peerCache.stop_peer_server()
+        if staging_dir:
+            stagingArea.remove_staging_dir(staging_dir)
+
         # 清理临时文件
         temp_dir = Path(config.TEMP_INSTALL_DIR)
-        cleanup_temp_files(temp_dir, args.dry_run if args else False)
+        cleanup_temp_files(
+            temp_dir, args.dry_run if args else False, keep_partial=not install_success
+        )
 
         # 输出安装结果
         if install_success:
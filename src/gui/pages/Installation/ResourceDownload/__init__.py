@@ -1,4 +1,6 @@
-from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout
+from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QProgressBar
+from utils.signals import global_signals
+from utils import progressReporter
 
 class ResourceDownload(QWidget):
     def __init__(self, parent=None):
@@ -7,5 +9,26 @@ class ResourceDownload(QWidget):
         label = QLabel("这是页面 3")
         label.setStyleSheet("color: white; font-size: 24px;")
         layout.addWidget(label)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        layout.addWidget(self.progress_bar)
+
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("color: white; font-size: 14px;")
+        layout.addWidget(self.status_label)
+
         layout.addStretch()
         self.setLayout(layout)
+
+        # 下载在工作线程中进行, 经由信号切换到 GUI 线程更新界面; 页面销毁时注销, 避免重复创建页面后监听者不断累积
+        forward_progress = global_signals.downloadProgressUpdated.emit
+        progressReporter.add_listener(forward_progress)
+        self.destroyed.connect(lambda: progressReporter.remove_listener(forward_progress))
+        global_signals.downloadProgressUpdated.connect(self.updateProgress)
+
+    def updateProgress(self, event):
+        """根据下载进度事件更新进度条与状态文本"""
+        self.progress_bar.setValue(int(event.percent * 10))
+        self.status_label.setText(event.describe())
@@ -39,6 +39,9 @@ def parse_arguments():
     version_group.add_argument(
         "--ci", help="安装最新的 CI 版本", action="store_true"
     )
+    version_group.add_argument(
+        "--bundle", help="从离线安装包安装 (无需网络)", type=str, metavar="FILE"
+    )
 
     parser.add_argument("-d", "--dir", help="指定希沃管家安装目录", type=str)
     parser.add_argument(
@@ -54,6 +57,91 @@ def parse_arguments():
         "--cli", help="以 CLI 模式启动", action="store_true"
     )
 
+    # 资源文件缓存
+    parser.add_argument(
+        "--no-cache", help="不使用也不写入本地资源文件缓存", action="store_true"
+    )
+    parser.add_argument(
+        "--no-delta",
+        help="完整下载 aura.zip, 不以本地缓存中其他版本的 aura.zip 为基础增量下载",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--no-incremental",
+        help="已安装旧版本时删除旧的 aura 目录后整体替换, 不进行增量同步",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--cache-info", help="显示本地资源文件缓存与修补后 ASAR 缓存内容", action="store_true"
+    )
+    parser.add_argument(
+        "--cache-prune",
+        help="校验并清理本地资源文件缓存与修补后 ASAR 缓存, 可指定清理后的大小上限 (MB, 0 为清空)",
+        nargs="?",
+        const=-1,
+        type=int,
+        metavar="MB",
+    )
+    parser.add_argument(
+        "--cache-max-size", help="本地资源文件缓存的大小上限 (MB)", type=int, metavar="MB"
+    )
+    parser.add_argument(
+        "--asar-cache",
+        help="修补后 ASAR 缓存目录, 可为多台机器共享的网络路径",
+        type=str,
+        metavar="DIR",
+    )
+    # 局域网共享
+    parser.add_argument(
+        "--peers",
+        help="从局域网内的其他安装程序获取资源文件, 安装期间也向局域网提供本地缓存的资源文件",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--serve-peers",
+        help="持续向局域网提供本地缓存的资源文件, 不进行安装 (Ctrl+C 退出)",
+        action="store_true",
+    )
+    # 批量部署
+    parser.add_argument(
+        "--limit-rate", help="下载总速率上限 (KB/s)", type=int, metavar="KB"
+    )
+    parser.add_argument(
+        "--start-jitter",
+        help="开始下载前随机延迟 0 ~ SECONDS 秒, 错开同时启动的安装程序",
+        type=float,
+        metavar="SECONDS",
+    )
+    parser.add_argument(
+        "--download-slots",
+        help="共享目录, 用于限制同时下载的机器数量 (见 --max-concurrent-downloads)",
+        type=str,
+        metavar="DIR",
+    )
+    parser.add_argument(
+        "--max-concurrent-downloads",
+        help=f"同时下载的机器数量上限 (默认 {config.DOWNLOAD_MAX_CONCURRENT})",
+        type=int,
+        metavar="N",
+    )
+    parser.add_argument(
+        "--make-bundle",
+        help="下载所选版本的资源文件并生成离线安装包, 不进行安装",
+        type=str,
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--verify-only",
+        help="仅校验本地资源文件缓存的 SHA-256 (与发布信息比对), 不进行安装",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--verify-asar",
+        help="校验 ASAR 文件头中各文件的 integrity (SHA-256), 不进行安装",
+        type=str,
+        metavar="FILE",
+    )
+
     return parser.parse_args()
 
 
@@ -66,6 +154,23 @@ def print_exit_codes():
         print(f"  {code}: {desc}")
 
 
+def manage_cache(args):
+    """
+    查看 / 清理本地资源文件缓存与修补后 ASAR 缓存
+    """
+    from utils import artifactCache, patchedAsarCache
+
+    cache = artifactCache.ArtifactCache()
+    asar_cache = patchedAsarCache.PatchedAsarCache()
+    if args.cache_prune is not None:
+        max_bytes = None if args.cache_prune < 0 else args.cache_prune * 1024 * 1024
+        freed = cache.prune(max_bytes) + asar_cache.prune(max_bytes)
+        print(f"已释放 {freed / 1024 / 1024:.2f} MB 缓存空间")
+    if args.cache_info:
+        artifactCache.print_cache_info(cache)
+        patchedAsarCache.print_cache_info(asar_cache)
+
+
 def cli_main():
     """
     主函数, 处理命令行参数并执行提权安装流程
@@ -76,12 +181,56 @@ def cli_main():
         print_exit_codes()
         sys.exit(0)
 
+    if args.cache_max_size is not None:
+        config.ARTIFACT_CACHE_MAX_BYTES = args.cache_max_size * 1024 * 1024
+    if args.asar_cache:
+        config.PATCHED_ASAR_CACHE_DIR = args.asar_cache
+    if args.limit_rate is not None:
+        config.DOWNLOAD_RATE_LIMIT = args.limit_rate * 1024
+    if args.start_jitter is not None:
+        config.DOWNLOAD_START_JITTER = args.start_jitter
+    if args.download_slots:
+        config.DOWNLOAD_COORDINATION_DIR = args.download_slots
+    if args.max_concurrent_downloads is not None:
+        config.DOWNLOAD_MAX_CONCURRENT = args.max_concurrent_downloads
+    if args.peers or args.serve_peers:
+        config.PEER_CACHE_ENABLED = True
+
+    if args.cache_info or args.cache_prune is not None:
+        manage_cache(args)
+        sys.exit(0)
+
+    if args.verify_only:
+        from utils import artifactCache
+
+        sys.exit(0 if artifactCache.verify_cached_artifacts() else 1)
+
+    if args.verify_asar:
+        from utils import asarIntegrity
+
+        sys.exit(0 if asarIntegrity.verify_asar_file(args.verify_asar) else 1)
+
+    if args.serve_peers:
+        from utils import peerCache
+
+        sys.exit(0 if peerCache.serve_forever() else 1)
+
+    if args.make_bundle:
+        from utils import offlineBundle
+
+        download_source = installer.select_release_source(args)
+        sys.exit(
+            0
+            if offlineBundle.make_bundle(download_source, args.make_bundle, not args.no_cache)
+            else 1
+        )
+
     logger.info(f"--- 启动 {config.APP_NAME} 管理工具 ---")
     logger.info(f"管理工具版本: {__appVer__}")
     logger.info(f"EXEC: {sys.executable}")
     logger.info(f"Arg: {sys.argv}")
 
-    has_version_args = args.version or args.path or args.pre or args.latest
+    has_version_args = args.version or args.path or args.pre or args.latest or args.bundle
     is_double_click = len(sys.argv) == 1
 
     if not has_version_args and not is_double_click and not args.dry_run:
@@ -0,0 +1,339 @@
+"""
+本地资源文件缓存
+按内容 SHA-256 存储已下载的 core.zip / aura.zip, 以 (版本 Tag, 文件名) 建立索引,
+位于临时文件夹之外, 重新安装或修复时可直接复用; 总大小超过上限时按最近使用时间淘汰
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger as log
+
+from config import config
+from utils import downloadDigest, downloadEngine
+
+
+INDEX_FILENAME = "index.json"
+BLOBS_DIRNAME = "blobs"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.Lock()
+
+
+@dataclass
+class CacheEntry:
+    tag: str
+    filename: str
+    sha256: str
+    size: int
+    last_used: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.tag}/{self.filename}"
+
+
+def copy_with_sha256(source: Path, dest: Path) -> str:
+    """复制文件并同时计算 SHA-256, 只读取一遍"""
+    digest = hashlib.sha256()
+    with open(source, "rb") as src, open(dest, "wb") as dst:
+        for chunk in iter(lambda: src.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    资源文件缓存
+
+    Args:
+        cache_dir: 缓存目录, 默认为 config.ARTIFACT_CACHE_DIR
+        max_bytes: 缓存总大小上限, 默认为 config.ARTIFACT_CACHE_MAX_BYTES
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = Path(cache_dir or config.ARTIFACT_CACHE_DIR)
+        self.max_bytes = (
+            config.ARTIFACT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        )
+        self.blobs_dir = self.cache_dir / BLOBS_DIRNAME
+        self.index_path = self.cache_dir / INDEX_FILENAME
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.blobs_dir / sha256
+
+    def _load_index(self) -> Dict[str, CacheEntry]:
+        if not self.index_path.exists():
+            return {}
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+            entries = [CacheEntry(**item) for item in data.get("entries", [])]
+            return {entry.key: entry for entry in entries}
+        except (OSError, ValueError, TypeError) as e:
+            log.warning(f"缓存索引 {self.index_path} 已损坏, 将重建: {e}")
+            return {}
+
+    def _save_index(self, index: Dict[str, CacheEntry]):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        data = {"entries": [asdict(entry) for entry in index.values()]}
+        tmp_path = self.index_path.with_name(INDEX_FILENAME + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.index_path)
+
+    def entries(self) -> List[CacheEntry]:
+        """按最近使用时间倒序返回所有缓存条目"""
+        with _lock:
+            index = self._load_index()
+        return sorted(index.values(), key=lambda e: e.last_used, reverse=True)
+
+    def total_size(self) -> int:
+        """缓存中实际存储的字节数 (同一内容只计一次)"""
+        with _lock:
+            index = self._load_index()
+        return sum({e.sha256: e.size for e in index.values()}.values())
+
+    def other_versions(self, filename: str, tag: str, limit: int) -> List[Path]:
+        """
+        其他版本的同名文件 (最近使用的在前), 供增量升级作为基础
+
+        Returns:
+            List[Path]: 缓存文件路径, 最多 limit 个
+        """
+        paths = []
+        for entry in self.entries():
+            blob = self.blob_path(entry.sha256)
+            if entry.filename == filename and entry.tag != tag and blob.exists():
+                if blob not in paths:
+                    paths.append(blob)
+        return paths[:limit]
+
+    def lookup(
+        self,
+        tag: str,
+        filename: str,
+        dest_folder: str,
+        digests: Optional[Dict[str, str]] = None,
+    ) -> Optional[Path]:
+        """
+        查找缓存并复制到目标目录
+
+        复制时同时计算 SHA-256 校验缓存内容, 校验失败的条目与复制出的文件会被删除;
+        复制期间不持有缓存锁
+
+        Args:
+            digests: 命中时在其中记录 文件名 -> 已校验的 SHA-256 (如 ReleaseContext.downloaded_digests)
+
+        Returns:
+            Optional[Path]: 命中时返回目标文件路径, 否则返回 None
+        """
+        key = f"{tag}/{filename}"
+        with _lock:
+            entry = self._load_index().get(key)
+        if not entry:
+            return None
+
+        dest_path = Path(dest_folder) / filename
+        try:
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            blob = self.blob_path(entry.sha256)
+            valid = blob.exists() and copy_with_sha256(blob, dest_path) == entry.sha256
+            with _lock:
+                index = self._load_index()
+                current = index.get(key)
+                if not valid:
+                    log.warning(f"缓存的 {key} 校验失败, 已丢弃")
+                    dest_path.unlink(missing_ok=True)
+                    # 复制期间条目可能已被其他进程更新
+                    if current and current.sha256 == entry.sha256:
+                        self._drop(index, key)
+                        self._save_index(index)
+                    return None
+                if current:
+                    current.last_used = time.time()
+                    self._save_index(index)
+        except OSError as e:
+            log.warning(f"读取缓存 {key} 失败: {e}")
+            return None
+
+        if digests is not None:
+            digests[filename] = entry.sha256
+        log.success(f"使用缓存的 {key} (SHA-256: {entry.sha256[:12]})")
+        return dest_path
+
+    def store(
+        self, tag: str, filename: str, file_path: Path, sha256: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        将已下载的文件存入缓存, 随后按 LRU 淘汰超出上限的条目
+
+        Args:
+            sha256: 下载时已计算的 SHA-256, 为空时读取文件计算
+
+        Returns:
+            Optional[str]: 文件的 SHA-256, 写入失败时返回 None
+        """
+        key = f"{tag}/{filename}"
+        try:
+            sha256 = sha256 or downloadDigest.sha256_file(file_path)
+            size = Path(file_path).stat().st_size
+            if size > self.max_bytes:
+                log.info(f"{key} 超过缓存上限, 不写入缓存")
+                return sha256
+
+            with _lock:
+                index = self._load_index()
+                blob = self.blob_path(sha256)
+                if not blob.exists():
+                    self.blobs_dir.mkdir(parents=True, exist_ok=True)
+                    tmp_blob = blob.with_name(sha256 + ".tmp")
+                    shutil.copyfile(file_path, tmp_blob)
+                    os.replace(tmp_blob, blob)
+
+                previous = index.get(key)
+                index[key] = CacheEntry(tag, filename, sha256, size, time.time())
+                if previous and previous.sha256 != sha256:
+                    self._remove_blob_if_unused(index, previous.sha256)
+
+                self._evict(index, self.max_bytes)
+                self._save_index(index)
+            log.info(f"已缓存 {key} (SHA-256: {sha256[:12]})")
+            return sha256
+        except OSError as e:
+            log.warning(f"写入缓存 {key} 失败: {e}")
+            return None
+
+    def prune(self, max_bytes: Optional[int] = None) -> int:
+        """
+        校验并清理缓存: 删除损坏或缺失的条目与无主的缓存文件, 再按 LRU 淘汰至 max_bytes 以下
+
+        Args:
+            max_bytes: 清理后的大小上限, 默认使用缓存上限; 传入 0 即清空缓存
+
+        Returns:
+            int: 释放的字节数
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        with _lock:
+            before = self._disk_usage()
+            index = self._load_index()
+            for key, entry in list(index.items()):
+                blob = self.blob_path(entry.sha256)
+                if not blob.exists() or downloadDigest.sha256_file(blob) != entry.sha256:
+                    log.warning(f"缓存的 {key} 校验失败, 已丢弃")
+                    self._drop(index, key)
+
+            referenced = {entry.sha256 for entry in index.values()}
+            if self.blobs_dir.exists():
+                for blob in self.blobs_dir.iterdir():
+                    if blob.name not in referenced:
+                        blob.unlink()
+
+            self._evict(index, limit)
+            self._save_index(index)
+            return before - self._disk_usage()
+
+    def _disk_usage(self) -> int:
+        if not self.blobs_dir.exists():
+            return 0
+        return sum(blob.stat().st_size for blob in self.blobs_dir.iterdir())
+
+    def _evict(self, index: Dict[str, CacheEntry], limit: int):
+        """按最近使用时间从旧到新淘汰, 直到总大小不超过 limit"""
+        for entry in sorted(index.values(), key=lambda e: e.last_used):
+            if sum({e.sha256: e.size for e in index.values()}.values()) <= limit:
+                return
+            log.info(f"缓存超出上限, 淘汰 {entry.key}")
+            self._drop(index, entry.key)
+
+    def _drop(self, index: Dict[str, CacheEntry], key: str):
+        entry = index.pop(key, None)
+        if entry:
+            self._remove_blob_if_unused(index, entry.sha256)
+
+    def _remove_blob_if_unused(self, index: Dict[str, CacheEntry], sha256: str):
+        if any(entry.sha256 == sha256 for entry in index.values()):
+            return
+        blob = self.blob_path(sha256)
+        if blob.exists():
+            blob.unlink()
+
+
+def verify_cached_artifacts(cache: Optional[ArtifactCache] = None) -> bool:
+    """
+    重新计算缓存文件的 SHA-256, 与缓存索引及发布信息中的摘要比对并打印结果
+
+    Returns:
+        bool: 所有条目均校验通过
+    """
+    cache = cache or ArtifactCache()
+    entries = cache.entries()
+    if not entries:
+        print("缓存为空")
+        return True
+
+    async def fetch_all(tags: List[str]) -> Dict[str, Dict[str, str]]:
+        results = await asyncio.gather(
+            *(
+                downloadDigest.fetch_release_digests(tag, config.BASE_DOWNLOAD_URLS)
+                for tag in tags
+            )
+        )
+        return dict(zip(tags, results))
+
+    tags = sorted({entry.tag for entry in entries})
+    release_digests = downloadEngine.get_engine().run(fetch_all(tags))
+
+    all_ok = True
+    for entry in entries:
+        blob = cache.blob_path(entry.sha256)
+        expected = release_digests.get(entry.tag, {}).get(entry.filename)
+        if not blob.exists():
+            status = "缺失"
+        else:
+            actual = downloadDigest.sha256_file(blob)
+            if actual != entry.sha256:
+                status = "已损坏"
+            elif expected and actual != expected:
+                status = "与发布摘要不一致"
+            elif expected:
+                status = "通过"
+            else:
+                status = "通过 (无发布摘要, 仅校验缓存完整性)"
+        ok = status.startswith("通过")
+        all_ok = all_ok and ok
+        print(f"  {'✓' if ok else '✗'} {entry.key:<40} {entry.sha256[:12]}  {status}")
+
+    if not all_ok:
+        print("存在校验失败的缓存条目, 可使用 --cache-prune 清理")
+    return all_ok
+
+
+def print_cache_info(cache: Optional[ArtifactCache] = None):
+    """
+    打印缓存内容
+    """
+    cache = cache or ArtifactCache()
+    entries = cache.entries()
+    print(f"缓存目录: {cache.cache_dir}")
+    print(
+        f"已用空间: {cache.total_size() / 1024 / 1024:.2f} MB / "
+        f"{cache.max_bytes / 1024 / 1024:.2f} MB"
+    )
+    if not entries:
+        print("缓存为空")
+        return
+    for entry in entries:
+        last_used = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.last_used))
+        print(
+            f"  {entry.key:<40} {entry.size / 1024 / 1024:>8.2f} MB  "
+            f"{entry.sha256[:12]}  最近使用: {last_used}"
+        )
@@ -0,0 +1,456 @@
+"""
+ASAR 读写
+文件头只解析一次, 建立以路径为键的紧凑索引 (AsarEntry 使用 __slots__); 文件内容以整个归档 mmap 的
+memoryview 切片返回, 不产生复制。unpacked 的文件从归档旁的 .unpacked 目录读取, 符号链接显式解析
+完整解包时一次建立全部目录, 再由线程池写出文件; Linux 上由内核直接从归档复制 (copy_file_range / sendfile),
+不经过用户态缓冲区, 其他平台写出 mmap 切片
+
+ASAR 格式: [Pickle(uint32 文件头大小)][Pickle(string 文件头 JSON)][数据区]
+文件头 JSON 中各文件的 offset (字符串) 为相对数据区起点的偏移; unpacked 的文件与符号链接不占用数据区
+"""
+
+import errno
+import json
+import mmap
+import os
+import posixpath
+import shutil
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from loguru import logger as log
+
+from config import config
+from utils import asarIntegrity, parallelUnzip
+
+
+COPY_BUFFER_SIZE = 1024 * 1024
+MAX_LINK_DEPTH = 32
+UINT32 = struct.Struct("<I")
+
+FILE = "FILE"
+DIRECTORY = "DIRECTORY"
+LINK = "LINK"
+
+# 写入数据区的内容: 字节类对象 (含 memoryview) 或从磁盘读取的文件
+Payload = Union[bytes, bytearray, memoryview, Path]
+
+
+class AsarFormatError(Exception):
+    """文件不是可识别的 ASAR 格式"""
+
+
+class AsarEntry:
+    """文件头中的一个条目; offset 为相对数据区起点的偏移"""
+
+    __slots__ = ("path", "kind", "size", "offset", "unpacked", "executable", "link", "node")
+
+    def __init__(self, path: str, kind: str, node: dict):
+        self.path = path
+        self.kind = kind
+        self.node = node  # 文件头中对应的 JSON 对象
+        self.size = int(node.get("size", 0))
+        self.offset = int(node["offset"]) if "offset" in node else None
+        self.unpacked = bool(node.get("unpacked", False))
+        self.executable = bool(node.get("executable", False))
+        self.link = node.get("link")
+
+    @property
+    def integrity(self) -> Optional[dict]:
+        return self.node.get("integrity")
+
+    def __repr__(self) -> str:
+        return f"AsarEntry({self.path!r}, {self.kind}, size={self.size})"
+
+
+def read_header(f) -> Tuple[dict, int]:
+    """
+    读取 ASAR 文件头
+
+    Returns:
+        Tuple[dict, int]: (文件头, 数据区起始偏移)
+
+    Raises:
+        AsarFormatError: 文件头无效
+    """
+    prefix = f.read(8)
+    if len(prefix) != 8:
+        raise AsarFormatError("文件过短")
+    size_payload, header_size = struct.unpack("<II", prefix)
+    if size_payload != 4 or header_size < 8:
+        raise AsarFormatError("文件头大小字段无效")
+    pickle = f.read(header_size)
+    if len(pickle) != header_size:
+        raise AsarFormatError("文件头不完整")
+    payload_size, json_size = struct.unpack_from("<II", pickle)
+    if payload_size + 4 > header_size or json_size + 4 > payload_size:
+        raise AsarFormatError("文件头长度字段无效")
+    try:
+        header = json.loads(pickle[8 : 8 + json_size].decode("utf-8"))
+    except ValueError as e:
+        raise AsarFormatError(f"文件头 JSON 无效: {e}")
+    if not isinstance(header, dict) or not isinstance(header.get("files"), dict):
+        raise AsarFormatError("文件头缺少 files")
+    return header, 8 + header_size
+
+
+def encode_header(header: dict) -> bytes:
+    """按 Pickle 格式编码文件头 (字符串按 4 字节对齐)"""
+    data = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    padding = -len(data) % 4
+    payload = UINT32.pack(len(data)) + data + b"\0" * padding
+    pickle = UINT32.pack(len(payload)) + payload
+    return UINT32.pack(4) + UINT32.pack(len(pickle)) + pickle
+
+
+def iter_nodes(node: dict, prefix: str = "") -> Iterator[Tuple[str, str, dict]]:
+    """按文件头中的顺序遍历全部条目 (目录先于其内容), 产出 (路径, 类型, JSON 对象), 路径以 "/" 分隔"""
+    for name, child in node.get("files", {}).items():
+        path = f"{prefix}{name}"
+        if "files" in child:
+            yield path, DIRECTORY, child
+            yield from iter_nodes(child, path + "/")
+        elif "link" in child:
+            yield path, LINK, child
+        else:
+            yield path, FILE, child
+
+
+def iter_files(node: dict, prefix: str = "") -> Iterator[Tuple[str, dict]]:
+    """按文件头中的顺序遍历文件条目 (不含目录与符号链接)"""
+    for path, kind, child in iter_nodes(node, prefix):
+        if kind == FILE:
+            yield path, child
+
+
+def read_file_chunks(path: Path) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        yield from iter(lambda: f.read(COPY_BUFFER_SIZE), b"")
+
+
+# 内核复制不可用 (文件系统或内核不支持) 时不再尝试
+_kernel_copy = {
+    "copy_file_range": hasattr(os, "copy_file_range"),
+    "sendfile": sys.platform.startswith("linux") and hasattr(os, "sendfile"),
+}
+_KERNEL_COPY_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+
+
+def _kernel_copy_range(src_fd: int, dst_fd: int, offset: int, size: int) -> bool:
+    """
+    由内核从 src_fd 的 offset 处复制 size 字节到 dst_fd 的当前位置 (不改变 src_fd 的读取位置, 可多线程共用)
+
+    Returns:
+        bool: 是否已全部复制; 未开始复制就不受支持时返回 False, 由调用方改用缓冲复制
+    """
+    for method in ("copy_file_range", "sendfile"):
+        if not _kernel_copy[method]:
+            continue
+        copied = 0
+        try:
+            while copied < size:
+                if method == "copy_file_range":
+                    n = os.copy_file_range(src_fd, dst_fd, size - copied, offset_src=offset + copied)
+                else:
+                    n = os.sendfile(dst_fd, src_fd, offset + copied, size - copied)
+                if n == 0:
+                    raise OSError(errno.EIO, "归档数据被截断")
+                copied += n
+            return True
+        except OSError as e:
+            if copied or e.errno not in _KERNEL_COPY_UNSUPPORTED:
+                raise
+            _kernel_copy[method] = False
+    return False
+
+
+class AsarArchive:
+    """
+    只读打开的 ASAR 归档
+
+    read() 返回的 memoryview 引用归档的 mmap, 关闭归档前需先释放 (或不再使用)
+    """
+
+    def __init__(self, path: Path, unpacked_dir: Optional[Path] = None):
+        """
+        Args:
+            path: ASAR 文件
+            unpacked_dir: unpacked 文件所在目录, 默认为 "<path>.unpacked"
+
+        Raises:
+            AsarFormatError: 文件头无效
+            OSError: 文件无法读取
+        """
+        self.path = Path(path)
+        self.unpacked_dir = Path(unpacked_dir) if unpacked_dir else Path(f"{self.path}.unpacked")
+        self._file = open(self.path, "rb")
+        try:
+            self.header, self.body_offset = read_header(self._file)
+            file_size = os.fstat(self._file.fileno()).st_size
+            self._mmap = (
+                mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if file_size else None
+            )
+        except BaseException:
+            self._file.close()
+            raise
+        self._view = memoryview(self._mmap) if self._mmap else memoryview(b"")
+        self.entries: List[AsarEntry] = [
+            AsarEntry(path, kind, node) for path, kind, node in iter_nodes(self.header)
+        ]
+        self._index: Dict[str, AsarEntry] = {entry.path: entry for entry in self.entries}
+
+        for entry in self.entries:
+            if entry.kind == FILE and not entry.unpacked:
+                if (
+                    entry.offset is None
+                    or self.body_offset + entry.offset + entry.size > len(self._view)
+                ):
+                    self.close()
+                    raise AsarFormatError(f"{entry.path} 的 offset 缺失或超出数据区范围")
+
+    def __enter__(self) -> "AsarArchive":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._view.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # 调用方仍持有 read() 返回的切片, mmap 随其释放
+                log.debug(f"{self.path.name} 的内容仍被引用, 延后关闭映射")
+        self._file.close()
+
+    def files(self) -> Iterator[AsarEntry]:
+        return (entry for entry in self.entries if entry.kind == FILE)
+
+    def get(self, path: str) -> Optional[AsarEntry]:
+        return self._index.get(path.replace("\\", "/").strip("/"))
+
+    def resolve(self, path: str) -> AsarEntry:
+        """
+        解析路径 (包括路径中的符号链接) 到最终的条目
+
+        Raises:
+            FileNotFoundError: 条目不存在或链接指向归档之外
+        """
+        parts = path.replace("\\", "/").strip("/").split("/")
+        current = ""
+        depth = 0
+        while parts:
+            part = parts.pop(0)
+            if part in ("", "."):
+                continue
+            current = posixpath.dirname(current) if part == ".." else posixpath.join(current, part)
+            entry = self._index.get(current)
+            if entry is None:
+                raise FileNotFoundError(f"{path} 不存在于 {self.path.name}")
+            if entry.kind == LINK:
+                depth += 1
+                if depth > MAX_LINK_DEPTH:
+                    raise FileNotFoundError(f"{path} 的符号链接层数过多")
+                # 链接目标相对归档根目录
+                parts = entry.link.replace("\\", "/").split("/") + parts
+                current = ""
+        return self._index[current] if current else AsarEntry("", DIRECTORY, self.header)
+
+    def unpacked_path(self, entry: AsarEntry) -> Path:
+        return self.unpacked_dir.joinpath(*entry.path.split("/"))
+
+    def read(self, path: Union[str, AsarEntry]) -> memoryview:
+        """
+        读取文件内容
+
+        Returns:
+            memoryview: 打包的文件为归档 mmap 的只读切片; unpacked 的文件从磁盘读取
+
+        Raises:
+            FileNotFoundError: 条目不存在、是目录或 unpacked 文件缺失
+        """
+        entry = path if isinstance(path, AsarEntry) else self.resolve(path)
+        if entry.kind == LINK:
+            entry = self.resolve(entry.path)
+        if entry.kind != FILE:
+            raise FileNotFoundError(f"{entry.path} 不是文件")
+        if entry.unpacked:
+            return memoryview(self.unpacked_path(entry).read_bytes())
+        return self.body_slice(entry.offset, entry.size)
+
+    def body_slice(self, offset: int, size: int) -> memoryview:
+        """数据区中从 offset 开始的 size 字节 (mmap 的只读切片)"""
+        start = self.body_offset + offset
+        return self._view[start : start + size]
+
+    def _write_file(self, entry: AsarEntry, target: Path) -> int:
+        if entry.unpacked:
+            source = self.unpacked_path(entry)
+            if not source.exists():
+                log.warning(f"unpacked 文件 {source} 不存在, 跳过")
+                return 0
+            shutil.copyfile(source, target)
+            return entry.size
+        with open(target, "wb") as f:
+            if entry.size and not _kernel_copy_range(
+                self._file.fileno(), f.fileno(), self.body_offset + entry.offset, entry.size
+            ):
+                f.write(self.read(entry))
+        return entry.size
+
+    def extract(self, dst: Path, workers: Optional[int] = None) -> parallelUnzip.ExtractStats:
+        """
+        解包到 dst 目录
+
+        unpacked 文件缺失时跳过并记录警告; 无法创建符号链接时复制链接目标
+
+        Args:
+            dst: 解包目标目录
+            workers: 写出文件的线程数, 默认为 EXTRACT_WORKERS
+
+        Returns:
+            ExtractStats: 解包统计
+        """
+        started = time.perf_counter()
+        dst = Path(dst)
+        files, links = [], []
+        directories = {dst}
+        for entry in self.entries:
+            # 与解压 ZIP 相同, 忽略条目名中的 ".." 等路径成分
+            target = parallelUnzip.target_path(dst, entry.path)
+            if entry.kind == DIRECTORY:
+                directories.add(target)
+                continue
+            directories.add(target.parent)
+            (links if entry.kind == LINK else files).append((entry, target))
+        for directory in sorted(directories):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        # 大文件优先, 减少最后只剩一个线程在工作的时间
+        files.sort(key=lambda item: item[0].size, reverse=True)
+        workers = max(1, min(workers or config.EXTRACT_WORKERS, len(files)))
+        written = 0
+        if workers == 1:
+            for entry, target in files:
+                written += self._write_file(entry, target)
+        else:
+            lock = threading.Lock()
+            queue = iter(files)
+
+            def work() -> int:
+                total = 0
+                while True:
+                    with lock:
+                        item = next(queue, None)
+                    if item is None:
+                        return total
+                    total += self._write_file(*item)
+
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asar-extract") as executor:
+                futures = [executor.submit(work) for _ in range(workers)]
+            written = sum(future.result() for future in futures)
+
+        # 链接在其目标写出后再创建
+        for entry, target in links:
+            if target.is_symlink() or target.exists():
+                target.unlink()
+            link_target = os.path.relpath(
+                dst.joinpath(*entry.link.replace("\\", "/").split("/")), target.parent
+            )
+            try:
+                target.symlink_to(link_target)
+            except OSError:
+                resolved = self.resolve(entry.path)
+                if resolved.kind == FILE:
+                    written += self._write_file(resolved, target)
+                else:
+                    log.warning(f"无法创建符号链接 {entry.path} -> {entry.link}, 跳过")
+
+        return parallelUnzip.ExtractStats(
+            len(files), written, time.perf_counter() - started, workers
+        )
+
+
+def write_archive(output_path: Path, header: dict, payloads: Iterable[Payload]) -> int:
+    """
+    写出 ASAR 文件: 文件头之后依次写入 payloads (须与文件头中的 offset 一致)
+
+    先写入 "<output_path>.tmp", 完成后替换, 失败时删除
+
+    Returns:
+        int: 数据区字节数
+    """
+    tmp_path = Path(f"{output_path}.tmp")
+    written = 0
+    try:
+        with open(tmp_path, "wb") as dst:
+            dst.write(encode_header(header))
+            for payload in payloads:
+                if isinstance(payload, Path):
+                    for chunk in read_file_chunks(payload):
+                        written += dst.write(chunk)
+                else:
+                    written += dst.write(payload)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return written
+
+
+def create_archive(src_dir: Path, output_path: Path, integrity: bool = True) -> int:
+    """
+    将目录打包为 ASAR 文件; 指向目录内部的符号链接保存为链接, 其余按普通文件打包
+
+    Args:
+        integrity: 为每个文件生成 integrity 字段 (并行计算, 见 asarIntegrity)
+
+    Returns:
+        int: 打包的文件数
+    """
+    src_dir = Path(src_dir)
+    header: dict = {"files": {}}
+    payloads: List[Path] = []
+    entries: List[dict] = []
+    offset = 0
+
+    def add_dir(directory: Path, node: dict):
+        nonlocal offset
+        for child in sorted(directory.iterdir(), key=lambda p: p.name):
+            if child.is_symlink():
+                resolved = child.resolve()
+                try:
+                    link = resolved.relative_to(src_dir.resolve()).as_posix()
+                except ValueError:
+                    link = None
+                if link is not None:
+                    node[child.name] = {"link": link}
+                    continue
+            if child.is_dir():
+                node[child.name] = {"files": {}}
+                add_dir(child, node[child.name]["files"])
+                continue
+            size = child.stat().st_size
+            entry: dict = {"size": size, "offset": str(offset)}
+            if os.name != "nt" and os.access(child, os.X_OK):
+                entry["executable"] = True
+            node[child.name] = entry
+            payloads.append(child)
+            entries.append(entry)
+            offset += size
+
+    add_dir(src_dir, header["files"])
+    if integrity:
+        with ExitStack() as stack:
+            buffers = [stack.enter_context(asarIntegrity.map_file(path)) for path in payloads]
+            for entry, value in zip(entries, asarIntegrity.compute_many(buffers)):
+                entry["integrity"] = value
+    write_archive(output_path, header, payloads)
+    return len(payloads)
@@ -0,0 +1,234 @@
+"""
+ASAR 文件完整性 (Electron 文件头中的 integrity 字段)
+每个文件记录整个文件的 SHA256 与每 4 MB 块的 SHA256。hashlib 计算时释放 GIL, 因此把各文件的整体哈希与
+各个块的哈希拆成独立任务交给线程池, 大文件的块与其他文件并行计算; 数据直接取自 mmap, 不读入内存
+"""
+
+import hashlib
+import mmap
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+from config import config
+
+
+BLOCK_SIZE = 4 * 1024 * 1024
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def _sha256(data: Buffer) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _finish_blocks(size: int, whole: str, blocks: List[str], block_size: int) -> List[str]:
+    """
+    与 @electron/asar 相同: 最后总有一个 (可能为空的) 块, 因此大小为块大小整数倍的文件末尾多一个空块的哈希
+    """
+    blocks = blocks or [whole]
+    if size and size % block_size == 0:
+        blocks.append(EMPTY_SHA256)
+    return blocks
+
+
+def _blocks_match(actual: List[str], expected: List[str]) -> bool:
+    """部分打包工具不记录末尾的空块, 两种写法都视为一致"""
+    if actual == expected:
+        return True
+    return bool(actual) and actual[-1] == EMPTY_SHA256 and actual[:-1] == expected
+
+
+def compute_integrity(data: Buffer, block_size: int = BLOCK_SIZE) -> dict:
+    """单个文件的 integrity 字段"""
+    view = memoryview(data)
+    whole = _sha256(view)
+    blocks = (
+        [_sha256(view[i : i + block_size]) for i in range(0, len(view), block_size)]
+        if len(view) > block_size
+        else []
+    )
+    return {
+        "algorithm": "SHA256",
+        "hash": whole,
+        "blockSize": block_size,
+        "blocks": _finish_blocks(len(view), whole, blocks, block_size),
+    }
+
+
+def compute_many(
+    buffers: Sequence[Buffer], block_size: int = BLOCK_SIZE, workers: Optional[int] = None
+) -> List[dict]:
+    """
+    并行计算多个文件的 integrity 字段
+
+    Args:
+        buffers: 各文件的内容 (通常为 mmap 的 memoryview 切片)
+        block_size: 块大小
+        workers: 线程数, 默认为 ASAR_INTEGRITY_WORKERS
+
+    Returns:
+        List[dict]: 与 buffers 一一对应的 integrity 字段
+    """
+    views = [memoryview(buffer) for buffer in buffers]
+    sizes = [len(view) for view in views]
+    # 任务: (字节数, 文件序号, 块序号); 块序号为 None 表示整个文件
+    tasks = []
+    for index, view in enumerate(views):
+        tasks.append((len(view), index, None))
+        if len(view) > block_size:
+            tasks.extend(
+                (min(block_size, len(view) - start), index, start // block_size)
+                for start in range(0, len(view), block_size)
+            )
+    # 整体哈希无法拆分, 大文件的整体哈希最先开始
+    tasks.sort(key=lambda task: task[0], reverse=True)
+
+    def run(task) -> str:
+        _, index, block = task
+        view = views[index]
+        if block is None:
+            return _sha256(view)
+        return _sha256(view[block * block_size : (block + 1) * block_size])
+
+    workers = max(1, min(workers or config.ASAR_INTEGRITY_WORKERS, len(tasks)))
+    try:
+        if workers == 1:
+            digests = list(map(run, tasks))
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asar-hash") as executor:
+                digests = list(executor.map(run, tasks))
+    finally:
+        # 及时释放对 mmap 的引用, 以便调用方关闭映射
+        for view in views:
+            view.release()
+
+    wholes = [""] * len(views)
+    blocks: List[List[Tuple[int, str]]] = [[] for _ in views]
+    for (_, index, block), digest in zip(tasks, digests):
+        if block is None:
+            wholes[index] = digest
+        else:
+            blocks[index].append((block, digest))
+    return [
+        {
+            "algorithm": "SHA256",
+            "hash": whole,
+            "blockSize": block_size,
+            "blocks": _finish_blocks(
+                size, whole, [digest for _, digest in sorted(file_blocks)], block_size
+            ),
+        }
+        for size, whole, file_blocks in zip(sizes, wholes, blocks)
+    ]
+
+
+@contextmanager
+def map_file(path: Path) -> Iterator[Buffer]:
+    """只读映射文件; 空文件与小于一个块的文件直接读入"""
+    size = os.path.getsize(path)
+    if size < BLOCK_SIZE:
+        yield Path(path).read_bytes()
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+
+
+@dataclass
+class IntegrityReport:
+    checked: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    missing: List[str] = field(default_factory=list)  # 文件头中没有 integrity 的文件
+    mismatched: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatched
+
+    def describe(self) -> str:
+        return (
+            f"校验 {self.checked} 个文件 ({self.bytes / 1024 / 1024:.2f} MB), "
+            f"不一致 {len(self.mismatched)} 个, 无 integrity {len(self.missing)} 个, "
+            f"用时 {self.seconds:.2f}s"
+        )
+
+
+def verify_archive(archive, workers: Optional[int] = None) -> IntegrityReport:
+    """
+    并行校验已打开的 ASAR (asarArchive.AsarArchive) 中各文件的 integrity
+
+    Returns:
+        IntegrityReport: 校验结果; unpacked 文件缺失时记为不一致
+    """
+    started = time.perf_counter()
+    report = IntegrityReport()
+    # 按块大小分组计算 (通常只有 4 MB 一种)
+    groups = {}
+    for entry in archive.files():
+        integrity = entry.integrity
+        if not integrity:
+            report.missing.append(entry.path)
+            continue
+        if integrity.get("algorithm", "SHA256") != "SHA256":
+            report.mismatched.append(entry.path)
+            continue
+        groups.setdefault(int(integrity.get("blockSize", BLOCK_SIZE)), []).append(entry)
+
+    for block_size, entries in groups.items():
+        buffers, checked = [], []
+        for entry in entries:
+            try:
+                buffers.append(archive.read(entry))
+                checked.append(entry)
+            except OSError:
+                report.mismatched.append(entry.path)
+        try:
+            results = compute_many(buffers, block_size, workers)
+        finally:
+            for buffer in buffers:
+                buffer.release()
+        for entry, actual in zip(checked, results):
+            report.checked += 1
+            report.bytes += entry.size
+            expected = entry.integrity
+            if actual["hash"] != expected.get("hash") or not _blocks_match(
+                actual["blocks"], expected.get("blocks", actual["blocks"])
+            ):
+                report.mismatched.append(entry.path)
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def verify_asar_file(path: Path) -> bool:
+    """
+    校验 ASAR 文件中各文件的 integrity 并打印结果
+
+    Returns:
+        bool: 没有不一致的文件
+    """
+    from utils import asarArchive
+
+    try:
+        with asarArchive.AsarArchive(Path(path)) as archive:
+            report = verify_archive(archive)
+    except (OSError, asarArchive.AsarFormatError) as e:
+        print(f"无法读取 {path}: {e}")
+        return False
+
+    for name in report.mismatched:
+        print(f"  ✗ {name}")
+    print(report.describe())
+    if report.missing and not report.checked:
+        print("该 ASAR 的文件头不包含 integrity 信息")
+    return report.ok
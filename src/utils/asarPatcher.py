@@ -1,114 +1,58 @@
+import json
 import os
 import shutil
-from asar import extract_archive, create_archive, AsarArchive
 from pathlib import Path
 from loguru import logger as log
 
-"""
-这些全是笨蛋希沃和笨蛋asar库的造的孽
-也不知道这段代码咋样反正它就是跑起来了就这样吧
-"""
-
-
-def _new_parse_metadata(self, info, path_in):
-    for name, child in info["files"].items():
-        cur_path = path_in / name
-        node = self._search_node_from_path(cur_path, create=True)
-
-        if "files" in child:
-            node.unpacked = child.get("unpacked", False)
-            setattr(node, "type", "DIRECTORY")
-            node.files = {}
-            _new_parse_metadata(self, child, cur_path)
-        elif "link" in child:
-            setattr(node, "type", "LINK")
-            node.link = Path(child["link"])
-        else:
-            node.unpacked = child.get("unpacked", False)
-            setattr(node, "type", "FILE")
-            node.size = child["size"]
-            node.integrity = child.get("integrity", {})
-
-            if node.unpacked:
-                node.file_path = self.asar_unpacked / node.path
-            else:
-                node.offset = int(child["offset"])
-                if hasattr(self, "_asar_io") and self._asar_io is not None:
-                    from asar.limited_reader import LimitedReader
-
-                    node.file_reader = LimitedReader(
-                        self._asar_io, self._offset + node.offset, node.size
-                    )
-                else:
-                    node.file_reader = None
-                    log.debug(
-                        f"文件 {cur_path} 的 _asar_io 无效，跳过 LimitedReader 创建"
-                    )
-
-
-def _new_extract(self, dst: Path = None):  # type: ignore
-    dst = dst if dst else Path.cwd()
-    dst.mkdir(parents=True, exist_ok=True)
-
-    for meta in self.metas:
-        cur_dst = dst / meta.path
-
-        try:
-            if getattr(meta, "type", None) == "DIRECTORY" or (
-                hasattr(meta, "files") and meta.files
-            ):
-                cur_dst.mkdir(parents=True, exist_ok=True)
-            elif getattr(meta, "type", None) == "LINK":
-                src_link = dst / meta.link
-                try:
-                    cur_dst.symlink_to(src_link)
-                except (FileExistsError, OSError):
-                    if cur_dst.exists():
-                        cur_dst.unlink()
-                    cur_dst.symlink_to(src_link)
-            elif getattr(meta, "unpacked", False):
-                if (
-                    hasattr(meta, "file_path")
-                    and meta.file_path
-                    and meta.file_path.exists()
-                ):
-                    shutil.copy2(meta.file_path, cur_dst)
-            else:
-                if hasattr(meta, "file_reader") and meta.file_reader is not None:
-                    try:
-                        with cur_dst.open("wb") as writer:
-                            meta.file_reader.seek(0)
-                            shutil.copyfileobj(meta.file_reader, writer)
-                    except AttributeError as e:
-                        if "'NoneType' object has no attribute 'seek'" in str(e):
-                            log.warning(f"文件 {meta.path} 的 file_reader 无效，跳过")
-                        else:
-                            raise
-                else:
-                    log.warning(f"文件 {meta.path} 没有有效的 file_reader，无法提取")
-
-        except Exception as e:
-            log.error(f"提取文件 {meta.path} 时出错: {e}")
-
-
-_original_parse_metadata = AsarArchive._parse_metadata
-_original_extract = AsarArchive.extract
-AsarArchive._parse_metadata = _new_parse_metadata
-AsarArchive.extract = _new_extract
-
-"""
-下面才是真正的修改ASAR文件的代码
-上面的啥也不是（雾
-"""
+from config import config
+from utils import asarArchive, asarRepacker, mainjsPatcher
+
+# 修补后的 ASAR 缓存键的一部分 (见 patchedAsarCache), 修改打包方式时递增; 修补规则的变化由规则表摘要体现
+PATCHER_VERSION = "1"
+
+
+def detect_seewo_version(input_asar_path):
+    """
+    读取 ASAR 中 package.json 的 version
+
+    Returns:
+        Optional[str]: 无法读取时为 None
+    """
+    try:
+        with asarArchive.AsarArchive(Path(input_asar_path)) as archive:
+            entry = archive.get("package.json")
+            if entry is None:
+                return None
+            version = json.loads(bytes(archive.read(entry)).decode("utf-8")).get("version")
+    except (OSError, ValueError, asarArchive.AsarFormatError) as e:
+        log.warning(f"无法读取希沃管家版本: {e}")
+        return None
+    return str(version) if version else None
+
+
+def select_rule_set(input_asar_path):
+    version = detect_seewo_version(input_asar_path)
+    rule_set = mainjsPatcher.select_rule_set(version)
+    log.info(f"希沃管家版本: {version or '未知'}, 使用修补规则表 {rule_set.name}")
+    return rule_set
+
+
+def patcher_version(input_asar_path):
+    """修补程序版本与所选规则表的摘要, 用作修补后 ASAR 缓存的键"""
+    rule_set = mainjsPatcher.select_rule_set(detect_seewo_version(input_asar_path))
+    return f"{PATCHER_VERSION}-{rule_set.fingerprint}"
 
 
 def patch_asar_file(input_asar_path, temp_extract_dir, output_asar_path, core_dir):
     """
-    解包、修改并重新打包 ASAR 文件
+    修改 ASAR 文件: 替换 main.js 并加入 core 目录中的文件
+
+    默认直接从原 ASAR 流式重新打包 (见 asarRepacker); ASAR_STREAMING_REPACK 关闭时解包到临时目录,
+    修改后重新打包, 便于检查修改后的文件
 
     Args:
         input_asar_path (str): 输入的 ASAR 文件完整路径
-        temp_extract_dir (str): 解包临时目录位置
+        temp_extract_dir (str): 解包临时目录位置 (仅在不使用流式重新打包时使用)
         output_asar_path (str): 修改后打包的 ASAR 文件完整路径
         core_dir (str): HugoAura 本体的 core 目录位置
 
@@ -119,16 +63,30 @@ def patch_asar_file(input_asar_path, temp_extract_dir, output_asar_path, core_di
         # 目录检查准备
         if not os.path.exists(core_dir):
             raise FileNotFoundError(f"Core 未找到: {core_dir}")
+        os.makedirs(os.path.dirname(output_asar_path), exist_ok=True)
+        rule_set = select_rule_set(input_asar_path)
+
+        if config.ASAR_STREAMING_REPACK:
+            stats = asarRepacker.repack(
+                Path(input_asar_path),
+                Path(output_asar_path),
+                replacements={"main.js": lambda data: patch_mainjs_bytes(data, rule_set)},
+                overlay_dir=Path(core_dir),
+            )
+            log.info(f"ASAR 重新打包完成: {stats.describe()}")
+            return (True, output_asar_path)
+
         if os.path.exists(temp_extract_dir):
             shutil.rmtree(temp_extract_dir)
         os.makedirs(temp_extract_dir)
-        os.makedirs(os.path.dirname(output_asar_path), exist_ok=True)
 
         # 解包 ASAR 文件
-        extract_archive(Path(input_asar_path), Path(temp_extract_dir))
+        with asarArchive.AsarArchive(Path(input_asar_path)) as archive:
+            stats = archive.extract(Path(temp_extract_dir))
+        log.info(f"ASAR 解包完成: {stats.describe()}")
 
         # 修改 ASRR 文件
-        mainjs_patch(temp_extract_dir)
+        mainjs_patch(temp_extract_dir, rule_set)
         for item in os.listdir(core_dir):
             src = os.path.join(core_dir, item)
             dst = os.path.join(temp_extract_dir, item)
@@ -138,14 +96,33 @@ def patch_asar_file(input_asar_path, temp_extract_dir, output_asar_path, core_di
                 shutil.copy2(src, dst)
 
         # 打包 ASAR 文件
-        create_archive(Path(temp_extract_dir), Path(output_asar_path))
+        asarArchive.create_archive(Path(temp_extract_dir), Path(output_asar_path))
         return (True, output_asar_path)
 
     except Exception as e:
         return (False, e)
 
 
-def mainjs_patch(extracted_dir):
+def patch_mainjs_content(content, rule_set=None):
+    """
+    按规则表修补 main.js 的内容
+
+    Raises:
+        mainjsPatcher.PatchError: 必需的锚点缺失或匹配次数不符
+    """
+    rule_set = rule_set or mainjsPatcher.select_rule_set(None)
+    content, report = mainjsPatcher.apply(content, rule_set)
+    for problem in report.problems:
+        log.warning(f"main.js 修补: {problem}")
+    log.info(f"main.js 修补完成: {report.describe()}")
+    return content
+
+
+def patch_mainjs_bytes(data, rule_set=None):
+    return patch_mainjs_content(data.decode("utf-8"), rule_set).encode("utf-8")
+
+
+def mainjs_patch(extracted_dir, rule_set=None):
     main_js_path = os.path.join(extracted_dir, "main.js")
 
     if not os.path.exists(main_js_path):
@@ -154,21 +131,7 @@ def mainjs_patch(extracted_dir):
     with open(main_js_path, "r", encoding="utf-8") as f:
         content = f.read()
 
-    # TODO: Change impl to regex match & Add replace failed err handling
-
-    content = 'const hook = require("./hook.js");\n' + content
-    content = content.replace(
-        "o.l=!0,o.exports}n.m=e",
-        'o.l=!0,o.exports};const zeron = require("./zeron.js");n = zeron(n);n.m=e',
-    )
-    content = content.replace(
-        "let f=new s(Object.assign({},{transparent:!0,",
-        ";hook({ central: n, windowName: this.wname, config: c });let f=new s(Object.assign({},{transparent:!0,",
-    )
-    content = content.replace(
-        "enableRemoteModule:!0,devTools:!!c.canOpenDevTool},parent:this.parentWindow||null",
-        'enableRemoteModule:!0,devTools:!!c.canOpenDevTool,preload: __dirname + "\\\\preload.js"},parent:this.parentWindow||null',
-    )
+    content = patch_mainjs_content(content, rule_set)
 
     with open(main_js_path, "w", encoding="utf-8") as f:
         f.write(content)
@@ -0,0 +1,184 @@
+"""
+ASAR 流式重新打包
+不解包原始 ASAR: 读取其文件头, 未修改的文件按原偏移从原文件逐字节复制, 需要修改的文件 (如 main.js) 替换为
+修改后的内容, 再叠加 core 目录中的文件, 一次写出新的文件头与数据区
+"""
+
+import os
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger as log
+
+from utils import asarArchive, asarIntegrity
+from utils.asarArchive import Payload
+
+
+@dataclass
+class RepackStats:
+    files: int = 0
+    copied_bytes: int = 0  # 从原 ASAR 原样复制
+    written_bytes: int = 0  # 替换或新增的内容
+    seconds: float = 0.0
+
+    def describe(self) -> str:
+        return (
+            f"{self.files} 个文件, 原样复制 {self.copied_bytes / 1024 / 1024:.2f} MB, "
+            f"写入新内容 {self.written_bytes / 1024 / 1024:.2f} MB, 用时 {self.seconds:.2f}s"
+        )
+
+
+def _parent_node(header: dict, path: str) -> dict:
+    node = header
+    for part in path.split("/")[:-1]:
+        files = node.setdefault("files", {})
+        child = files.get(part)
+        if child is None or "files" not in child:
+            # 同名文件被目录取代
+            child = files[part] = {"files": {}}
+        node = child
+    return node
+
+
+def _set_entry(header: dict, path: str, size: int):
+    """写入新内容的文件: 保留原条目的其他字段 (如 executable), 偏移与 integrity 随后重新计算"""
+    files = _parent_node(header, path).setdefault("files", {})
+    name = path.split("/")[-1]
+    existing = files.get(name)
+    node = dict(existing) if existing and "files" not in existing else {}
+    # 新内容写入数据区, 原条目的解包标记与符号链接目标也不再适用
+    for key in ("offset", "integrity", "unpacked", "link"):
+        node.pop(key, None)
+    node["size"] = size
+    files[name] = node
+
+
+def _fill_integrity(archive: asarArchive.AsarArchive, header: dict, sources: Dict[str, object]):
+    """为缺少 integrity 的文件并行计算 (原样复制的文件直接取 mmap 切片)"""
+    pending = [
+        (path, entry)
+        for path, entry in asarArchive.iter_files(header)
+        if path in sources and not entry.get("unpacked") and not entry.get("integrity")
+    ]
+    if not pending:
+        return
+    with ExitStack() as stack:
+        buffers = []
+        for path, _ in pending:
+            source = sources[path]
+            if isinstance(source, tuple):
+                buffers.append(archive.body_slice(*source))
+            elif isinstance(source, Path):
+                buffers.append(stack.enter_context(asarIntegrity.map_file(source)))
+            else:
+                buffers.append(source)
+        for (_, entry), value in zip(pending, asarIntegrity.compute_many(buffers)):
+            entry["integrity"] = value
+        for buffer in buffers:
+            if isinstance(buffer, memoryview):
+                buffer.release()
+
+
+def repack(
+    input_path: Path,
+    output_path: Path,
+    replacements: Optional[Dict[str, Callable[[bytes], bytes]]] = None,
+    overlay_dir: Optional[Path] = None,
+    integrity: bool = True,
+) -> RepackStats:
+    """
+    流式重新打包 ASAR
+
+    Args:
+        input_path: 原 ASAR 文件
+        output_path: 输出的 ASAR 文件
+        replacements: 文件路径 -> 由原内容生成新内容的函数
+        overlay_dir: 该目录中的文件按相对路径加入 (覆盖同名文件), 相当于复制到解包目录后重新打包
+        integrity: 为写入的每个文件生成 integrity 字段; 原样复制且已带有 integrity 的文件保留原值
+
+    Returns:
+        RepackStats: 统计信息
+
+    Raises:
+        AsarFormatError: 原文件不是可识别的 ASAR
+        FileNotFoundError: replacements 中的文件不存在于原 ASAR 中
+    """
+    started = time.perf_counter()
+    replacements = replacements or {}
+    stats = RepackStats()
+
+    with asarArchive.AsarArchive(input_path) as archive:
+        header = archive.header
+
+        # 路径 -> 原数据区中的 (偏移, 大小) 或新内容
+        sources: Dict[str, object] = {
+            entry.path: (entry.offset, entry.size)
+            for entry in archive.files()
+            if not entry.unpacked
+        }
+
+        for path, transform in replacements.items():
+            entry = archive.get(path)
+            if entry is None or entry.path not in sources:
+                raise FileNotFoundError(f"{path} 不存在于 {input_path}")
+            content = transform(bytes(archive.read(entry)))
+            sources[entry.path] = content
+            _set_entry(header, entry.path, len(content))
+
+        if overlay_dir:
+            for root, dirnames, filenames in os.walk(overlay_dir):
+                # 固定顺序, 相同的输入总是得到相同的输出 (见 patchedAsarCache)
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    file_path = Path(root) / filename
+                    path = file_path.relative_to(overlay_dir).as_posix()
+                    sources[path] = file_path
+                    _set_entry(header, path, file_path.stat().st_size)
+
+        if integrity:
+            _fill_integrity(archive, header, sources)
+
+        # 按文件头顺序重新分配偏移, 与写出数据区的顺序一致;
+        # 原数据区中相邻的条目合并为 mmap 的一个切片, 整段写出
+        payloads: List[Payload] = []
+        run_start = run_size = 0
+        offset = 0
+        for path, entry in asarArchive.iter_files(header):
+            if path not in sources or entry.get("unpacked"):
+                continue
+            entry["offset"] = str(offset)
+            offset += int(entry["size"])
+            stats.files += 1
+            source = sources[path]
+            if isinstance(source, tuple):
+                stats.copied_bytes += source[1]
+                if run_size and source[0] == run_start + run_size:
+                    run_size += source[1]
+                    continue
+                if run_size:
+                    payloads.append(archive.body_slice(run_start, run_size))
+                run_start, run_size = source
+                continue
+            if run_size:
+                payloads.append(archive.body_slice(run_start, run_size))
+                run_size = 0
+            payloads.append(source)
+            stats.written_bytes += (
+                source.stat().st_size if isinstance(source, Path) else len(source)
+            )
+        if run_size:
+            payloads.append(archive.body_slice(run_start, run_size))
+
+        try:
+            asarArchive.write_archive(output_path, header, payloads)
+        finally:
+            for payload in payloads:
+                if isinstance(payload, memoryview):
+                    payload.release()
+
+    stats.seconds = time.perf_counter() - started
+    log.debug(f"重新打包 {Path(input_path).name}: {stats.describe()}")
+    return stats
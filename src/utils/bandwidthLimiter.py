@@ -0,0 +1,70 @@
+"""
+下载限速
+进程内所有下载连接 (单连接、分段、对冲与增量升级) 共享一个令牌桶, 总速率不超过 DOWNLOAD_RATE_LIMIT。
+批量部署时可避免同一出口下的大量机器同时占满带宽
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from config import config
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶
+
+    令牌不足时允许透支, 调用方按透支量等待相应时间; 因此每次取用只需一次加锁, 各连接按到达顺序分享带宽
+
+    Args:
+        rate: 速率 (字节 / 秒)
+        burst: 桶容量 (字节), 空闲后允许的突发量
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else rate * config.DOWNLOAD_RATE_BURST_SECONDS)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, size: int) -> float:
+        """取用 size 个令牌, 返回需要等待的时间"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= size
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def consume(self, size: int):
+        delay = self._reserve(size)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def consume_async(self, size: int):
+        delay = self._reserve(size)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_limiter: Optional[TokenBucket] = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> Optional[TokenBucket]:
+    """进程内共享的令牌桶; 未设置限速时为 None"""
+    global _limiter
+    if config.DOWNLOAD_RATE_LIMIT <= 0:
+        return None
+    with _limiter_lock:
+        if _limiter is None or _limiter.rate != config.DOWNLOAD_RATE_LIMIT:
+            _limiter = TokenBucket(config.DOWNLOAD_RATE_LIMIT)
+        return _limiter
+
+
+def is_limited() -> bool:
+    """限速时实际传输的吞吐量不反映下载源的能力, 不应计入下载源评分"""
+    return config.DOWNLOAD_RATE_LIMIT > 0
@@ -0,0 +1,567 @@
+"""
+增量升级
+本地资源文件缓存中有其他版本的 aura.zip 时, 只以 Range 请求读取远端 aura.zip 末尾的中央目录, 与缓存中旧版本的
+中央目录逐条比对 (名称、CRC32、大小、修改时间与条目占用的字节数); 一致的条目从旧版本 ZIP 中原样复制, 其余部分
+以 Range 请求下载并写入对应位置, 得到与完整下载逐字节相同的 aura.zip, 再按发布信息中的 SHA-256 校验。
+之后与完整下载的文件一样解压或增量同步 (见 incrementalSync)。下载源不支持 Range、没有可用的旧版本、
+变化过多或校验失败时由调用方回退为完整下载
+"""
+
+import asyncio
+import os
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import aiohttp
+from loguru import logger as log
+
+from config import config
+from utils import bandwidthLimiter, downloadDigest, progressReporter
+
+
+# zipfile 模块使用的结构定义
+END_OF_CENTRAL_DIR = struct.Struct("<4s4H2LH")
+ZIP64_END_LOCATOR = struct.Struct("<4sLQL")
+ZIP64_END_OF_CENTRAL_DIR = struct.Struct("<4sQ2H2L4Q")
+CENTRAL_DIR_ENTRY = struct.Struct("<4s4B4HL2L5H2L")
+
+END_OF_CENTRAL_DIR_SIGNATURE = b"PK\x05\x06"
+ZIP64_END_LOCATOR_SIGNATURE = b"PK\x06\x07"
+CENTRAL_DIR_SIGNATURE = b"PK\x01\x02"
+# 中央目录结束记录 (22 字节) + 最长 65535 字节的注释
+TAIL_BYTES = END_OF_CENTRAL_DIR.size + 0xFFFF
+CRC_CHUNK_SIZE = 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class DeltaUnavailable(Exception):
+    """无法进行增量升级, 应回退为完整下载"""
+
+
+class DeltaCancelled(Exception):
+    """下载已取消, 调用方不应再回退为完整下载"""
+
+
+@dataclass
+class ZipEntry:
+    name: str
+    crc: int
+    compressed_size: int
+    file_size: int
+    method: int
+    flags: int
+    header_offset: int
+    mod_time: int = 0
+    mod_date: int = 0
+    data_end: int = 0  # 该条目 (含本地文件头) 在 ZIP 中的结束位置
+
+    def is_dir(self) -> bool:
+        return self.name.endswith("/")
+
+    @property
+    def span(self) -> int:
+        return self.data_end - self.header_offset
+
+    def same_bytes_as(self, other: "ZipEntry") -> bool:
+        """两个 ZIP 中该条目的本地文件头与数据 (应) 逐字节相同"""
+        return (
+            self.name,
+            self.crc,
+            self.compressed_size,
+            self.file_size,
+            self.method,
+            self.flags,
+            self.mod_time,
+            self.mod_date,
+            self.span,
+        ) == (
+            other.name,
+            other.crc,
+            other.compressed_size,
+            other.file_size,
+            other.method,
+            other.flags,
+            other.mod_time,
+            other.mod_date,
+            other.span,
+        )
+
+
+@dataclass
+class ZipLayout:
+    source: str  # URL 或文件路径
+    size: int
+    entries: List[ZipEntry]
+    central_dir_offset: int
+    trailer: bytes  # 中央目录起至文件末尾的全部字节
+    metadata_bytes: int = 0  # 读取中央目录时下载的字节数
+
+
+def _headers(range_value: str) -> dict:
+    return {
+        "Accept-Encoding": "",
+        "User-Agent": config.DOWNLOAD_USER_AGENT,
+        "Range": f"bytes={range_value}",
+    }
+
+
+async def _fetch_range(
+    session: aiohttp.ClientSession, url: str, range_value: str
+) -> Tuple[int, int, bytes]:
+    """
+    Returns:
+        (响应数据在文件中的起始位置, 文件总大小, 数据)
+    """
+    async with session.get(url, headers=_headers(range_value)) as r:
+        if r.status != 206:
+            raise DeltaUnavailable(f"下载源不支持 Range 请求 (HTTP {r.status})")
+        # Content-Range: bytes 1000-12344/12345
+        content_range = r.headers.get("content-range", "")
+        try:
+            start = int(content_range.split(" ")[-1].split("-")[0])
+            total = int(content_range.rsplit("/", 1)[-1])
+        except ValueError:
+            raise DeltaUnavailable(f"无法解析 Content-Range: {content_range!r}")
+        data = await r.read()
+    limiter = bandwidthLimiter.get_limiter()
+    if limiter:
+        await limiter.consume_async(len(data))
+    return start, total, data
+
+
+def _find_end_record(tail_data: bytes) -> Tuple[int, int, int, Optional[int]]:
+    """
+    解析中央目录结束记录
+
+    Returns:
+        (条目数, 中央目录大小, 中央目录位置, Zip64 中央目录结束记录的位置); 不是 Zip64 时最后一项为 None
+    """
+    eocd_pos = tail_data.rfind(END_OF_CENTRAL_DIR_SIGNATURE)
+    if eocd_pos < 0 or eocd_pos + END_OF_CENTRAL_DIR.size > len(tail_data):
+        raise DeltaUnavailable("未找到中央目录结束记录")
+    (_, _, _, _, entry_count, cd_size, cd_offset, _) = END_OF_CENTRAL_DIR.unpack_from(
+        tail_data, eocd_pos
+    )
+    if cd_offset != 0xFFFFFFFF and cd_size != 0xFFFFFFFF and entry_count != 0xFFFF:
+        return entry_count, cd_size, cd_offset, None
+    locator_pos = eocd_pos - ZIP64_END_LOCATOR.size
+    if locator_pos < 0 or tail_data[locator_pos : locator_pos + 4] != ZIP64_END_LOCATOR_SIGNATURE:
+        raise DeltaUnavailable("未找到 Zip64 中央目录结束记录")
+    _, _, zip64_eocd_offset, _ = ZIP64_END_LOCATOR.unpack_from(tail_data, locator_pos)
+    return entry_count, cd_size, cd_offset, zip64_eocd_offset
+
+
+def _parse_zip64_end_record(record: bytes) -> Tuple[int, int, int]:
+    """Returns: (条目数, 中央目录大小, 中央目录位置)"""
+    if len(record) != ZIP64_END_OF_CENTRAL_DIR.size or record[:4] != b"PK\x06\x06":
+        raise DeltaUnavailable("Zip64 中央目录结束记录已损坏")
+    (_, _, _, _, _, _, _, entry_count, cd_size, cd_offset) = ZIP64_END_OF_CENTRAL_DIR.unpack(record)
+    return entry_count, cd_size, cd_offset
+
+
+def _build_layout(
+    source: str, size: int, trailer: bytes, entry_count: int, cd_size: int, cd_offset: int
+) -> ZipLayout:
+    if len(trailer) != size - cd_offset or cd_size > len(trailer):
+        raise DeltaUnavailable("中央目录数据不完整")
+    entries = _parse_central_directory(trailer[:cd_size], entry_count)
+    # 各条目数据紧邻排列, 以下一条目的本地文件头 (或中央目录) 作为结束位置
+    ordered = sorted(entries, key=lambda e: e.header_offset)
+    for entry, next_entry in zip(ordered, ordered[1:] + [None]):
+        entry.data_end = next_entry.header_offset if next_entry else cd_offset
+        if entry.data_end < entry.header_offset:
+            raise DeltaUnavailable("中央目录中的条目位置无效")
+    return ZipLayout(source, size, ordered, cd_offset, trailer)
+
+
+async def read_central_directory(
+    session: aiohttp.ClientSession, url: str
+) -> ZipLayout:
+    """
+    以 Range 请求读取远端 ZIP 的中央目录 (通常只需一次请求)
+
+    Raises:
+        DeltaUnavailable: 下载源不支持 Range 或 ZIP 结构无法解析
+    """
+    tail_start, total, tail_data = await _fetch_range(session, url, f"-{TAIL_BYTES}")
+    metadata_bytes = len(tail_data)
+    entry_count, cd_size, cd_offset, zip64_offset = _find_end_record(tail_data)
+
+    start = cd_offset if zip64_offset is None else min(cd_offset, zip64_offset)
+    if start < tail_start:
+        # 中央目录不完全在末尾数据中, 补齐其前面的部分
+        got_start, _, head = await _fetch_range(session, url, f"{start}-{tail_start - 1}")
+        if got_start != start or len(head) != tail_start - start:
+            raise DeltaUnavailable("下载源返回的区间与请求不一致")
+        metadata_bytes += len(head)
+        tail_data, tail_start = head + tail_data, start
+    if zip64_offset is not None:
+        position = zip64_offset - tail_start
+        entry_count, cd_size, cd_offset = _parse_zip64_end_record(
+            tail_data[position : position + ZIP64_END_OF_CENTRAL_DIR.size]
+        )
+    if cd_offset < tail_start:
+        raise DeltaUnavailable("中央目录位置无效")
+    layout = _build_layout(
+        url, total, tail_data[cd_offset - tail_start :], entry_count, cd_size, cd_offset
+    )
+    layout.metadata_bytes = metadata_bytes
+    return layout
+
+
+def read_local_directory(path: Path) -> ZipLayout:
+    """
+    读取本地 ZIP 文件的中央目录, 结构与 read_central_directory 相同
+
+    Raises:
+        DeltaUnavailable: ZIP 结构无法解析
+        OSError: 读取失败
+    """
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        tail_start = max(size - TAIL_BYTES, 0)
+        f.seek(tail_start)
+        tail_data = f.read()
+        entry_count, cd_size, cd_offset, zip64_offset = _find_end_record(tail_data)
+        if zip64_offset is not None:
+            f.seek(zip64_offset)
+            entry_count, cd_size, cd_offset = _parse_zip64_end_record(
+                f.read(ZIP64_END_OF_CENTRAL_DIR.size)
+            )
+        if cd_offset > size:
+            raise DeltaUnavailable("中央目录位置无效")
+        f.seek(cd_offset)
+        trailer = f.read()
+    return _build_layout(str(path), size, trailer, entry_count, cd_size, cd_offset)
+
+
+def _parse_central_directory(data: bytes, entry_count: int) -> List[ZipEntry]:
+    entries = []
+    pos = 0
+    for _ in range(entry_count):
+        if data[pos : pos + 4] != CENTRAL_DIR_SIGNATURE:
+            raise DeltaUnavailable("中央目录已损坏")
+        fields = CENTRAL_DIR_ENTRY.unpack_from(data, pos)
+        flags, method, mod_time, mod_date = fields[5], fields[6], fields[7], fields[8]
+        crc, compressed_size, file_size = fields[9], fields[10], fields[11]
+        name_length, extra_length, comment_length = fields[12], fields[13], fields[14]
+        header_offset = fields[18]
+
+        pos += CENTRAL_DIR_ENTRY.size
+        raw_name = data[pos : pos + name_length]
+        extra = data[pos + name_length : pos + name_length + extra_length]
+        pos += name_length + extra_length + comment_length
+
+        # Zip64 扩展字段按 原始大小、压缩后大小、本地文件头位置 的顺序只包含溢出的字段
+        values = _zip64_values(extra)
+        try:
+            if file_size == 0xFFFFFFFF:
+                file_size = values.pop(0)
+            if compressed_size == 0xFFFFFFFF:
+                compressed_size = values.pop(0)
+            if header_offset == 0xFFFFFFFF:
+                header_offset = values.pop(0)
+        except IndexError:
+            raise DeltaUnavailable("Zip64 扩展字段不完整")
+
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        entries.append(
+            ZipEntry(
+                name, crc, compressed_size, file_size, method, flags, header_offset,
+                mod_time, mod_date,
+            )
+        )
+    return entries
+
+
+def _zip64_values(extra: bytes) -> List[int]:
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, size = struct.unpack_from("<HH", extra, pos)
+        if header_id == 0x0001:
+            return list(struct.unpack_from(f"<{size // 8}Q", extra, pos + 4))
+        pos += 4 + size
+    return []
+
+
+def strip_root(names: List[str]) -> str:
+    """
+    aura.zip 可能多嵌套一层 "aura/aura/" 目录 (见 extract_resource_files), 由文件条目名返回需去除的前缀
+    """
+    prefix = f"{Path(config.AURA_FILENAME).stem}/{config.EXTRACTED_FOLDER_NAME}/"
+    if names and all(name.startswith(prefix) for name in names):
+        return prefix
+    return ""
+
+
+def crc32_file(path: Path) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CRC_CHUNK_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def match_entries(
+    new: ZipLayout, base: ZipLayout
+) -> Tuple[List[Tuple[int, int, int]], List[Tuple[int, int]]]:
+    """
+    比对新旧两个 ZIP 的条目
+
+    Returns:
+        (可从旧 ZIP 复制的区间 [(新位置, 旧位置, 长度)], 需下载的区间 [(起始, 结束)]);
+        相邻的区间已合并, 需下载的区间包括第一个条目之前的数据
+    """
+    base_entries = {entry.name: entry for entry in base.entries}
+    copies: List[Tuple[int, int, int]] = []
+    fetches: List[Tuple[int, int]] = []
+    if new.entries and new.entries[0].header_offset > 0:
+        fetches.append((0, new.entries[0].header_offset))
+    for entry in new.entries:
+        old = base_entries.get(entry.name)
+        if old and entry.same_bytes_as(old):
+            if copies and copies[-1][0] + copies[-1][2] == entry.header_offset and (
+                copies[-1][1] + copies[-1][2] == old.header_offset
+            ):
+                last = copies[-1]
+                copies[-1] = (last[0], last[1], last[2] + entry.span)
+            else:
+                copies.append((entry.header_offset, old.header_offset, entry.span))
+        elif entry.span:
+            if fetches and fetches[-1][1] == entry.header_offset:
+                fetches[-1] = (fetches[-1][0], entry.data_end)
+            else:
+                fetches.append((entry.header_offset, entry.data_end))
+    return copies, fetches
+
+
+def group_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """将相邻 (间隔小于 DELTA_MERGE_GAP) 的区间合并为一次 Range 请求"""
+    groups: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if groups:
+            last_start, last_end = groups[-1]
+            if (
+                start - last_end <= config.DELTA_MERGE_GAP
+                and end - last_start <= config.DELTA_MAX_REQUEST_BYTES
+            ):
+                groups[-1] = (last_start, max(last_end, end))
+                continue
+        groups.append((start, end))
+    return groups
+
+
+def _write_at(path: Path, offset: int, data: bytes):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+
+
+def _copy_ranges(
+    base_path: Path,
+    output_path: Path,
+    copies: List[Tuple[int, int, int]],
+    on_progress: Callable[[int], None],
+):
+    with open(base_path, "rb") as src, open(output_path, "r+b") as dst:
+        for new_offset, old_offset, length in copies:
+            src.seek(old_offset)
+            dst.seek(new_offset)
+            remaining = length
+            while remaining > 0:
+                chunk = src.read(min(COPY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise DeltaUnavailable(f"旧版本 ZIP {base_path} 数据不完整")
+                dst.write(chunk)
+                remaining -= len(chunk)
+                on_progress(len(chunk))
+
+
+def _check_entries(path: Path, names: List[str]):
+    """没有发布摘要时, 解压下载的条目校验 CRC32"""
+    try:
+        with zipfile.ZipFile(path) as zf:
+            for name in names:
+                with zf.open(name) as f:
+                    while f.read(CRC_CHUNK_SIZE):
+                        pass
+    except (zipfile.BadZipFile, KeyError, zlib.error, NotImplementedError) as e:
+        raise DeltaUnavailable(f"生成的 ZIP 校验失败: {e}")
+
+
+async def _fetch_into(
+    session: aiohttp.ClientSession,
+    url: str,
+    output_path: Path,
+    start: int,
+    end: int,
+    semaphore: asyncio.Semaphore,
+    on_progress: Callable[[int], None],
+) -> int:
+    async with semaphore:
+        # 排队等待期间可能已被取消, 每次请求前检查
+        on_progress(0)
+        got_start, _, data = await _fetch_range(session, url, f"{start}-{end - 1}")
+    if got_start != start or len(data) != end - start:
+        raise DeltaUnavailable("下载源返回的区间与请求不一致")
+    await asyncio.to_thread(_write_at, output_path, start, data)
+    on_progress(len(data))
+    return len(data)
+
+
+def _choose_base(remote: ZipLayout, bases: List[Path]) -> Optional[ZipLayout]:
+    """在候选的旧版本 ZIP 中选择可复制字节最多的一个"""
+    best = None
+    best_copied = 0
+    for base_path in bases:
+        try:
+            base = read_local_directory(base_path)
+        except (DeltaUnavailable, OSError) as e:
+            log.debug(f"无法读取 {base_path} 的中央目录: {e}")
+            continue
+        copies, _ = match_entries(remote, base)
+        copied = sum(length for _, _, length in copies)
+        if copied > best_copied:
+            best, best_copied = base, copied
+    return best
+
+
+async def apply_delta_async(
+    session: aiohttp.ClientSession,
+    base_urls: List[str],
+    tag: str,
+    bases: List[Path],
+    dest_path: Path,
+    expected_sha256: Optional[str] = None,
+    cancel_event: Optional[threading.Event] = None,
+    reporter: Optional[progressReporter.ProgressReporter] = None,
+) -> Optional[str]:
+    """
+    以旧版本的 aura.zip 为基础, 只下载有变化的部分, 在 dest_path 生成新版本的 aura.zip
+
+    Args:
+        session: aiohttp 会话
+        base_urls: 下载源 (按优先级排序)
+        tag: 版本 Tag
+        bases: 候选的旧版本 aura.zip (如资源文件缓存中其他版本的文件)
+        dest_path: 输出文件, 内容与完整下载相同
+        expected_sha256: 发布信息中的 SHA-256; 为空时改为校验下载部分的 CRC32
+        cancel_event: 置位后停止复制与下载; 取消时同样返回 None
+        reporter: 进度汇报器, 下载与从旧版本复制的字节都计入 aura.zip 的进度
+
+    Returns:
+        Optional[str]: 生成的文件的 SHA-256; 失败时为 None, cancel_event 未置位时调用方应回退为完整下载
+    """
+    if not bases:
+        return None
+    remote = None
+    for base_url in base_urls[: config.DELTA_MAX_MIRRORS]:
+        url = f"{base_url}/{tag}/{config.AURA_FILENAME}"
+        try:
+            remote = await read_central_directory(session, url)
+            break
+        except (DeltaUnavailable, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.info(f"无法从 {url} 读取中央目录: {e!r}")
+    if not remote:
+        log.info("没有可用于增量升级的下载源, 将完整下载 aura.zip")
+        return None
+
+    base = await asyncio.to_thread(_choose_base, remote, bases)
+    if not base:
+        log.info("缓存中的旧版本 aura.zip 与新版本没有相同的条目, 将完整下载")
+        return None
+    base_path = Path(base.source)
+    copies, fetches = match_entries(remote, base)
+    groups = group_ranges(fetches)
+    fetch_bytes = sum(end - start for start, end in groups)
+    base_entries = {entry.name: entry for entry in base.entries}
+    changed = [
+        entry.name
+        for entry in remote.entries
+        if not entry.is_dir()
+        and not (entry.name in base_entries and entry.same_bytes_as(base_entries[entry.name]))
+    ]
+    file_count = sum(1 for entry in remote.entries if not entry.is_dir())
+    log.info(
+        f"增量升级: 以 {base_path.name} 为基础, {len(changed)}/{file_count} 个文件有变化, "
+        f"需下载 {fetch_bytes / 1024 / 1024:.2f} MB (完整 {remote.size / 1024 / 1024:.2f} MB)"
+    )
+    if fetch_bytes > remote.size * config.DELTA_MAX_CHANGED_RATIO:
+        log.info("变化的部分过多, 改为完整下载 aura.zip")
+        return None
+
+    filename = config.AURA_FILENAME
+    reporter = reporter or progressReporter.ProgressReporter()
+    copy_bytes = sum(length for _, _, length in copies)
+    # 合并请求时夹带的未变化数据会被复制与下载各计一次, 进度按实际处理的字节数计算
+    reporter.start(filename, len(remote.trailer) + copy_bytes + fetch_bytes)
+
+    def on_progress(size: int):
+        if cancel_event and cancel_event.is_set():
+            raise DeltaCancelled()
+        if size:
+            try:
+                reporter.add(filename, size)
+            except Exception as e:
+                # 生命周期回调以 INSTALLATION_CANCELLED 通知取消
+                if "INSTALLATION_CANCELLED" in str(e):
+                    raise DeltaCancelled() from e
+                raise
+
+    started = time.perf_counter()
+    dest_path = Path(dest_path)
+    tmp_path = dest_path.with_name(dest_path.name + ".delta")
+    try:
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.truncate(remote.size)
+        await asyncio.to_thread(_write_at, tmp_path, remote.central_dir_offset, remote.trailer)
+        on_progress(len(remote.trailer))
+        await asyncio.to_thread(_copy_ranges, base_path, tmp_path, copies, on_progress)
+        # 下载的区间在复制之后写入: 合并请求时夹带的未变化数据以下载源为准
+        semaphore = asyncio.Semaphore(config.DELTA_MAX_CONCURRENCY)
+        tasks = [
+            asyncio.create_task(
+                _fetch_into(session, remote.source, tmp_path, start, end, semaphore, on_progress)
+            )
+            for start, end in groups
+        ]
+        try:
+            fetched = await asyncio.gather(*tasks)
+        finally:
+            # 任一区间失败或被取消时停止其余请求
+            for task in tasks:
+                task.cancel()
+        sha256 = await asyncio.to_thread(downloadDigest.sha256_file, tmp_path)
+        if expected_sha256:
+            if sha256 != expected_sha256:
+                raise DeltaUnavailable(
+                    f"生成的 aura.zip SHA-256 与发布信息不一致 ({sha256[:12]} != {expected_sha256[:12]})"
+                )
+        else:
+            await asyncio.to_thread(_check_entries, tmp_path, changed)
+        os.replace(tmp_path, dest_path)
+    except DeltaCancelled:
+        log.warning("下载已取消, 停止增量升级")
+        if cancel_event:
+            cancel_event.set()
+        return None
+    except (DeltaUnavailable, aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+        log.warning(f"增量升级失败, 将完整下载 aura.zip: {e!r}")
+        return None
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    reporter.finish(filename)
+    log.success(
+        f"增量升级完成, 共下载 {(sum(fetched) + remote.metadata_bytes) / 1024 / 1024:.2f} MB, "
+        f"用时 {time.perf_counter() - started:.2f}s"
+        + ("" if expected_sha256 else " (无发布摘要, 已校验下载条目的 CRC32)")
+    )
+    return sha256
@@ -0,0 +1,179 @@
+"""
+批量部署时的下载协调
+- 随机启动延迟: 同时启动的大量安装程序在 [0, DOWNLOAD_START_JITTER] 秒内错开开始下载
+- 下载名额: 共享目录 (如网络共享文件夹) 中的 slot-<n>.lock 文件表示一个正在下载的机器, 最多
+  DOWNLOAD_MAX_CONCURRENT 个; 持有者定期刷新修改时间, 超过 DOWNLOAD_SLOT_STALE_SECONDS 未刷新的名额
+  (进程崩溃或断网) 可被其他机器接管
+名额只是软限制: 共享目录不可用或等待超时时不阻止下载
+"""
+
+import asyncio
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger as log
+
+from config import config
+
+
+async def wait_start_jitter_async():
+    """按 DOWNLOAD_START_JITTER 随机延迟开始下载"""
+    if config.DOWNLOAD_START_JITTER <= 0:
+        return
+    delay = random.uniform(0, config.DOWNLOAD_START_JITTER)
+    log.info(f"随机延迟 {delay:.1f}s 后开始下载, 以错开同时启动的其他安装程序")
+    await asyncio.sleep(delay)
+
+
+class DownloadSlot:
+    """
+    共享目录中的一个下载名额
+
+    Args:
+        directory: 共享目录
+        max_concurrent: 名额数量
+    """
+
+    def __init__(self, directory: str, max_concurrent: int):
+        self.directory = Path(directory)
+        self.max_concurrent = max(1, max_concurrent)
+        self.path: Optional[Path] = None
+        self._token = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def _owner(self) -> bytes:
+        return json.dumps(
+            {
+                "token": self._token,
+                "host": socket.gethostname(),
+                "pid": os.getpid(),
+                "acquired_at": time.time(),
+            }
+        ).encode()
+
+    def _try_take(self, path: Path) -> bool:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - path.stat().st_mtime < config.DOWNLOAD_SLOT_STALE_SECONDS:
+                    return False
+                log.info(f"下载名额 {path.name} 已超时未刷新, 接管该名额")
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return False
+        with os.fdopen(fd, "wb") as f:
+            f.write(self._owner())
+        return True
+
+    def _try_acquire(self) -> bool:
+        indexes = list(range(self.max_concurrent))
+        random.shuffle(indexes)  # 分散各机器首先尝试的名额
+        for index in indexes:
+            path = self.directory / f"slot-{index}.lock"
+            if self._try_take(path):
+                self.path = path
+                return True
+        return False
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待并占用一个名额; 等待期间不占用线程, 访问共享目录的操作在线程池中进行
+
+        Args:
+            timeout: 最长等待时间 (秒), 0 为不限; 默认为 DOWNLOAD_SLOT_TIMEOUT
+
+        Returns:
+            bool: 是否占用成功; 共享目录不可用或等待超时时返回 False, 调用方可直接下载
+        """
+        try:
+            await asyncio.to_thread(self.directory.mkdir, parents=True, exist_ok=True)
+        except OSError as e:
+            log.warning(f"无法访问下载协调目录 {self.directory}, 不限制并发下载: {e}")
+            return False
+
+        if timeout is None:
+            timeout = config.DOWNLOAD_SLOT_TIMEOUT
+        started = time.monotonic()
+        last_report = started
+        while True:
+            attempt = asyncio.ensure_future(asyncio.to_thread(self._try_acquire))
+            try:
+                if await asyncio.shield(attempt):
+                    break
+            except OSError as e:
+                log.warning(f"下载协调目录 {self.directory} 访问失败, 不限制并发下载: {e}")
+                return False
+            except asyncio.CancelledError:
+                # 线程中的尝试仍会完成, 占用成功时立即交还名额
+                attempt.add_done_callback(lambda t: t.exception() or self._remove_own_file())
+                raise
+            now = time.monotonic()
+            if timeout and now - started >= timeout:
+                log.warning(f"等待下载名额超过 {timeout:.0f}s, 直接开始下载")
+                return False
+            if now - last_report >= 30:
+                log.info(
+                    f"已有 {self.max_concurrent} 台机器正在下载, 已等待 {now - started:.0f}s..."
+                )
+                last_report = now
+            await asyncio.sleep(config.DOWNLOAD_SLOT_POLL_INTERVAL * random.uniform(0.5, 1.5))
+
+        log.info(f"已获得下载名额 {self.path.name}")
+        self._stop.clear()
+        self._heartbeat = threading.Thread(
+            target=self._keep_alive, name="download-slot", daemon=True
+        )
+        self._heartbeat.start()
+        return True
+
+    def _keep_alive(self):
+        while not self._stop.wait(config.DOWNLOAD_SLOT_HEARTBEAT):
+            try:
+                os.utime(self.path)
+            except OSError as e:
+                log.warning(f"刷新下载名额失败: {e}")
+
+    def _remove_own_file(self):
+        if not self.path:
+            return
+        try:
+            # 名额超时后可能已被其他机器接管, 只删除自己的文件
+            if json.loads(self.path.read_bytes()).get("token") == self._token:
+                os.remove(self.path)
+        except (OSError, ValueError) as e:
+            log.warning(f"释放下载名额失败: {e}")
+        self.path = None
+
+    def release(self):
+        if not self.path:
+            return
+        self._stop.set()
+        if self._heartbeat:
+            self._heartbeat.join()
+        self._remove_own_file()
+
+
+async def acquire_download_slot_async() -> Optional[DownloadSlot]:
+    """
+    配置了 DOWNLOAD_COORDINATION_DIR 时等待并占用一个下载名额
+
+    Returns:
+        Optional[DownloadSlot]: 已占用的名额, 下载结束后应调用 release; 未配置或未能占用时为 None
+    """
+    if not config.DOWNLOAD_COORDINATION_DIR:
+        return None
+    slot = DownloadSlot(config.DOWNLOAD_COORDINATION_DIR, config.DOWNLOAD_MAX_CONCURRENT)
+    return slot if await slot.acquire_async() else None
@@ -0,0 +1,152 @@
+"""
+下载完整性校验
+在下载循环中按顺序增量计算 SHA-256, 并与发布信息中的摘要比对。期望摘要优先取自 GitHub Release
+资源的 digest 字段, GitHub API 不可用时改为从下载源获取随版本发布的 SHA256SUMS 清单
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Dict, Optional
+
+import aiohttp
+from loguru import logger as log
+
+from config import config
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class StreamDigest:
+    """
+    按文件顺序增量计算的 SHA-256
+
+    下载数据通过 update 直接计入; 续传时已在磁盘上的部分通过 catch_up 读入, 之后不再重复读取文件
+    """
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self.position = 0  # 已计入摘要的字节数
+
+    def update(self, data: bytes):
+        self._hash.update(data)
+        self.position += len(data)
+
+    def catch_up(self, path: Path, upto: int, file_offset: int = 0):
+        """
+        从磁盘读入 [position, upto) 并计入摘要
+
+        Args:
+            path: 文件路径
+            upto: 计入摘要的截止位置
+            file_offset: path 的文件头在完整内容中的位置 (如对冲文件)
+        """
+        if upto <= self.position:
+            return
+        with open(path, "rb") as f:
+            f.seek(self.position - file_offset)
+            while self.position < upto:
+                chunk = f.read(min(HASH_CHUNK_SIZE, upto - self.position))
+                if not chunk:
+                    raise EOFError(f"{path} 在 {self.position} 字节处提前结束")
+                self.update(chunk)
+
+    def copy(self) -> "StreamDigest":
+        clone = StreamDigest()
+        clone._hash = self._hash.copy()
+        clone.position = self.position
+        return clone
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def sha256_file(path: Path) -> str:
+    """读取整个文件计算 SHA-256, 用于无法在下载时计算摘要的文件 (本地文件、缓存、生成的文件等)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_manifest(text: str) -> Dict[str, str]:
+    """
+    解析 sha256sum 格式的清单: 每行 "<摘要>  <文件名>" (二进制模式下文件名前带 "*")
+    """
+    digests = {}
+    for line in text.splitlines():
+        parts = line.strip().split(maxsplit=1)
+        if len(parts) != 2 or len(parts[0]) != 64:
+            continue
+        digests[parts[1].lstrip("*").strip()] = parts[0].lower()
+    return digests
+
+
+async def _fetch_github_digests(session: aiohttp.ClientSession, tag: str) -> Dict[str, str]:
+    url = f"{config.GITHUB_API_URL}/tags/{tag}"
+    async with session.get(
+        url, timeout=aiohttp.ClientTimeout(total=config.RELEASE_DIGEST_TIMEOUT)
+    ) as r:
+        r.raise_for_status()
+        release = await r.json()
+    digests = {}
+    for asset in release.get("assets", []):
+        digest = asset.get("digest") or ""
+        if digest.startswith("sha256:"):
+            digests[asset["name"]] = digest[len("sha256:") :].lower()
+    return digests
+
+
+async def _fetch_manifest_digests(
+    session: aiohttp.ClientSession, tag: str, base_url: str
+) -> Dict[str, str]:
+    url = f"{base_url}/{tag}/{config.RELEASE_DIGEST_MANIFEST}"
+    async with session.get(
+        url,
+        headers={"User-Agent": config.DOWNLOAD_USER_AGENT},
+        timeout=aiohttp.ClientTimeout(total=config.RELEASE_DIGEST_TIMEOUT),
+    ) as r:
+        r.raise_for_status()
+        return parse_manifest(await r.text())
+
+
+async def fetch_release_digests(
+    tag: str,
+    base_urls: list,
+    session: Optional[aiohttp.ClientSession] = None,
+) -> Dict[str, str]:
+    """
+    获取版本 tag 中各资源文件的 SHA-256
+
+    Args:
+        tag: 版本 Tag
+        base_urls: 下载源 (按优先级排序), 用于获取 SHA256SUMS 清单
+        session: aiohttp 会话, 为空时自行创建
+
+    Returns:
+        Dict[str, str]: 文件名 -> 十六进制摘要; 均获取失败时为空
+    """
+    if session is None:
+        async with aiohttp.ClientSession() as own_session:
+            return await fetch_release_digests(tag, base_urls, own_session)
+
+    try:
+        digests = await _fetch_github_digests(session, tag)
+        if digests:
+            log.info(f"已从 GitHub Release 获取 {len(digests)} 个资源文件的 SHA-256")
+            return digests
+    except Exception as e:
+        log.warning(f"从 GitHub API 获取资源文件摘要失败: {e!r}")
+
+    for base_url in base_urls[: config.RELEASE_DIGEST_MANIFEST_MIRRORS]:
+        try:
+            digests = await _fetch_manifest_digests(session, tag, base_url)
+            if digests:
+                log.info(f"已从下载源获取 {config.RELEASE_DIGEST_MANIFEST} 清单")
+                return digests
+        except Exception as e:
+            log.debug(f"获取 {config.RELEASE_DIGEST_MANIFEST} 失败 {base_url}: {e!r}")
+
+    log.warning("未能获取资源文件的 SHA-256, 下载完成后将无法校验完整性")
+    return {}
@@ -0,0 +1,112 @@
+"""
+下载引擎
+进程内所有下载 (测速、探测、单连接 / 分段 / 对冲下载、重试与进度汇报) 运行在同一个专用线程上的事件循环中。
+异步代码直接 await 各 *_async 函数; 同步调用方 (CLI、安装流程、GUI) 通过 submit 取得线程安全的
+concurrent.futures.Future, 可在任意线程等待结果、注册完成回调或取消, 调用线程本身不会被事件循环占用
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+from loguru import logger as log
+
+
+T = TypeVar("T")
+
+
+class DownloadEngine:
+    """
+    在后台线程上运行的事件循环, 首次提交任务时启动
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name="download-engine", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def in_engine_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> "concurrent.futures.Future[T]":
+        """
+        在引擎的事件循环上运行协程
+
+        Returns:
+            concurrent.futures.Future: 协程的结果; 调用其 cancel() 会取消对应的任务
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """
+        提交协程并等待其结果
+
+        Raises:
+            RuntimeError: 在引擎线程内调用 (会造成死锁), 此时应直接 await 协程
+        """
+        if self.in_engine_thread():
+            coro.close()
+            raise RuntimeError("不能在下载引擎线程内同步等待下载, 请直接 await")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # 调用方被中断 (如 Ctrl+C) 或等待超时时一并取消下载
+            future.cancel()
+            raise
+
+    def shutdown(self, timeout: float = 5.0):
+        """取消未完成的任务并停止事件循环"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or loop.is_closed():
+            return
+
+        async def cancel_pending():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await loop.shutdown_asyncgens()
+
+        try:
+            asyncio.run_coroutine_threadsafe(cancel_pending(), loop).result(timeout)
+        except (concurrent.futures.TimeoutError, RuntimeError) as e:
+            log.warning(f"停止下载引擎时未能取消全部任务: {e!r}")
+        loop.call_soon_threadsafe(loop.stop)
+        if thread:
+            thread.join(timeout)
+        if not loop.is_running():
+            loop.close()
+
+
+_engine: Optional[DownloadEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> DownloadEngine:
+    """进程内共享的下载引擎"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = DownloadEngine()
+        return _engine
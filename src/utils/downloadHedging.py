@@ -0,0 +1,293 @@
+"""
+慢速下载对冲
+单连接下载的吞吐量在一个统计窗口内低于下限时, 从下一个下载源以 Range 请求并行获取剩余部分,
+写入独立的对冲文件; 两路中先完成者胜出, 另一路被取消。触发次数与节省的时间会持久化统计
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+import aiohttp
+from loguru import logger as log
+
+from config import config
+from utils import downloadWriter, downloadDigest, progressReporter
+
+
+HEDGE_SUFFIX = ".hedge"
+
+
+def hedge_path_for(part_path: Path) -> Path:
+    return Path(part_path).with_name(Path(part_path).name + HEDGE_SUFFIX)
+
+
+class StreamProgress:
+    """
+    记录一路下载流的位置与近期吞吐量, 供对冲判断使用
+
+    Args:
+        url: 该路下载的完整 URL
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.requested_at = time.perf_counter()
+        self.total_size = 0
+        self.start = 0  # 本次请求的起始位置
+        self.received = 0  # 本次请求已接收的字节数
+        self.started_at = 0.0
+        self.digest: Optional[downloadDigest.StreamDigest] = None  # 按文件顺序计算的摘要
+        self.hedged = False  # 对冲请求进行中: 原请求失败时保留未完成文件, 对冲请求的数据将写回其中
+        self.reported = 0  # 已计入进度汇报的文件位置, 由原请求与对冲请求共用
+        self._samples = deque()  # (时间, 累计接收字节数)
+
+    def begin(self, total_size: int, start: int):
+        """收到响应头后调用"""
+        self.total_size = total_size
+        self.start = start
+        self.received = 0
+        self.started_at = time.perf_counter()
+        self.reported = start
+        self._samples.clear()
+        self._samples.append((self.started_at, 0))
+
+    @property
+    def position(self) -> int:
+        return self.start + self.received
+
+    @property
+    def remaining(self) -> int:
+        return max(self.total_size - self.position, 0)
+
+    def add(self, size: int):
+        self.received += size
+        now = time.perf_counter()
+        self._samples.append((now, self.received))
+        # 只保留统计窗口内的样本, 另留一个窗口外的样本作为基准
+        while (
+            len(self._samples) > 2
+            and now - self._samples[1][0] >= config.DOWNLOAD_HEDGE_WINDOW
+        ):
+            self._samples.popleft()
+
+    def advance_reported(self, position: int) -> int:
+        """
+        将汇报位置推进到 position (在原请求的 StreamProgress 上调用)
+
+        Returns:
+            int: 新增的字节数; 另一路已汇报到更远的位置时为 0, 两路重叠的部分不重复计入
+        """
+        advanced = max(position - self.reported, 0)
+        self.reported += advanced
+        return advanced
+
+    def throughput(self) -> float:
+        """最近一个统计窗口内的吞吐量, 字节 / 秒"""
+        if not self.started_at:
+            return 0.0
+        now = time.perf_counter()
+        # 以窗口起点前最后一个样本为基准; 长时间没有新数据时基准会更早, 吞吐量随之下降
+        base_time, base = self._samples[0]
+        for sample_time, received in self._samples:
+            if now - sample_time < config.DOWNLOAD_HEDGE_WINDOW:
+                break
+            base_time, base = sample_time, received
+        elapsed = now - base_time
+        return (self.received - base) / elapsed if elapsed > 0 else 0.0
+
+    def is_stalled(self) -> bool:
+        """已知文件大小, 且已持续传输满一个窗口而吞吐量低于下限"""
+        return (
+            self.total_size > 0
+            and self.remaining > 0
+            and time.perf_counter() - self.started_at >= config.DOWNLOAD_HEDGE_WINDOW
+            and self.throughput() < config.DOWNLOAD_HEDGE_MIN_THROUGHPUT
+        )
+
+    def estimate_remaining_time(self, fallback_rate: float) -> float:
+        """
+        以当前吞吐量估算完成剩余部分所需的时间
+
+        吞吐量为 0 时, 原流程要先等待读取超时, 再由下一个下载源以 fallback_rate 续传
+        """
+        rate = self.throughput()
+        if rate > 0:
+            return self.remaining / rate
+        return config.DOWNLOAD_READ_TIMEOUT + (
+            self.remaining / fallback_rate if fallback_rate > 0 else 0.0
+        )
+
+
+async def fetch_remaining_async(
+    session: aiohttp.ClientSession,
+    url: str,
+    hedge_path: Path,
+    start: int,
+    total_size: int,
+    cancel_event: threading.Event | None,
+    progress: StreamProgress,
+    primary: StreamProgress,
+    reporter: progressReporter.ProgressReporter,
+    filename: str,
+) -> bool:
+    """
+    对冲请求: 从 url 获取 [start, total_size) 并写入 hedge_path
+
+    Args:
+        progress: 对冲请求的传输位置与吞吐量
+        primary: 原请求的 StreamProgress, 两路共用其汇报位置
+        reporter: 进度汇报器; 对冲请求超出原请求位置的部分计入 filename 的进度
+
+    Returns:
+        bool: 是否完整获取; 下载源不支持 Range 或文件大小不一致时返回 False
+    """
+    headers = {
+        "Accept-Encoding": "",
+        "User-Agent": config.DOWNLOAD_USER_AGENT,
+        "Range": f"bytes={start}-",
+    }
+    try:
+        async with session.get(url, headers=headers) as r:
+            # Content-Range: bytes 1000-12344/12345
+            content_range = r.headers.get("content-range", "")
+            if (
+                r.status != 206
+                or content_range.split(" ")[-1].split("-")[0] != str(start)
+                or content_range.rsplit("/", 1)[-1] != str(total_size)
+            ):
+                log.warning(f"对冲下载源 {url} 不支持续传或文件大小不一致, 放弃对冲")
+                return False
+
+            progress.begin(total_size, start)
+            async with downloadWriter.DownloadWriter(hedge_path, 0, total_size - start) as writer:
+                async for chunk in r.content.iter_chunked(config.DOWNLOAD_READ_CHUNK_SIZE):
+                    if cancel_event and cancel_event.is_set():
+                        return False
+                    await writer.write(chunk)
+                    if progress.digest:
+                        progress.digest.update(chunk)
+                    progress.add(len(chunk))
+                    advanced = primary.advance_reported(progress.position)
+                    if advanced:
+                        reporter.add(filename, advanced)
+            return writer.flushed == total_size - start
+    except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+        log.warning(f"对冲下载 {url} 失败: {e!r}")
+        return False
+    except Exception as e:
+        if "INSTALLATION_CANCELLED" in str(e):
+            if cancel_event:
+                cancel_event.set()
+            return False
+        raise
+
+
+def splice_hedge(part_path: Path, hedge_path: Path, start: int):
+    """将对冲文件写回未完成文件的 start 位置之后"""
+    with open(part_path, "r+b") as dst, open(hedge_path, "rb") as src:
+        dst.seek(start)
+        shutil.copyfileobj(src, dst, config.DOWNLOAD_BUFFER_MAX_SIZE)
+        dst.truncate()
+    os.remove(hedge_path)
+
+
+def discard_hedge(hedge_path: Path):
+    try:
+        if hedge_path.exists():
+            os.remove(hedge_path)
+    except OSError as e:
+        log.warning(f"删除对冲文件 {hedge_path} 失败: {e}")
+
+
+@dataclass
+class HedgeStats:
+    downloads: int = 0  # 具备对冲条件 (有备用下载源) 的单连接下载次数
+    triggered: int = 0  # 触发对冲的次数
+    hedge_wins: int = 0  # 对冲请求先完成的次数
+    primary_wins: int = 0  # 触发对冲后原请求仍先完成的次数
+    seconds_saved: float = 0.0  # 对冲胜出时估算节省的时间
+    wasted_bytes: int = 0  # 落败一方已下载的字节数
+
+
+class HedgeMetrics:
+    """
+    对冲统计, 在多次运行之间累计
+
+    Args:
+        path: 持久化文件路径, 默认为 config.DOWNLOAD_HEDGE_METRICS_PATH
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or config.DOWNLOAD_HEDGE_METRICS_PATH)
+        self.total = HedgeStats()
+        self.session = HedgeStats()  # 本次运行的统计
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            self.total = HedgeStats(**json.loads(self.path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError) as e:
+            log.warning(f"对冲统计 {self.path} 已损坏, 将重新统计: {e}")
+
+    def save(self):
+        with self._lock:
+            data = asdict(self.total)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            tmp_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warning(f"保存对冲统计失败: {e}")
+
+    def _update(self, **changes):
+        with self._lock:
+            for stats in (self.total, self.session):
+                for name, value in changes.items():
+                    setattr(stats, name, getattr(stats, name) + value)
+
+    def record_download(self):
+        self._update(downloads=1)
+
+    def record_triggered(self):
+        self._update(triggered=1)
+
+    def record_hedge_win(self, seconds_saved: float, wasted_bytes: int):
+        self._update(hedge_wins=1, seconds_saved=seconds_saved, wasted_bytes=wasted_bytes)
+
+    def record_primary_win(self, wasted_bytes: int):
+        self._update(primary_wins=1, wasted_bytes=wasted_bytes)
+
+    def describe(self, stats: Optional[HedgeStats] = None) -> str:
+        stats = stats or self.total
+        rate = stats.triggered / stats.downloads if stats.downloads else 0.0
+        return (
+            f"对冲触发 {stats.triggered}/{stats.downloads} 次 ({rate:.0%}), "
+            f"对冲胜出 {stats.hedge_wins} 次, 原请求胜出 {stats.primary_wins} 次, "
+            f"估计节省 {stats.seconds_saved:.1f}s, "
+            f"额外流量 {stats.wasted_bytes / 1024 / 1024:.2f} MB"
+        )
+
+
+_metrics: Optional[HedgeMetrics] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> HedgeMetrics:
+    """进程内共享的对冲统计"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = HedgeMetrics()
+        return _metrics
@@ -0,0 +1,221 @@
+"""
+下载断点续传日志
+在每个未完成的下载文件旁保存一个 JSON 日志, 记录来源 URL、校验信息 (ETag / Last-Modified / Content-Length) 与已完成的字节区间
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger as log
+
+
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_VERSION = 1
+FINALIZE_RETRIES = 10
+
+# 未完成文件路径 -> [代数, 从文件头开始连续写入磁盘的字节数], 供边下载边解压等读取
+# 连续字节数减少 (重新下载) 时代数加一, 读取方据此丢弃基于旧内容的处理结果
+_watermarks: Dict[str, List[int]] = {}
+_watermarks_lock = threading.Lock()
+
+
+def _publish_watermark(part_path: Path, contiguous: int):
+    with _watermarks_lock:
+        watermark = _watermarks.setdefault(str(part_path), [0, 0])
+        if contiguous < watermark[1]:
+            watermark[0] += 1
+        watermark[1] = contiguous
+
+
+def get_watermark(part_path: Path) -> Tuple[int, int]:
+    """
+    Returns:
+        (代数, 已连续写入磁盘的字节数)
+    """
+    with _watermarks_lock:
+        generation, contiguous = _watermarks.get(str(Path(part_path)), [0, 0])
+        return generation, contiguous
+
+
+def resource_key(url: str) -> str:
+    """
+    取 URL 末尾的 "<tag>/<filename>" 作为资源标识
+
+    不同下载源的前缀各不相同, 但同一版本的同一文件内容一致, 以此判断能否跨源续传
+    """
+    return "/".join(url.rstrip("/").split("/")[-2:])
+
+
+class DownloadJournal:
+    """
+    单个未完成下载的状态
+
+    Args:
+        part_path: 未完成的下载文件路径
+        url: 来源 URL
+        content_length: 文件总大小
+        etag: 响应头中的 ETag
+        last_modified: 响应头中的 Last-Modified
+        ranges: 已完成的字节区间列表 (闭区间, 已排序且互不相交)
+    """
+
+    def __init__(
+        self,
+        part_path: Path,
+        url: str,
+        content_length: int,
+        etag: str = "",
+        last_modified: str = "",
+        ranges: Optional[List[List[int]]] = None,
+    ):
+        self.part_path = Path(part_path)
+        self.url = url
+        self.content_length = content_length
+        self.etag = etag
+        self.last_modified = last_modified
+        self.ranges: List[List[int]] = ranges or []
+        _publish_watermark(self.part_path, self.contiguous_bytes)
+
+    @property
+    def journal_path(self) -> Path:
+        return journal_path_for(self.part_path)
+
+    @classmethod
+    def load(cls, part_path: Path) -> Optional["DownloadJournal"]:
+        """
+        读取 part_path 对应的日志, 日志或下载文件缺失、损坏时返回 None
+        """
+        journal_path = journal_path_for(part_path)
+        if not journal_path.exists() or not Path(part_path).exists():
+            return None
+        try:
+            data = json.loads(journal_path.read_text(encoding="utf-8"))
+            if data.get("version") != JOURNAL_VERSION:
+                return None
+            return cls(
+                part_path,
+                data["url"],
+                int(data["contentLength"]),
+                data.get("etag", ""),
+                data.get("lastModified", ""),
+                [[int(start), int(end)] for start, end in data.get("ranges", [])],
+            )
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning(f"下载日志 {journal_path} 已损坏, 将重新下载: {e}")
+            return None
+
+    def save(self):
+        """
+        原子写入日志。调用前应确保已 flush 对应区间的文件数据
+        """
+        data = {
+            "version": JOURNAL_VERSION,
+            "url": self.url,
+            "contentLength": self.content_length,
+            "etag": self.etag,
+            "lastModified": self.last_modified,
+            "ranges": self.ranges,
+        }
+        tmp_path = self.journal_path.with_name(self.journal_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp_path, self.journal_path)
+
+    def remove(self):
+        if self.journal_path.exists():
+            os.remove(self.journal_path)
+
+    def matches(
+        self, url: str, content_length: int, etag: str = "", last_modified: str = ""
+    ) -> bool:
+        """
+        判断远端文件是否仍与日志记录的是同一份内容
+
+        同一 URL 时比较 ETag / Last-Modified; 跨下载源时只能比较资源标识与文件大小
+        """
+        if content_length != self.content_length:
+            return False
+        if url == self.url:
+            if etag and self.etag and etag != self.etag:
+                return False
+            if last_modified and self.last_modified and last_modified != self.last_modified:
+                return False
+            return True
+        return resource_key(url) == resource_key(self.url)
+
+    def add_range(self, start: int, end: int):
+        """记录已完成的区间 [start, end], 并与相邻区间合并"""
+        if end < start:
+            return
+        merged: List[List[int]] = []
+        for cur_start, cur_end in sorted(self.ranges + [[start, end]]):
+            if merged and cur_start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], cur_end)
+            else:
+                merged.append([cur_start, cur_end])
+        self.ranges = merged
+        _publish_watermark(self.part_path, self.contiguous_bytes)
+
+    @property
+    def completed_bytes(self) -> int:
+        return sum(end - start + 1 for start, end in self.ranges)
+
+    @property
+    def contiguous_bytes(self) -> int:
+        """从文件头开始连续完成的字节数"""
+        if self.ranges and self.ranges[0][0] == 0:
+            return self.ranges[0][1] + 1
+        return 0
+
+    def is_complete(self) -> bool:
+        return self.contiguous_bytes >= self.content_length
+
+    def missing_ranges(self) -> List[Tuple[int, int]]:
+        """返回尚未完成的区间列表 (闭区间)"""
+        missing = []
+        cursor = 0
+        for start, end in self.ranges:
+            if start > cursor:
+                missing.append((cursor, start - 1))
+            cursor = max(cursor, end + 1)
+        if cursor < self.content_length:
+            missing.append((cursor, self.content_length - 1))
+        return missing
+
+
+def journal_path_for(part_path: Path) -> Path:
+    part_path = Path(part_path)
+    return part_path.with_name(part_path.name + JOURNAL_SUFFIX)
+
+
+def discard_partial(part_path: Path):
+    """删除未完成的下载文件及其日志"""
+    _publish_watermark(Path(part_path), 0)
+    for path in (Path(part_path), journal_path_for(part_path)):
+        try:
+            if path.exists():
+                os.remove(path)
+        except OSError as e:
+            log.warning(f"删除未完成的下载文件 {path} 失败: {e}")
+
+
+def finalize_partial(part_path: Path, dest_path: Path) -> Path:
+    """下载完成后将文件移动到目标位置, 并删除日志"""
+    dest_path = Path(dest_path)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    for attempt in range(FINALIZE_RETRIES):
+        try:
+            os.replace(part_path, dest_path)
+            break
+        except PermissionError:
+            # Windows 上边下载边解压的线程可能正短暂打开该文件
+            if attempt == FINALIZE_RETRIES - 1:
+                raise
+            time.sleep(0.05)
+    journal = journal_path_for(part_path)
+    if journal.exists():
+        os.remove(journal)
+    return dest_path
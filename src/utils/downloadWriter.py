@@ -0,0 +1,239 @@
+"""
+下载写入路径
+按 Content-Length 预分配目标文件, 写入前检查磁盘剩余空间, 并将网络数据块合并到自适应大小的缓冲区后再写盘,
+链路越快缓冲区越大 (最大为 MB 级), 以减少慢速磁盘上的小块写入与文件碎片
+打开文件与写盘均在每个写入器独有的写盘线程中依次进行, 不阻塞下载所在的事件循环
+"""
+
+import asyncio
+import errno
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from loguru import logger as log
+
+from config.config import (
+    DOWNLOAD_BUFFER_MIN_SIZE,
+    DOWNLOAD_BUFFER_MAX_SIZE,
+    DOWNLOAD_BUFFER_FILL_TARGET,
+    DOWNLOAD_FREE_SPACE_MARGIN,
+)
+
+
+# 单次 writev 可提交的最大数据块数, 不支持 writev 的平台 (Windows) 为 0
+_IOV_MAX = os.sysconf("SC_IOV_MAX") if hasattr(os, "writev") else 0
+
+
+class InsufficientDiskSpaceError(OSError):
+    """磁盘剩余空间不足以容纳待下载的文件"""
+
+
+def ensure_free_space(folder: Path, required: int):
+    """
+    检查 folder 所在磁盘是否还有 required 字节 (另加 DOWNLOAD_FREE_SPACE_MARGIN 余量) 的空间
+
+    Raises:
+        InsufficientDiskSpaceError: 空间不足
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    free = shutil.disk_usage(folder).free
+    if free < required + DOWNLOAD_FREE_SPACE_MARGIN:
+        raise InsufficientDiskSpaceError(
+            f"磁盘空间不足: {folder} 剩余 {free / 1024 / 1024:.2f} MB, "
+            f"需要 {(required + DOWNLOAD_FREE_SPACE_MARGIN) / 1024 / 1024:.2f} MB"
+        )
+
+
+def preallocate(f, size: int):
+    """
+    为已打开的文件分配 size 字节的磁盘空间, 让文件系统一次分配连续空间
+
+    支持 posix_fallocate 的平台上实际分配数据块; 否则以 truncate 扩展文件长度, NTFS 上会随之分配簇
+    (文件未标记为稀疏文件), 其他文件系统上可能只生成稀疏文件
+    """
+    f.seek(0, os.SEEK_END)
+    if f.tell() >= size:
+        return
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+            return
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise InsufficientDiskSpaceError(e.errno, f"磁盘空间不足, 无法分配 {size} 字节") from e
+            # 文件系统不支持 (如 EOPNOTSUPP), 改为扩展文件长度
+    f.truncate(size)
+
+
+class DownloadWriter:
+    """
+    带自适应缓冲区的下载文件写入器, 在事件循环中以 async with 使用
+
+    缓冲区从 DOWNLOAD_BUFFER_MIN_SIZE 开始, 填满一次所用时间短于 DOWNLOAD_BUFFER_FILL_TARGET 时翻倍,
+    长于其 4 倍时减半, 范围不超过 DOWNLOAD_BUFFER_MAX_SIZE; 写盘在独立的线程中进行, 期间继续接收网络数据
+
+    Args:
+        path: 目标文件路径
+        offset: 起始写入位置 (断点续传时为已完成的字节数)
+        total_size: 文件总大小, 已知时用于检查磁盘空间并预分配
+        on_flush: 每次写盘后以写入区间 (start, end) 回调 (在写盘线程中调用), 区间为闭区间
+        existing: 写入已存在的文件 (如分段下载预分配的文件), 不截断也不预分配
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        offset: int = 0,
+        total_size: int = 0,
+        on_flush: Optional[Callable[[int, int], None]] = None,
+        existing: bool = False,
+    ):
+        self.path = Path(path)
+        self.total_size = total_size
+        self.on_flush = on_flush
+        self.existing = existing
+        self.buffer_size = DOWNLOAD_BUFFER_MIN_SIZE
+        self.flushed = offset  # 已写入磁盘的位置
+        self._received = offset
+        self.write_calls = 0
+        self._chunks: List[bytes] = []  # 尚未写盘的数据块, 写盘时一次性写出以避免拼接复制
+        self._pending = 0
+        self._fill_started = time.perf_counter()
+        self._file = None
+        self._failed = False  # 写盘失败后文件位置不确定, 不再写入
+        # 单个线程按提交顺序执行打开、写盘与关闭, 被取消时也不会与仍在进行的写盘并发
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="download-writer")
+        self._flushing: Optional[asyncio.Future] = None  # 正在进行的写盘
+
+    def _open(self):
+        resume = self.existing or (self.flushed > 0 and self.path.exists())
+        if self.total_size and not self.existing:
+            existing_size = self.path.stat().st_size if resume else 0
+            ensure_free_space(self.path.parent, max(self.total_size - existing_size, 0))
+        # 无缓冲打开, 由本类自行合并写入
+        self._file = open(self.path, "r+b" if resume else "wb", buffering=0)
+        try:
+            if self.total_size and not self.existing:
+                preallocate(self._file, self.total_size)
+            self._file.seek(self.flushed)
+        except BaseException:
+            self._file.close()
+            raise
+
+    def _submit(self, func, *args) -> asyncio.Future:
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def __aenter__(self) -> "DownloadWriter":
+        try:
+            await self._submit(self._open)
+        except BaseException:
+            self._executor.shutdown(wait=False)
+            raise
+        self._fill_started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # 出错或被取消时也写出已收到的数据, 以便续传
+        try:
+            await self._wait_flushing()
+        finally:
+            closing = self._submit(self._close, self._take())
+            self._executor.shutdown(wait=False)
+            await asyncio.shield(closing)
+        return False
+
+    def _close(self, chunks: List[bytes]):
+        try:
+            if not self._failed:
+                self._flush_chunks(chunks)
+        finally:
+            self._file.close()
+
+    @property
+    def offset(self) -> int:
+        """已接收的数据末尾位置 (含尚未写盘的部分)"""
+        return self._received
+
+    async def write(self, data: bytes):
+        if not data:
+            return
+        self._chunks.append(data)
+        self._pending += len(data)
+        self._received += len(data)
+        if self._pending >= self.buffer_size:
+            self._adapt()
+            # 同一时间只有一次写盘, 上一次尚未完成时在此等待 (磁盘慢于网络时形成背压)
+            await self._wait_flushing()
+            self._flushing = self._submit(self._flush_chunks, self._take())
+
+    async def flush(self):
+        await self._wait_flushing()
+        await self._submit(self._flush_chunks, self._take())
+
+    async def _wait_flushing(self):
+        if self._flushing:
+            # 被取消时写盘线程仍会写完, 由 __aexit__ 再次等待
+            await asyncio.shield(self._flushing)
+            self._flushing = None
+
+    def _adapt(self):
+        fill_time = time.perf_counter() - self._fill_started
+        if (
+            fill_time < DOWNLOAD_BUFFER_FILL_TARGET
+            and self.buffer_size < DOWNLOAD_BUFFER_MAX_SIZE
+        ):
+            self.buffer_size = min(self.buffer_size * 2, DOWNLOAD_BUFFER_MAX_SIZE)
+        elif (
+            fill_time > DOWNLOAD_BUFFER_FILL_TARGET * 4
+            and self.buffer_size > DOWNLOAD_BUFFER_MIN_SIZE
+        ):
+            self.buffer_size = max(self.buffer_size // 2, DOWNLOAD_BUFFER_MIN_SIZE)
+
+    def _take(self) -> List[bytes]:
+        """取出缓冲区中的数据块交给写盘线程"""
+        chunks = self._chunks
+        self._chunks = []
+        self._pending = 0
+        self._fill_started = time.perf_counter()
+        return chunks
+
+    def _flush_chunks(self, chunks: List[bytes]):
+        if not chunks:
+            return
+        start = self.flushed
+        try:
+            _write_all(self._file, chunks)
+        except BaseException:
+            self._failed = True
+            raise
+        self.write_calls += 1
+        self.flushed += sum(len(chunk) for chunk in chunks)
+        if self.on_flush:
+            try:
+                self.on_flush(start, self.flushed - 1)
+            except OSError as e:
+                log.warning(f"写盘回调失败: {e}")
+
+
+def _write_all(f, chunks: List[bytes]):
+    """将数据块写入无缓冲文件, 支持 writev 的平台上不做拼接复制"""
+    if not _IOV_MAX:
+        data = memoryview(b"".join(chunks))
+        while data:
+            data = data[f.write(data) :]
+        return
+
+    fd = f.fileno()
+    pending = [memoryview(chunk) for chunk in chunks]
+    while pending:
+        written = os.writev(fd, pending[:_IOV_MAX])
+        # 处理部分写入: 丢弃已写完的数据块, 截断写了一半的数据块
+        while written and written >= len(pending[0]):
+            written -= len(pending.pop(0))
+        if written:
+            pending[0] = pending[0][written:]
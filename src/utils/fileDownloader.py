@@ -1,8 +1,8 @@
-import requests
-import time
+import threading
 import zipfile
 import shutil
 import os
+from dataclasses import dataclass, field
 from pathlib import Path
 from loguru import logger as log
 from config.config import (
@@ -10,164 +10,845 @@ from config.config import (
     AURA_FILENAME,
     CORE_FILENAME,
     TEMP_INSTALL_DIR,
+    PARTIAL_DOWNLOAD_DIR,
+    PARTIAL_DOWNLOAD_DIR_NAME,
+    DOWNLOAD_JOURNAL_FLUSH_BYTES,
+    DOWNLOAD_READ_CHUNK_SIZE,
+    DOWNLOAD_USER_AGENT,
+    DOWNLOAD_POOL_LIMIT_PER_HOST,
+    DOWNLOAD_KEEPALIVE_TIMEOUT,
+    DOWNLOAD_READ_TIMEOUT,
+    DOWNLOAD_HEDGE_ENABLED,
+    DOWNLOAD_HEDGE_CHECK_INTERVAL,
+    SEGMENTED_DOWNLOAD_ENABLED,
+    DELTA_MAX_BASES,
+)
+from utils import (
+    segmentedDownloader,
+    downloadJournal,
+    artifactCache,
+    mirrorScoreboard,
+    progressReporter,
+    downloadWriter,
+    downloadHedging,
+    streamingUnzip,
+    downloadDigest,
+    deltaUpgrade,
+    bandwidthLimiter,
+    downloadCoordinator,
+    peerCache,
+    downloadEngine,
+    parallelUnzip,
 )
-import typeDefs.lifecycle
-import lifecycle as lifecycleMgr
 import asyncio
 import aiohttp
+import concurrent.futures
 import time
 from typing import List, Tuple
 
 
-desiredTag = None
+@dataclass
+class ReleaseContext:
+    """
+    一次发布版本下载的状态, 由同一批次的下载共享; 每个批次使用各自的实例, 并发的批次互不影响
+
+    Args:
+        tag: 版本 Tag; 只按完整 URL 下载时为 None
+    """
+
+    tag: str | None
+    expected_digests: dict[str, str] = field(default_factory=dict)  # 文件名 -> 发布信息中的 SHA-256
+    downloaded_digests: dict[str, str] = field(default_factory=dict)  # 文件名 -> 下载时计算的 SHA-256
+
+
+def _build_download_headers(
+    journal: downloadJournal.DownloadJournal | None, url: str, resume_from: int
+) -> dict:
+    downloadHeaders = {
+        "Accept-Encoding": "",
+        "User-Agent": DOWNLOAD_USER_AGENT,
+    }
+    if journal and resume_from > 0:
+        downloadHeaders["Range"] = f"bytes={resume_from}-"
+        # 同一 URL 时让服务器在文件变化时直接返回完整内容
+        if journal.url == url and (journal.etag or journal.last_modified):
+            downloadHeaders["If-Range"] = journal.etag or journal.last_modified
+    return downloadHeaders
+
+
+def _resolve_journal(
+    status: int,
+    headers,
+    journal: downloadJournal.DownloadJournal | None,
+    url: str,
+    resume_from: int,
+    part_path: Path,
+    filename: str,
+) -> Tuple[downloadJournal.DownloadJournal, int, int] | None:
+    """
+    根据响应决定续传还是从头下载
+
+    Returns:
+        (续传日志, 文件总大小, 起始写入位置), 响应与续传记录不一致时返回 None
+    """
+    etag = headers.get("etag", "")
+    last_modified = headers.get("last-modified", "")
+    if status == 206 and journal:
+        # Content-Range: bytes 1000-12344/12345
+        content_range = headers.get("content-range", "")
+        range_start = content_range.split(" ")[-1].split("-")[0]
+        total_size = content_range.rsplit("/", 1)[-1]
+        if (
+            range_start.isdigit()
+            and total_size.isdigit()
+            and int(range_start) == resume_from
+            and journal.matches(url, int(total_size), etag, last_modified)
+        ):
+            log.info(f"从 {resume_from / 1024 / 1024:.2f} MB 处继续下载 {filename}")
+            return journal, int(total_size), resume_from
+        return None
+
+    if resume_from > 0:
+        log.info(f"下载源不支持续传或文件已变化, 从头下载 {filename}")
+    total_size = int(headers.get("content-length", 0))
+    return (
+        downloadJournal.DownloadJournal(part_path, url, total_size, etag, last_modified),
+        total_size,
+        0,
+    )
+
+
+def _create_session() -> aiohttp.ClientSession:
+    """下载使用的 aiohttp 会话, 需在下载引擎的事件循环中创建"""
+    connector = aiohttp.TCPConnector(
+        limit_per_host=DOWNLOAD_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=DOWNLOAD_KEEPALIVE_TIMEOUT,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=DOWNLOAD_READ_TIMEOUT),
+        auto_decompress=False,
+    )
+
+
+def download_file(
+    url: str,
+    dest_folder: str,
+    filename: str,
+    reporter: progressReporter.ProgressReporter | None = None,
+    context: ReleaseContext | None = None,
+) -> Path | str | None:
+    """
+    单连接下载文件, 支持断点续传
+
+    未完成的文件保存在 PARTIAL_DOWNLOAD_DIR 中并附带续传日志, 下载中断时保留,
+    重试或下次运行时通过 Range 请求从已完成的位置继续
+    同步调用方使用: 下载在下载引擎上以 download_file_async 执行, 调用线程只等待结果
+    """
+
+    async def run():
+        async with _create_session() as session:
+            return await download_file_async(
+                session, url, dest_folder, filename, reporter=reporter, context=context
+            )
+
+    return downloadEngine.get_engine().run(run())
 
 
-def download_file(url: str, dest_folder: str, filename: str) -> Path | str | None:
+async def download_file_async(
+    session: aiohttp.ClientSession,
+    url: str,
+    dest_folder: str,
+    filename: str,
+    cancel_event: threading.Event | None = None,
+    reporter: progressReporter.ProgressReporter | None = None,
+    progress: downloadHedging.StreamProgress | None = None,
+    context: ReleaseContext | None = None,
+) -> Path | str | None:
+    """
+    单连接下载文件, 支持断点续传, 复用调用方传入的 session 连接池
+
+    Args:
+        session: 共享的 aiohttp 会话
+        url: 文件完整 URL
+        dest_folder: 目标目录
+        filename: 文件名
+        cancel_event: 置位后中止下载并返回 "DL_CANCEL"
+        reporter: 进度汇报器, 同一批次的下载应共用一个
+        progress: 记录传输位置与吞吐量, 供对冲判断使用
+        context: 所属批次的发布信息, 用于校验 SHA-256 并记录下载时计算的摘要
+    """
+    reporter = reporter or progressReporter.ProgressReporter()
+    context = context or ReleaseContext(None)
     dest_path = Path(dest_folder) / filename
+    part_path = Path(PARTIAL_DOWNLOAD_DIR) / filename
     log.info(f"正在从 {url} 下载 {filename}, 目标目录: {dest_path}")
 
-    try:
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
+    journal = downloadJournal.DownloadJournal.load(part_path)
+    resume_from = journal.contiguous_bytes if journal else 0
+    downloaded_size = resume_from
+    request_start = first_byte_at = time.perf_counter()
 
-        downloadHeaders = {
-            "Accept-Encoding": "",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36",
-        }
-        with requests.get(url, stream=True, timeout=60, headers=downloadHeaders) as r:
+    try:
+        part_path.parent.mkdir(parents=True, exist_ok=True)
+
+        downloadHeaders = _build_download_headers(journal, url, resume_from)
+        async with session.get(url, headers=downloadHeaders) as r:
+            if r.status == 416 and journal and journal.is_complete():
+                log.info(f"文件 {filename} 此前已下载完成")
+                return await asyncio.to_thread(
+                    _finalize_completed_partial, context, url, journal, dest_path, filename
+                )
             r.raise_for_status()
-            total_size = int(r.headers.get("content-length", 0))
+
+            resolved = _resolve_journal(
+                r.status, r.headers, journal, url, resume_from, part_path, filename
+            )
+            if not resolved:
+                log.warning(f"下载源返回的内容与续传记录不一致, 重新下载 {filename}")
+                r.release()
+                downloadJournal.discard_partial(part_path)
+                return await download_file_async(
+                    session, url, dest_folder, filename, cancel_event, reporter, progress, context
+                )
+            journal, total_size, resume_from = resolved
+            downloaded_size = resume_from
+            first_byte_at = time.perf_counter()
+
             log.info(
                 f"文件大小: {total_size / 1024 / 1024:.2f} MB"
                 if total_size
                 else "文件大小: 未知"
             )
+            reporter.start(filename, total_size, resume_from)
+            digest = downloadDigest.StreamDigest()
+            await asyncio.to_thread(digest.catch_up, part_path, resume_from)
+            if progress:
+                progress.begin(total_size, resume_from)
+                progress.digest = digest
+
+            async with downloadWriter.DownloadWriter(
+                part_path, resume_from, total_size, _journal_flusher(journal)
+            ) as writer:
+                if total_size:
+                    await asyncio.to_thread(journal.save)
+                limiter = bandwidthLimiter.get_limiter()
+                async for chunk in r.content.iter_chunked(DOWNLOAD_READ_CHUNK_SIZE):
+                    if cancel_event and cancel_event.is_set():
+                        raise Exception("INSTALLATION_CANCELLED")
+                    await writer.write(chunk)
+                    digest.update(chunk)
+                    if progress:
+                        progress.add(len(chunk))
+                        # 对冲请求进行中时只汇报超出对冲请求位置的部分
+                        advanced = progress.advance_reported(progress.position)
+                        if advanced:
+                            reporter.add(filename, advanced)
+                    else:
+                        reporter.add(filename, len(chunk))
+                    if limiter:
+                        await limiter.consume_async(len(chunk))
+            downloaded_size = writer.flushed
+
+        if total_size and downloaded_size < total_size:
+            log.warning(f"下载源提前结束了响应, 已保存进度以便续传 {filename}")
+            _save_progress(journal)
+            _record_failure(url)
+            return None
 
-            with open(dest_path, "wb") as f:
-                downloaded_size = 0
-                chunk_size = 8192
-                for chunk in r.iter_content(chunk_size=chunk_size):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
-
-                        callbackFuncName = (
-                            typeDefs.lifecycle.GLOBAL_CALLBACKS.REPORT_DOWNLOAD_PROGRESS.value
-                        )
-                        if callbackFuncName in lifecycleMgr.callbacks.keys():
-                            if lifecycleMgr.callbacks[callbackFuncName]:
-                                lifecycleMgr.callbacks[callbackFuncName](
-                                    downloaded_size, total_size, f.name.split("\\")[-1]
-                                )  # type: ignore
-
+        _record_transfer(url, request_start, first_byte_at, downloaded_size - resume_from)
+        if not _verify_digest(context, url, filename, digest):
+            if not (progress and progress.hedged):
+                downloadJournal.discard_partial(part_path)
+            return None
+        downloadJournal.finalize_partial(part_path, dest_path)
+        reporter.finish(filename)
         log.success(f"文件 {filename} 下载成功。")
         return dest_path
-    except requests.exceptions.RequestException as e:
-        log.error(f"下载文件 {filename} 时发生网络错误: {e}")
-        if dest_path.exists():
-            os.remove(dest_path)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        log.error(f"下载文件 {filename} 时发生网络错误: {e!r}")
+        _save_progress(journal)
+        _record_failure(url)
         return None
+    except asyncio.CancelledError:
+        # 被对冲请求抢先完成, 已接收的数据已由 DownloadWriter 写盘
+        _save_progress(journal)
+        raise
+    except downloadWriter.InsufficientDiskSpaceError as e:
+        log.critical(f"无法下载 {filename}: {e}")
+        return "DL_NO_SPACE"
     except Exception as e:
         if "INSTALLATION_CANCELLED" in str(e):
+            _save_progress(journal)
+            if cancel_event:
+                cancel_event.set()
             return "DL_CANCEL"
         log.error(f"写入文件 {filename} 时发生意外错误: {e}")
-        if dest_path.exists():
-            os.remove(dest_path)
+        if not (progress and progress.hedged):
+            downloadJournal.discard_partial(part_path)
         return None
 
 
-async def test_download_source_speed(
-    base_url: str, test_filename: str = None
-) -> Tuple[str, float, bool]:
-    test_url = f"{base_url}/{desiredTag}/{AURA_FILENAME}" if test_filename else base_url
+def _record_transfer(
+    url: str, request_start: float, first_byte_at: float, transferred: int
+):
+    """将完成的下载计入下载源评分表"""
+    if bandwidthLimiter.is_limited():
+        return
+    mirrorScoreboard.get_scoreboard().record_transfer(
+        mirrorScoreboard.base_url_of(url),
+        transferred,
+        time.perf_counter() - first_byte_at,
+        first_byte_at - request_start,
+    )
 
-    try:
-        start_time = time.time()
-
-        async with aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=10)
-        ) as session:
-            async with session.head(test_url) as response:
-                if response.status == 200:
-                    response_time = time.time() - start_time
-                    return (base_url, response_time, True)
-                else:
-                    return (base_url, float("inf"), False)
 
-    except Exception as e:
-        log.warning(f"测速失败 {base_url}: {e}")
-        return (base_url, float("inf"), False)
+def _record_failure(url: str):
+    mirrorScoreboard.get_scoreboard().record_failure(mirrorScoreboard.base_url_of(url))
 
 
-async def benchmark_download_sources(tag_name: str) -> List[str]:
-    log.info("正在测试下载源速度...")
+def _verify_digest(
+    context: ReleaseContext, url: str | None, filename: str, digest: downloadDigest.StreamDigest
+) -> bool:
+    """
+    将下载时计算的 SHA-256 与发布信息比对, 不一致时隔离来源下载源
 
-    tasks = [
-        test_download_source_speed(url, AURA_FILENAME) for url in BASE_DOWNLOAD_URLS
-    ]
-    results = await asyncio.gather(*tasks)
+    Args:
+        url: 数据来源 URL; 数据来自多个下载源而无法确定来源时为 None
+    """
+    actual = digest.hexdigest()
+    expected = context.expected_digests.get(filename)
+    if not expected:
+        context.downloaded_digests[filename] = actual
+        return True
+    if actual != expected:
+        log.error(
+            f"{filename} SHA-256 校验失败, 期望 {expected[:12]}, 实际 {actual[:12]}"
+        )
+        if url:
+            mirrorScoreboard.get_scoreboard().quarantine(
+                mirrorScoreboard.base_url_of(url)
+            )
+        return False
+    log.info(f"{filename} SHA-256 校验通过 ({actual[:12]})")
+    context.downloaded_digests[filename] = actual
+    return True
 
-    # 筛选可用源并按响应时间排序
-    available_sources = [(url, time) for url, time, available in results if available]
-    available_sources.sort(key=lambda x: x[1])
 
-    sorted_urls = [url for url, _ in available_sources]
+def _finalize_completed_partial(
+    context: ReleaseContext,
+    url: str,
+    journal: downloadJournal.DownloadJournal,
+    dest_path: Path,
+    filename: str,
+) -> Path | None:
+    """此前已下载完成但未移动到目标位置的文件: 校验后移动"""
+    digest = downloadDigest.StreamDigest()
+    digest.catch_up(journal.part_path, journal.content_length)
+    if not _verify_digest(context, url, filename, digest):
+        downloadJournal.discard_partial(journal.part_path)
+        return None
+    return downloadJournal.finalize_partial(journal.part_path, dest_path)
 
-    # 输出测速结果
-    for url, response_time in available_sources[:3]:  # 只输出前 3 个最快的
-        log.info(
-            f"下载源 {url.split('//')[1].split('/')[0]} 响应时间: {response_time:.2f}s"
+
+def _journal_flusher(journal: downloadJournal.DownloadJournal):
+    """
+    生成 DownloadWriter 的写盘回调: 记录已写入的区间, 每写入 DOWNLOAD_JOURNAL_FLUSH_BYTES 保存一次日志
+    """
+    last_saved = [journal.contiguous_bytes]
+
+    def on_flush(start: int, end: int):
+        journal.add_range(start, end)
+        if (
+            journal.content_length
+            and end + 1 - last_saved[0] >= DOWNLOAD_JOURNAL_FLUSH_BYTES
+        ):
+            journal.save()
+            last_saved[0] = end + 1
+
+    return on_flush
+
+
+def _save_progress(journal: downloadJournal.DownloadJournal | None):
+    """下载中断时保存续传日志 (已写入的区间已由写盘回调记录)"""
+    if not journal or not journal.content_length:
+        return
+    try:
+        journal.save()
+    except OSError as e:
+        log.warning(f"保存续传日志失败: {e}")
+
+
+async def download_file_hedged_async(
+    session: aiohttp.ClientSession,
+    context: ReleaseContext,
+    download_urls: List[str],
+    dest_folder: str,
+    filename: str,
+    cancel_event: threading.Event | None = None,
+    reporter: progressReporter.ProgressReporter | None = None,
+) -> Path | str | None:
+    """
+    从 download_urls[0] 单连接下载, 传输变慢时对冲到后续下载源
+
+    吞吐量在 DOWNLOAD_HEDGE_WINDOW 内低于 DOWNLOAD_HEDGE_MIN_THROUGHPUT 时,
+    从下一个下载源获取剩余部分; 两路中先完成者胜出, 另一路被取消。对冲失败后仍变慢时会继续尝试之后的下载源
+
+    Returns:
+        与 download_file_async 相同
+    """
+    reporter = reporter or progressReporter.ProgressReporter()
+    url = f"{download_urls[0]}/{context.tag}/{filename}"
+    progress = downloadHedging.StreamProgress(url)
+    primary = asyncio.create_task(
+        download_file_async(
+            session, url, dest_folder, filename, cancel_event, reporter, progress, context
         )
+    )
+    # 限速时吞吐量受令牌桶约束, 对冲既无法加速也会额外占用带宽
+    if not DOWNLOAD_HEDGE_ENABLED or bandwidthLimiter.is_limited() or len(download_urls) < 2:
+        return await primary
+
+    metrics = downloadHedging.get_metrics()
+    metrics.record_download()
+    part_path = Path(PARTIAL_DOWNLOAD_DIR) / filename
+    hedge_path = downloadHedging.hedge_path_for(part_path)
+    candidates = list(download_urls[1:])
+    hedge: asyncio.Task | None = None
+    hedge_progress: downloadHedging.StreamProgress | None = None
+    hedge_start = 0
+    primary_failed = False
+
+    try:
+        while True:
+            pending = [task for task in (primary, hedge) if task and not task.done()]
+            if pending:
+                await asyncio.wait(
+                    pending,
+                    timeout=DOWNLOAD_HEDGE_CHECK_INTERVAL,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+            if primary.done() and not primary_failed:
+                result = primary.result()
+                if result or hedge is None:
+                    if result and hedge and hedge_progress:
+                        log.info(f"原请求先完成 {filename}, 取消对冲请求")
+                        metrics.record_primary_win(hedge_progress.received)
+                    return result
+                log.warning(f"原请求下载 {filename} 失败, 等待对冲请求完成")
+                primary_failed = True
+
+            if hedge and hedge.done():
+                if hedge.exception() is None and hedge.result():
+                    saved = 0.0
+                    if not primary.done():
+                        saved = progress.estimate_remaining_time(
+                            hedge_progress.received
+                            / max(time.perf_counter() - hedge_progress.started_at, 1e-3)
+                        )
+                        primary.cancel()
+                        await asyncio.gather(primary, return_exceptions=True)
+                        # 让评分表记住原下载源此次的实际吞吐量
+                        _record_transfer(
+                            url, progress.requested_at, progress.started_at, progress.received
+                        )
+                    try:
+                        digest = hedge_progress.digest
+                        if digest is None:
+                            digest = downloadDigest.StreamDigest()
+                            await asyncio.to_thread(digest.catch_up, part_path, hedge_start)
+                            await asyncio.to_thread(
+                                digest.catch_up, hedge_path, progress.total_size, hedge_start
+                            )
+                        # 数据来自两个下载源, 校验失败时无法判断是哪一方的问题, 全部重新下载
+                        if not _verify_digest(context, None, filename, digest):
+                            downloadJournal.discard_partial(part_path)
+                            return None
+                        await asyncio.to_thread(
+                            downloadHedging.splice_hedge, part_path, hedge_path, hedge_start
+                        )
+                        dest_path = downloadJournal.finalize_partial(
+                            part_path, Path(dest_folder) / filename
+                        )
+                    except FileNotFoundError as e:
+                        # 未完成文件已不存在, 对冲请求的数据无法拼接, 由调用方从下一个下载源重新下载
+                        log.warning(f"拼接对冲请求的数据失败 {filename}: {e}")
+                        downloadJournal.discard_partial(part_path)
+                        return None
+                    metrics.record_hedge_win(
+                        saved, max(progress.position - hedge_start, 0)
+                    )
+                    _record_transfer(
+                        hedge_progress.url,
+                        hedge_progress.requested_at,
+                        hedge_progress.started_at,
+                        hedge_progress.received,
+                    )
+                    reporter.start(filename, progress.total_size, progress.total_size)
+                    reporter.finish(filename)
+                    log.success(
+                        f"对冲请求先完成 {filename}, 估计节省 {saved:.1f}s"
+                    )
+                    return dest_path
+                hedge = None
+                progress.hedged = False
+                downloadHedging.discard_hedge(hedge_path)
+                if primary_failed:
+                    # 原请求失败时为对冲保留了未完成文件, 对冲也失败后不再续传
+                    downloadJournal.discard_partial(part_path)
+                    return None
+
+            if (
+                hedge is None
+                and not primary.done()
+                and candidates
+                and progress.is_stalled()
+            ):
+                if cancel_event and cancel_event.is_set():
+                    continue
+                hedge_base_url = candidates.pop(0)
+                if mirrorScoreboard.get_scoreboard().is_quarantined(hedge_base_url):
+                    continue
+                hedge_url = f"{hedge_base_url}/{context.tag}/{filename}"
+                hedge_start = progress.position
+                log.warning(
+                    f"{mirrorScoreboard.mirror_host(url)} 下载 {filename} 过慢 "
+                    f"({progress.throughput() / 1024:.0f} KB/s), "
+                    f"从 {mirrorScoreboard.mirror_host(hedge_url)} 并行获取剩余 "
+                    f"{progress.remaining / 1024 / 1024:.2f} MB"
+                )
+                metrics.record_triggered()
+                progress.hedged = True
+                hedge_progress = downloadHedging.StreamProgress(hedge_url)
+                # 原请求已计入摘要的位置恰为对冲起点时, 对冲请求接着计算
+                if progress.digest and progress.digest.position == hedge_start:
+                    hedge_progress.digest = progress.digest.copy()
+                hedge = asyncio.create_task(
+                    downloadHedging.fetch_remaining_async(
+                        session,
+                        hedge_url,
+                        hedge_path,
+                        hedge_start,
+                        progress.total_size,
+                        cancel_event,
+                        hedge_progress,
+                        progress,
+                        reporter,
+                        filename,
+                    )
+                )
+    finally:
+        for task in (primary, hedge):
+            if task and not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        downloadHedging.discard_hedge(hedge_path)
+
+
+async def benchmark_download_sources(
+    tag_name: str, session: aiohttp.ClientSession | None = None
+) -> List[str]:
+    """
+    按下载源评分表对 BASE_DOWNLOAD_URLS 排序
+
+    统计数据过期的下载源会先以小范围 Range 请求测速
+    """
+    if session is None:
+        async with aiohttp.ClientSession() as own_session:
+            return await benchmark_download_sources(tag_name, own_session)
+
+    scoreboard = mirrorScoreboard.get_scoreboard()
+    await scoreboard.refresh(session, BASE_DOWNLOAD_URLS, tag_name, AURA_FILENAME)
+    sorted_urls = scoreboard.rank(BASE_DOWNLOAD_URLS)
+
+    # 输出测速结果
+    for url in sorted_urls[:3]:  # 只输出前 3 个最快的
+        log.info(scoreboard.describe(url))
 
-    return sorted_urls if sorted_urls else BASE_DOWNLOAD_URLS
+    return sorted_urls
 
 
 def download_file_multi_sources(
-    filename: str, dest_folder: str, use_speed_optimization: bool = True
+    filename: str,
+    dest_folder: str,
+    use_speed_optimization: bool = True,
+    use_segmented: bool = SEGMENTED_DOWNLOAD_ENABLED,
+    reporter: progressReporter.ProgressReporter | None = None,
+    context: ReleaseContext | None = None,
 ) -> Path | None:
     """
     尝试从多个下载源下载文件
+
+    优先使用分段多连接下载, 若下载源均不支持 Range 或分段下载失败, 则回退为逐个源的单连接下载
+    测速与下载均在下载引擎上执行, 调用线程只等待结果
+    context 为 None 时不知道版本 Tag, 不进行测速与分段下载
     """
-    global desiredTag
+    return downloadEngine.get_engine().run(
+        _download_file_multi_sources_standalone_async(
+            filename,
+            dest_folder,
+            use_speed_optimization,
+            use_segmented,
+            reporter,
+            context or ReleaseContext(None),
+        )
+    )
 
-    download_urls = BASE_DOWNLOAD_URLS
 
-    if use_speed_optimization and desiredTag:
+async def _download_file_multi_sources_standalone_async(
+    filename: str,
+    dest_folder: str,
+    use_speed_optimization: bool,
+    use_segmented: bool,
+    reporter: progressReporter.ProgressReporter | None,
+    context: ReleaseContext,
+) -> Path | None:
+    reporter = reporter or progressReporter.ProgressReporter()
+    async with _create_session() as session:
+        download_urls = BASE_DOWNLOAD_URLS
+        if use_speed_optimization and context.tag:
+            try:
+                optimized_urls = await benchmark_download_sources(context.tag, session)
+                if optimized_urls:
+                    download_urls = optimized_urls
+                    log.info("测速完成, 将按测速顺序进行下载")
+            except Exception as e:
+                log.warning(f"测速失败, 使用默认顺序: {e}")
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            optimized_urls = loop.run_until_complete(
-                benchmark_download_sources(desiredTag)
+            return await download_file_multi_sources_async(
+                session,
+                context,
+                filename,
+                dest_folder,
+                download_urls,
+                threading.Event(),
+                reporter,
+                use_segmented,
             )
-            loop.close()
-
-            if optimized_urls:
-                download_urls = optimized_urls
-                log.info("测速完成, 将按测速顺序进行下载")
-        except Exception as e:
-            log.warning(f"测速失败, 使用默认顺序: {e}")
+        finally:
+            mirrorScoreboard.get_scoreboard().save()
+
+
+async def download_file_multi_sources_async(
+    session: aiohttp.ClientSession,
+    context: ReleaseContext,
+    filename: str,
+    dest_folder: str,
+    download_urls: List[str],
+    cancel_event: threading.Event,
+    reporter: progressReporter.ProgressReporter,
+    use_segmented: bool = SEGMENTED_DOWNLOAD_ENABLED,
+) -> Path | None:
+    """
+    尝试从多个下载源下载文件, 使用调用方已排好序的下载源
 
-    for base_url in download_urls:
-        url = f"{base_url}/{desiredTag}/{filename}"
-        result = download_file(url, dest_folder, filename)
+    下载失败或被取消时置位 cancel_event, 使同一批次的其他下载一并停止
+    """
+    if use_segmented and context.tag:
+        digest = downloadDigest.StreamDigest()
+        result = await segmentedDownloader.download_file_segmented_async(
+            session,
+            download_urls,
+            context.tag,
+            filename,
+            dest_folder,
+            cancel_event,
+            reporter,
+            digest,
+        )
         if result == "DL_CANCEL":
             log.warning("下载已取消")
+            cancel_event.set()
+            return None
+        elif result == "DL_NO_SPACE":
+            cancel_event.set()
+            return None
+        elif result:
+            size = Path(result).stat().st_size
+            if digest.position < size:
+                await asyncio.to_thread(digest.catch_up, result, size)
+            # 分段来自多个下载源, 校验失败时由单连接下载逐个确认
+            if _verify_digest(context, None, filename, digest):
+                return result  # type: ignore
+            os.remove(result)
+        log.info(f"分段下载不可用, 回退为单连接下载 {filename}")
+
+    scoreboard = mirrorScoreboard.get_scoreboard()
+    for index, base_url in enumerate(download_urls):
+        if cancel_event.is_set():
+            log.warning(f"下载已取消, 停止下载 {filename}")
+            return None
+        if scoreboard.is_quarantined(base_url):
+            log.info(f"跳过已隔离的下载源 {mirrorScoreboard.mirror_host(base_url)}")
+            continue
+        url = f"{base_url}/{context.tag}/{filename}"
+        result = await download_file_hedged_async(
+            session, context, download_urls[index:], dest_folder, filename, cancel_event, reporter
+        )
+        if result == "DL_CANCEL":
+            log.warning("下载已取消")
+            cancel_event.set()
+            return None
+        elif result == "DL_NO_SPACE":
+            cancel_event.set()
             return None
         elif result:
             return result  # type: ignore
         else:
             log.warning(f"从 {url} 下载失败, 尝试下一个源...")
     log.critical(f"所有下载源均失败, 无法下载 {filename}")
+    cancel_event.set()
     return None
 
 
+async def _download_release_file_async(
+    session: aiohttp.ClientSession,
+    context: ReleaseContext,
+    filename: str,
+    dest_folder: str,
+    download_urls: List[str],
+    cancel_event: threading.Event,
+    reporter: progressReporter.ProgressReporter,
+    cache: artifactCache.ArtifactCache | None,
+    delta: bool = False,
+) -> Path | None:
+    result = None
+    if filename == AURA_FILENAME and delta and cache:
+        bases = await asyncio.to_thread(
+            cache.other_versions, filename, context.tag, DELTA_MAX_BASES
+        )
+        dest_path = Path(dest_folder) / filename
+        sha256 = await deltaUpgrade.apply_delta_async(
+            session,
+            download_urls,
+            context.tag,
+            bases,
+            dest_path,
+            context.expected_digests.get(filename),
+            cancel_event,
+            reporter,
+        )
+        if sha256:
+            context.downloaded_digests[filename] = sha256
+            result = dest_path
+    if not result and not cancel_event.is_set():
+        result = await download_file_multi_sources_async(
+            session, context, filename, dest_folder, download_urls, cancel_event, reporter
+        )
+    if result and cache:
+        await asyncio.to_thread(
+            cache.store, context.tag, filename, result, context.downloaded_digests.get(filename)
+        )
+    return result
+
+
+async def download_release_files_async(
+    context: ReleaseContext,
+    dest_folder: str,
+    use_cache: bool = True,
+    delta: bool = False,
+) -> tuple[Path | None, Path | None]:
+    """
+    在同一个 aiohttp 会话上并发下载 core.zip 与 aura.zip
+
+    下载源只测速一次, 两个文件共用测速结果与连接池; 任一文件失败或被取消时另一个也会停止
+    启用缓存时优先使用本地缓存, 下载完成的文件会写入缓存
+    delta 为 True 且缓存未命中时, aura.zip 以缓存中其他版本的 aura.zip 为基础增量下载 (见 deltaUpgrade)
+    需要下载时, 发布信息中的 SHA-256 与下载时计算的摘要记录在 context 中
+    """
+    tag_name = context.tag
+    filenames = [CORE_FILENAME, AURA_FILENAME]
+    results: dict[str, Path | None] = {}
+    cache = artifactCache.ArtifactCache() if use_cache else None
+    if cache:
+        for filename in filenames:
+            results[filename] = await asyncio.to_thread(
+                cache.lookup, tag_name, filename, dest_folder, context.downloaded_digests
+            )
+    missing = [filename for filename in filenames if not results.get(filename)]
+    if not missing:
+        return results[CORE_FILENAME], results[AURA_FILENAME]
+
+    await downloadCoordinator.wait_start_jitter_async()
+    slot = None
+    try:
+        slot = await downloadCoordinator.acquire_download_slot_async()
+        downloaded = await _download_missing_async(
+            context, dest_folder, missing, cache, delta
+        )
+    finally:
+        # 被取消时也要交还名额, 否则其他机器需等到名额超时才能接管
+        if slot:
+            await asyncio.shield(asyncio.to_thread(slot.release))
+    results.update(zip(missing, downloaded))
+    return results[CORE_FILENAME], results[AURA_FILENAME]
+
+
+async def _download_missing_async(
+    context: ReleaseContext,
+    dest_folder: str,
+    missing: List[str],
+    cache: artifactCache.ArtifactCache | None,
+    delta: bool = False,
+) -> List[Path | None]:
+    tag_name = context.tag
+    cancel_event = threading.Event()
+    reporter = progressReporter.ProgressReporter()
+    async with _create_session() as session:
+        download_urls = BASE_DOWNLOAD_URLS
+        try:
+            optimized_urls = await benchmark_download_sources(tag_name, session)
+            if optimized_urls:
+                download_urls = optimized_urls
+                log.info("测速完成, 将按测速顺序进行下载")
+        except Exception as e:
+            log.warning(f"测速失败, 使用默认顺序: {e}")
+
+        context.expected_digests = await downloadDigest.fetch_release_digests(
+            tag_name, download_urls, session
+        )
+        # 只有能按发布信息校验的文件才从局域网获取
+        peer_urls = await peerCache.find_peer_urls_async(
+            tag_name, context.expected_digests, missing
+        )
+        mirrorScoreboard.get_scoreboard().mark_transient(
+            [url for urls in peer_urls.values() for url in urls]
+        )
+
+        downloaded = await asyncio.gather(
+            *(
+                _download_release_file_async(
+                    session,
+                    context,
+                    filename,
+                    dest_folder,
+                    peer_urls.get(filename, []) + download_urls,
+                    cancel_event,
+                    reporter,
+                    cache,
+                    delta,
+                )
+                for filename in missing
+            )
+        )
+    mirrorScoreboard.get_scoreboard().save()
+    hedge_metrics = downloadHedging.get_metrics()
+    if hedge_metrics.session.triggered:
+        log.info(f"本次下载{hedge_metrics.describe(hedge_metrics.session)}")
+    hedge_metrics.save()
+    return downloaded
+
+
 def unzip_file(zip_path: Path, extract_to: Path) -> bool:
     log.info(f"正在解压 {zip_path.name}, 目标目录: {extract_to}")
     try:
-        extract_to.mkdir(parents=True, exist_ok=True)
-        with zipfile.ZipFile(zip_path, "r") as zf:
-            zf.extractall(extract_to)
-        log.success(f"解压 {zip_path.name} 成功。")
+        stats = parallelUnzip.extract_all(zip_path, extract_to)
+        log.success(f"解压 {zip_path.name} 成功: {stats.describe()}")
         return True
+    except parallelUnzip.ExtractLimitError as e:
+        log.error(f"拒绝解压 {zip_path.name}: {e}")
+        return False
     except zipfile.BadZipFile:
         log.error(f"解压时发生错误: {zip_path.name} 不是一个有效的 ZIP 文件。")
         return False
@@ -176,16 +857,82 @@ def unzip_file(zip_path: Path, extract_to: Path) -> bool:
         return False
 
 
-def download_release_files(tagName) -> tuple[Path | None, Path | None]:
+def clear_temp_dir(temp_dir: Path, keep_partial: bool = False):
+    """
+    清理临时文件夹
+
+    Args:
+        temp_dir: 临时文件夹路径
+        keep_partial: 是否保留未完成的下载文件及续传日志
+    """
+    if not keep_partial:
+        shutil.rmtree(temp_dir)
+        return
+    for item in temp_dir.iterdir():
+        if item.name == PARTIAL_DOWNLOAD_DIR_NAME:
+            continue
+        if item.is_dir():
+            shutil.rmtree(item)
+        else:
+            os.remove(item)
+
+
+def download_release_files(
+    tagName,
+    use_cache: bool = True,
+    extractors: dict[str, streamingUnzip.StreamingExtractor] | None = None,
+    delta: bool = False,
+    context: ReleaseContext | None = None,
+) -> tuple[Path | None, Path | None]:
+    """
+    下载 core.zip 与 aura.zip, 阻塞到下载结束
+
+    Args:
+        tagName: 版本 Tag
+        use_cache: 是否使用本地资源文件缓存
+        extractors: 文件名 -> 边下载边解压器, 临时文件夹准备好后启动, 下载结束后通知其完成或取消
+        delta: 以缓存中其他版本的 aura.zip 为基础增量下载 aura.zip
+        context: 接收本次下载的发布摘要 (如生成离线安装包时需要), 默认新建
+    """
+    return downloadEngine.get_engine().run(
+        download_release_async(tagName, use_cache, extractors, delta, context)
+    )
+
+
+def submit_release_download(
+    tagName,
+    use_cache: bool = True,
+    extractors: dict[str, streamingUnzip.StreamingExtractor] | None = None,
+    delta: bool = False,
+    context: ReleaseContext | None = None,
+) -> concurrent.futures.Future:
+    """
+    在下载引擎上开始下载 core.zip 与 aura.zip 并立即返回, 适用于不能阻塞的线程 (如 GUI 线程)
+
+    Returns:
+        concurrent.futures.Future: 结果与 download_release_files 相同; cancel() 会中止下载
+    """
+    return downloadEngine.get_engine().submit(
+        download_release_async(tagName, use_cache, extractors, delta, context)
+    )
+
+
+async def download_release_async(
+    tagName,
+    use_cache: bool = True,
+    extractors: dict[str, streamingUnzip.StreamingExtractor] | None = None,
+    delta: bool = False,
+    context: ReleaseContext | None = None,
+) -> tuple[Path | None, Path | None]:
+    """download_release_files 的可等待版本: 准备临时文件夹、启动边下载边解压器并下载"""
     log.info(f"准备下载 HugoAura 资源文件...")
 
-    global desiredTag
-    desiredTag = tagName
+    context = context or ReleaseContext(tagName)
     temp_dir = Path(TEMP_INSTALL_DIR)
     if temp_dir.exists():
         log.info(f"正在清理旧的临时文件夹: {temp_dir}")
         try:
-            shutil.rmtree(temp_dir)
+            await asyncio.to_thread(clear_temp_dir, temp_dir, keep_partial=True)
         except OSError as e:
             log.error(f"清理失败 {temp_dir}, 请确保当前用户有 %TEMP% 的写入权限: {e}")
             return None, None
@@ -198,12 +945,30 @@ def download_release_files(tagName) -> tuple[Path | None, Path | None]:
         )
         return None, None
 
-    downloaded_core_path = download_file_multi_sources(CORE_FILENAME, str(temp_dir))
+    extractors = extractors or {}
+    for extractor in extractors.values():
+        extractor.start()
+    try:
+        downloaded_core_path, downloaded_zip_path = await download_release_files_async(
+            context, str(temp_dir), use_cache, delta
+        )
+    except BaseException:
+        for extractor in extractors.values():
+            extractor.cancel()
+        raise
+    for filename, path in (
+        (CORE_FILENAME, downloaded_core_path),
+        (AURA_FILENAME, downloaded_zip_path),
+    ):
+        if filename in extractors:
+            if path and path.is_file():
+                extractors[filename].finish(path)
+            else:
+                extractors[filename].cancel()
     if not downloaded_core_path:
         log.critical("下载 core.zip 时发生错误, 安装进程终止。")
         return None, None
 
-    downloaded_zip_path = download_file_multi_sources(AURA_FILENAME, str(temp_dir))
     if not downloaded_zip_path:
         log.critical("下载 aura.zip 时发生错误, 安装进程终止。")
         return downloaded_core_path, None
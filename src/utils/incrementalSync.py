@@ -0,0 +1,256 @@
+"""
+增量同步安装目录
+已安装旧版本时不再整体替换 aura 目录, 而是按 ZIP 中央目录中各条目的大小与 CRC32 比对已安装的文件, 只解压
+有变化或新增的条目, 并删除新版本中已不存在的文件与目录; 大小不同的文件无需计算 CRC32。
+暂存目录与安装目录在同一磁盘时, 有变化的条目解压到暂存目录, 未变化的文件以硬链接引用已安装的文件 (见 stage_from_zip),
+再整个目录改名替换 (见 replace_tree); 否则直接写入安装目录 (见 sync_from_zip)
+"""
+
+import os
+import shutil
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Set, Tuple
+
+from config import config
+from utils import deltaUpgrade, parallelUnzip
+
+
+@dataclass
+class SyncStats:
+    written_files: int = 0
+    written_bytes: int = 0
+    skipped_files: int = 0
+    skipped_bytes: int = 0
+    deleted_files: int = 0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    def describe(self) -> str:
+        return (
+            f"写入 {self.written_files} 个文件 ({self.written_bytes / 1024 / 1024:.2f} MB), "
+            f"跳过 {self.skipped_files} 个未变化的文件 ({self.skipped_bytes / 1024 / 1024:.2f} MB), "
+            f"删除 {self.deleted_files} 个文件, 用时 {self.seconds:.2f}s"
+        )
+
+
+@dataclass
+class SyncPlan:
+    changed: List[str]  # 需写入的相对路径 (有变化或新增)
+    unchanged: List[str]
+    removed_files: List[str]  # 新版本中已不存在的文件
+    removed_dirs: List[str]
+    directories: List[str]  # 新版本中的所有目录
+
+
+def read_zip_index(source: Path | Callable[[], BinaryIO]) -> Dict[str, zipfile.ZipInfo]:
+    """
+    读取 ZIP 中央目录中的文件条目; 多嵌套一层 "aura/aura/" 目录时去除该前缀 (见 extract_resource_files)
+
+    Args:
+        source: ZIP 文件路径, 或返回可随机访问文件对象的函数
+
+    Returns:
+        Dict[str, ZipInfo]: 相对路径 (以 "/" 分隔) -> 条目
+
+    Raises:
+        zipfile.BadZipFile: 不是有效的 ZIP 文件或超出大小限制
+    """
+    opener = (lambda: open(source, "rb")) if isinstance(source, (str, Path)) else source
+    with opener() as f, zipfile.ZipFile(f, "r") as zf:
+        infos = zf.infolist()
+    parallelUnzip.check_limits(infos)
+    files = [info for info in infos if not info.is_dir()]
+    prefix = deltaUpgrade.strip_root([info.filename for info in files])
+    index = {}
+    for info in files:
+        relative = parallelUnzip.target_path(Path(), info.filename[len(prefix) :])
+        if relative != Path():
+            index[relative.as_posix()] = info
+    return index
+
+
+def _walk(root: Path) -> Tuple[Dict[str, Path], Set[str]]:
+    """返回 (相对路径 -> 文件路径, 目录相对路径集合)"""
+    files, dirs = {}, set()
+    for current, dirnames, filenames in os.walk(root):
+        base = Path(current)
+        relative_base = base.relative_to(root)
+        for name in dirnames:
+            dirs.add((relative_base / name).as_posix())
+        for name in filenames:
+            files[(relative_base / name).as_posix()] = base / name
+    return files, dirs
+
+
+def plan_sync(index: Dict[str, zipfile.ZipInfo], target: Path) -> SyncPlan:
+    """
+    比对 ZIP 条目与已安装的目录: 大小一致的文件才计算 CRC32 (多线程)
+
+    Args:
+        index: 见 read_zip_index
+        target: 已安装的目录
+    """
+    target_files, target_dirs = _walk(target) if target.is_dir() else ({}, set())
+    directories = set()
+    for relative in index:
+        parent = Path(relative).parent
+        while parent != Path():
+            directories.add(parent.as_posix())
+            parent = parent.parent
+
+    def unchanged(relative: str) -> bool:
+        installed = target_files.get(relative)
+        info = index[relative]
+        try:
+            return bool(
+                installed
+                and installed.stat().st_size == info.file_size
+                and deltaUpgrade.crc32_file(installed) == info.CRC
+            )
+        except OSError:
+            return False
+
+    relatives = sorted(index)
+    with ThreadPoolExecutor(max_workers=config.INCREMENTAL_SYNC_HASH_WORKERS) as executor:
+        results = list(executor.map(unchanged, relatives))
+    return SyncPlan(
+        changed=[relative for relative, same in zip(relatives, results) if not same],
+        unchanged=[relative for relative, same in zip(relatives, results) if same],
+        removed_files=sorted(set(target_files) - set(index)),
+        removed_dirs=sorted(target_dirs - directories, reverse=True),
+        directories=sorted(directories),
+    )
+
+
+def _plan_stats(index: Dict[str, zipfile.ZipInfo], plan: SyncPlan) -> SyncStats:
+    return SyncStats(
+        written_files=len(plan.changed),
+        written_bytes=sum(index[relative].file_size for relative in plan.changed),
+        skipped_files=len(plan.unchanged),
+        skipped_bytes=sum(index[relative].file_size for relative in plan.unchanged),
+        deleted_files=len(plan.removed_files),
+    )
+
+
+def sync_from_zip(
+    source: Path | Callable[[], BinaryIO], target: Path, dry_run: bool = False
+) -> SyncStats:
+    """
+    将 ZIP 增量同步到已安装的目录, 完成后 target 与完整解压的内容一致; 不在暂存目录中解压
+
+    Args:
+        source: ZIP 文件路径, 或每次调用返回一个新的可随机访问文件对象的函数
+        target: 已安装的目录
+        dry_run: 只统计, 不修改文件
+
+    Returns:
+        SyncStats: 同步统计; 删除失败的文件记录在 errors 中
+
+    Raises:
+        zipfile.BadZipFile: 不是有效的 ZIP 文件或条目校验失败
+        OSError: 写入失败
+    """
+    started = time.perf_counter()
+    index = read_zip_index(source)
+    plan = plan_sync(index, target)
+    stats = _plan_stats(index, plan)
+    if dry_run:
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    # 先删除新版本中已不存在的文件与目录, 为变为目录 / 文件的同名条目腾出位置
+    for relative in plan.removed_files:
+        try:
+            (target / relative).unlink()
+        except OSError as e:
+            stats.errors.append(f"{relative}: {e}")
+    for relative in plan.removed_dirs:
+        try:
+            (target / relative).rmdir()
+        except OSError as e:
+            stats.errors.append(f"{relative}: {e}")
+    target.mkdir(parents=True, exist_ok=True)
+    for relative in plan.directories:
+        (target / relative).mkdir(parents=True, exist_ok=True)
+
+    parallelUnzip.extract_members(
+        source, {index[relative].filename: target / relative for relative in plan.changed}
+    )
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def _link_or_copy(source: Path, target: Path):
+    try:
+        os.link(source, target)
+    except OSError:
+        # 文件系统不支持硬链接
+        shutil.copy2(source, target)
+
+
+def stage_from_zip(
+    source: Path | Callable[[], BinaryIO],
+    installed: Path,
+    staging: Path,
+    dry_run: bool = False,
+) -> SyncStats:
+    """
+    在 staging 中生成新版本的完整目录, 之后以 replace_tree 替换 installed; installed 在替换前保持不变
+
+    只解压有变化或新增的条目, 未变化的文件以硬链接引用已安装的文件 (无法创建硬链接时复制)。
+    staging 须与 installed 位于同一磁盘, 已存在时会被清空
+
+    Args:
+        source: 同 sync_from_zip
+        installed: 已安装的目录
+        staging: 新版本目录
+        dry_run: 只统计, 不写入文件
+
+    Returns:
+        SyncStats: 同步统计; deleted_files 为新版本中不再包含的文件数
+
+    Raises:
+        zipfile.BadZipFile: 不是有效的 ZIP 文件或条目校验失败
+        OSError: 写入失败
+    """
+    started = time.perf_counter()
+    index = read_zip_index(source)
+    plan = plan_sync(index, installed)
+    stats = _plan_stats(index, plan)
+    if dry_run:
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+    for relative in plan.directories:
+        (staging / relative).mkdir(parents=True, exist_ok=True)
+    for relative in plan.unchanged:
+        _link_or_copy(installed / relative, staging / relative)
+
+    parallelUnzip.extract_members(
+        source, {index[relative].filename: staging / relative for relative in plan.changed}
+    )
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def replace_tree(source: Path, target: Path):
+    """
+    以改名替换整个目录 (source 与 target 须在同一磁盘): 旧目录先改名, 新目录就位后再删除旧目录;
+    新目录无法就位时恢复旧目录
+    """
+    backup = target.with_name(f"{target.name}.old-{uuid.uuid4().hex[:8]}")
+    os.replace(target, backup)
+    try:
+        os.replace(source, target)
+    except OSError:
+        os.replace(backup, target)
+        raise
+    shutil.rmtree(backup, ignore_errors=True)
@@ -0,0 +1,163 @@
+"""
+main.js 修补引擎
+按规则表一次扫描 main.js: 所有锚点合并为一个正则表达式 (较长的锚点优先), 逐个匹配后一次拼接输出, 并统计
+每个锚点的匹配次数; 必需的锚点缺失或匹配次数不符时报错, 不会输出修补不完整的 main.js
+规则表按希沃管家的版本 (ASAR 中 package.json 的 version) 选择
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+
+class PatchError(Exception):
+    """必需的锚点缺失或匹配次数不符"""
+
+
+@dataclass(frozen=True)
+class PatchRule:
+    name: str
+    anchor: str
+    replacement: str
+    expected: Optional[int] = None  # 期望的匹配次数, None 为至少一次 (全部替换)
+    required: bool = True  # 为 False 时次数不符只记录, 不报错
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    name: str
+    rules: Tuple[PatchRule, ...]
+    prepend: str = ""
+    min_version: Optional[str] = None  # 适用的希沃管家版本下限 (含)
+    max_version: Optional[str] = None  # 适用的希沃管家版本上限 (不含)
+
+    def __post_init__(self):
+        anchors = [rule.anchor for rule in self.rules]
+        if len(set(anchors)) != len(anchors) or "" in anchors:
+            raise ValueError(f"规则表 {self.name} 中的锚点必须非空且互不相同")
+
+    def applies_to(self, version: Optional[str]) -> bool:
+        if version is None:
+            return self.min_version is None
+        parsed = parse_version(version)
+        if self.min_version and parsed < parse_version(self.min_version):
+            return False
+        if self.max_version and parsed >= parse_version(self.max_version):
+            return False
+        return True
+
+    @property
+    def fingerprint(self) -> str:
+        """规则内容的摘要, 规则变化时修补结果随之变化 (见 patchedAsarCache)"""
+        data = json.dumps(
+            {"prepend": self.prepend, "rules": [asdict(rule) for rule in self.rules]},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass
+class PatchReport:
+    rule_set: str
+    counts: Dict[str, int] = field(default_factory=dict)
+    problems: List[str] = field(default_factory=list)  # 次数不符的规则 (含非必需的)
+
+    def describe(self) -> str:
+        matched = ", ".join(f"{name} x{count}" for name, count in self.counts.items())
+        return f"规则表 {self.rule_set}: {matched}"
+
+
+def parse_version(version: str) -> Tuple[int, ...]:
+    """"1.2.10-beta" -> (1, 2, 10); 无法解析的部分记为 0"""
+    parts = []
+    for part in re.split(r"[.\-+]", version.strip().lstrip("vV")):
+        if not part.isdigit():
+            break
+        parts.append(int(part))
+    return tuple(parts) or (0,)
+
+
+def apply(content: str, rule_set: RuleSet) -> Tuple[str, PatchReport]:
+    """
+    一次扫描应用规则表
+
+    Returns:
+        Tuple[str, PatchReport]: (修补后的内容, 各规则的匹配次数)
+
+    Raises:
+        PatchError: 必需的规则匹配次数不符
+    """
+    by_anchor = {rule.anchor: rule for rule in rule_set.rules}
+    pattern = re.compile(
+        "|".join(re.escape(anchor) for anchor in sorted(by_anchor, key=len, reverse=True))
+    )
+    report = PatchReport(rule_set.name, {rule.name: 0 for rule in rule_set.rules})
+
+    pieces = [rule_set.prepend]
+    position = 0
+    for match in pattern.finditer(content):
+        rule = by_anchor[match.group()]
+        report.counts[rule.name] += 1
+        pieces.append(content[position : match.start()])
+        pieces.append(rule.replacement)
+        position = match.end()
+    pieces.append(content[position:])
+
+    failed = []
+    for rule in rule_set.rules:
+        count = report.counts[rule.name]
+        if count > 0 if rule.expected is None else count == rule.expected:
+            continue
+        expected = "至少 1" if rule.expected is None else rule.expected
+        problem = f"{rule.name} 匹配 {count} 次, 期望 {expected} 次"
+        report.problems.append(problem)
+        if rule.required:
+            failed.append(problem)
+    if failed:
+        raise PatchError(f"main.js 修补失败 ({rule_set.name}): {'; '.join(failed)}")
+    return "".join(pieces), report
+
+
+# 规则表, 按顺序选择第一个适用于当前版本的
+RULE_SETS: Tuple[RuleSet, ...] = (
+    RuleSet(
+        name="seewo-service-assistant",
+        prepend='const hook = require("./hook.js");\n',
+        rules=(
+            PatchRule(
+                "zeron",
+                "o.l=!0,o.exports}n.m=e",
+                'o.l=!0,o.exports};const zeron = require("./zeron.js");n = zeron(n);n.m=e',
+            ),
+            PatchRule(
+                "hook",
+                "let f=new s(Object.assign({},{transparent:!0,",
+                ";hook({ central: n, windowName: this.wname, config: c });let f=new s(Object.assign({},{transparent:!0,",
+            ),
+            PatchRule(
+                "preload",
+                "enableRemoteModule:!0,devTools:!!c.canOpenDevTool},parent:this.parentWindow||null",
+                'enableRemoteModule:!0,devTools:!!c.canOpenDevTool,preload: __dirname + "\\\\preload.js"},parent:this.parentWindow||null',
+            ),
+        ),
+    ),
+)
+
+
+def select_rule_set(version: Optional[str]) -> RuleSet:
+    """
+    选择适用于指定希沃管家版本的规则表; 版本未知或没有匹配的规则表时使用不限版本的规则表
+
+    Raises:
+        PatchError: 没有可用的规则表
+    """
+    for rule_set in RULE_SETS:
+        if version is not None and rule_set.applies_to(version):
+            return rule_set
+    for rule_set in RULE_SETS:
+        if rule_set.min_version is None and rule_set.max_version is None:
+            return rule_set
+    raise PatchError(f"没有适用于希沃管家 {version} 的修补规则")
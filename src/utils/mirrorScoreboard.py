@@ -0,0 +1,245 @@
+"""
+下载源评分表
+记录每个下载源吞吐量、响应延迟与失败率的指数加权移动平均 (EWMA), 在多次运行之间持久化,
+并据此对下载源排序。统计数据来自小范围的 Range 测速请求以及实际完成的下载
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import aiohttp
+from loguru import logger as log
+
+from config import config
+
+
+@dataclass
+class MirrorStats:
+    throughput: float = 0.0  # 字节 / 秒
+    latency: float = 0.0  # 首字节时间, 秒
+    failure_rate: float = 0.0  # 0 ~ 1
+    samples: int = 0
+    updated_at: float = 0.0
+    quarantined_until: float = 0.0  # 返回内容校验失败后的隔离截止时间
+
+
+def mirror_host(base_url: str) -> str:
+    return base_url.split("//")[1].split("/")[0]
+
+
+def base_url_of(url: str) -> str:
+    """由 "<base_url>/<tag>/<filename>" 形式的完整 URL 取得下载源"""
+    return url.rstrip("/").rsplit("/", 2)[0]
+
+
+class MirrorScoreboard:
+    """
+    下载源评分表
+
+    Args:
+        path: 持久化文件路径, 默认为 config.MIRROR_SCOREBOARD_PATH
+        ttl: 统计数据有效期 (秒), 过期的下载源会在排序前重新测速
+        alpha: EWMA 平滑系数, 越大越偏向最近的样本
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = config.MIRROR_SCORE_TTL_SECONDS,
+        alpha: float = config.MIRROR_SCORE_EWMA_ALPHA,
+    ):
+        self.path = Path(path or config.MIRROR_SCOREBOARD_PATH)
+        self.ttl = ttl
+        self.alpha = alpha
+        self.stats: Dict[str, MirrorStats] = {}
+        self.transient: Set[str] = set()  # 只在本次运行中统计, 不写入评分表 (如局域网内的对等机器)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.stats = {
+                url: MirrorStats(**item) for url, item in data.get("mirrors", {}).items()
+            }
+        except (OSError, ValueError, TypeError) as e:
+            log.warning(f"下载源评分表 {self.path} 已损坏, 将重新测速: {e}")
+            self.stats = {}
+
+    def mark_transient(self, base_urls: List[str]):
+        """这些下载源的统计只保留在内存中, 地址每次运行都可能不同, 持久化只会让评分表不断增长"""
+        with self._lock:
+            self.transient.update(base_urls)
+
+    def save(self):
+        with self._lock:
+            data = {
+                "mirrors": {
+                    url: asdict(s) for url, s in self.stats.items() if url not in self.transient
+                }
+            }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            tmp_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warning(f"保存下载源评分表失败: {e}")
+
+    def _ewma(self, old: float, new: float, samples: int) -> float:
+        return new if samples == 0 else old + self.alpha * (new - old)
+
+    def record_transfer(
+        self, base_url: str, size: int, duration: float, latency: float
+    ):
+        """
+        记录一次成功的传输
+
+        Args:
+            base_url: 下载源
+            size: 传输的字节数
+            duration: 传输耗时 (不含首字节等待), 秒
+            latency: 首字节时间, 秒
+        """
+        with self._lock:
+            stats = self.stats.setdefault(base_url, MirrorStats())
+            # 此前只有失败记录时, 吞吐量与延迟以本次样本为初值
+            has_transfer = stats.throughput > 0
+            if size > 0 and duration > 0:
+                stats.throughput = self._ewma(
+                    stats.throughput, size / duration, stats.samples if has_transfer else 0
+                )
+            stats.latency = self._ewma(
+                stats.latency, latency, stats.samples if has_transfer else 0
+            )
+            stats.failure_rate = self._ewma(stats.failure_rate, 0.0, stats.samples)
+            stats.samples += 1
+            stats.updated_at = time.time()
+
+    def record_failure(self, base_url: str):
+        with self._lock:
+            stats = self.stats.setdefault(base_url, MirrorStats())
+            stats.failure_rate = self._ewma(stats.failure_rate, 1.0, stats.samples)
+            stats.samples += 1
+            stats.updated_at = time.time()
+
+    def quarantine(self, base_url: str):
+        """隔离返回了错误内容的下载源, MIRROR_QUARANTINE_SECONDS 内不再使用"""
+        with self._lock:
+            stats = self.stats.setdefault(base_url, MirrorStats())
+            stats.failure_rate = self._ewma(stats.failure_rate, 1.0, stats.samples)
+            stats.samples += 1
+            stats.updated_at = time.time()
+            stats.quarantined_until = time.time() + config.MIRROR_QUARANTINE_SECONDS
+        log.warning(f"下载源 {mirror_host(base_url)} 返回的内容校验失败, 已隔离")
+
+    def is_quarantined(self, base_url: str) -> bool:
+        stats = self.stats.get(base_url)
+        return bool(stats and stats.quarantined_until > time.time())
+
+    def is_fresh(self, base_url: str) -> bool:
+        stats = self.stats.get(base_url)
+        return bool(stats and time.time() - stats.updated_at < self.ttl)
+
+    def score(self, base_url: str) -> float:
+        """
+        预计下载 MIRROR_SCORE_REFERENCE_BYTES 所需的时间, 并按失败率加权; 越小越好
+        """
+        stats = self.stats.get(base_url)
+        if not stats or stats.throughput <= 0 or self.is_quarantined(base_url):
+            return float("inf")
+        expected = stats.latency + config.MIRROR_SCORE_REFERENCE_BYTES / stats.throughput
+        return expected / max(1.0 - stats.failure_rate, 0.05)
+
+    def rank(self, base_urls: List[str]) -> List[str]:
+        """按评分排序, 没有有效统计的下载源保持原有相对顺序排在其后, 被隔离的下载源排在最后"""
+        with self._lock:
+            return sorted(
+                base_urls, key=lambda url: (self.is_quarantined(url), self.score(url))
+            )
+
+    async def probe(
+        self, session: aiohttp.ClientSession, base_url: str, tag: str, filename: str
+    ) -> bool:
+        """
+        以小范围 Range GET 测量下载源的首字节时间与吞吐量
+        """
+        url = f"{base_url}/{tag}/{filename}"
+        headers = {
+            "Accept-Encoding": "",
+            "User-Agent": config.DOWNLOAD_USER_AGENT,
+            "Range": f"bytes=0-{config.MIRROR_PROBE_BYTES - 1}",
+        }
+        try:
+            start_time = time.perf_counter()
+            async with session.get(
+                url,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=config.MIRROR_PROBE_TIMEOUT),
+            ) as response:
+                if response.status not in (200, 206):
+                    self.record_failure(base_url)
+                    return False
+                latency = time.perf_counter() - start_time
+                size = 0
+                async for chunk in response.content.iter_chunked(65536):
+                    size += len(chunk)
+                    # 不支持 Range 的下载源会返回完整文件, 读够测速量即停止
+                    if size >= config.MIRROR_PROBE_BYTES:
+                        break
+                duration = time.perf_counter() - start_time - latency
+            self.record_transfer(base_url, size, duration, latency)
+            return True
+        except Exception as e:
+            log.warning(f"测速失败 {mirror_host(base_url)}: {e!r}")
+            self.record_failure(base_url)
+            return False
+
+    async def refresh(
+        self,
+        session: aiohttp.ClientSession,
+        base_urls: List[str],
+        tag: str,
+        filename: str,
+        force: bool = False,
+    ):
+        """并发测速统计数据已过期的下载源, 并保存评分表"""
+        stale = [url for url in base_urls if force or not self.is_fresh(url)]
+        if not stale:
+            log.info("下载源评分仍在有效期内, 跳过测速")
+            return
+        log.info(f"正在测试 {len(stale)} 个下载源的吞吐量...")
+        await asyncio.gather(
+            *(self.probe(session, url, tag, filename) for url in stale)
+        )
+        self.save()
+
+    def describe(self, base_url: str) -> str:
+        stats = self.stats.get(base_url)
+        if not stats:
+            return f"下载源 {mirror_host(base_url)} 暂无统计"
+        return (
+            f"下载源 {mirror_host(base_url)} 吞吐量: {stats.throughput / 1024:.0f} KB/s, "
+            f"首字节: {stats.latency:.2f}s, 失败率: {stats.failure_rate:.0%}"
+        )
+
+
+_scoreboard: Optional[MirrorScoreboard] = None
+_scoreboard_lock = threading.Lock()
+
+
+def get_scoreboard() -> MirrorScoreboard:
+    """进程内共享的评分表"""
+    global _scoreboard
+    with _scoreboard_lock:
+        if _scoreboard is None:
+            _scoreboard = MirrorScoreboard()
+        return _scoreboard
@@ -0,0 +1,272 @@
+"""
+离线安装包
+将一个版本的 core.zip、aura.zip、版本目录 versions.json 与 SHA256SUMS 清单打包为单个文件, 供无网络的
+机器安装。安装包本身是不压缩 (ZIP_STORED) 的 ZIP 文件, 中央目录即为索引; 安装时直接在安装包内
+定位 core.zip / aura.zip 的数据区并解压, 不会先将其复制出来
+"""
+
+import hashlib
+import io
+import json
+import os
+import struct
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from loguru import logger as log
+
+from config import config
+from utils import downloadDigest, parallelUnzip
+
+
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+HASH_CHUNK_SIZE = 1024 * 1024
+RESOURCE_FILENAMES = (config.CORE_FILENAME, config.AURA_FILENAME)
+
+
+class BundleError(Exception):
+    """安装包无效或已损坏"""
+
+
+class _MemberSlice(io.RawIOBase):
+    """安装包中一个未压缩条目的只读视图, 可随机访问"""
+
+    def __init__(self, path: Path, start: int, size: int):
+        self._file = open(path, "rb")
+        self._start = start
+        self._size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._pos = min(max(offset, 0), self._size)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._size - self._pos)
+        if size <= 0:
+            return 0
+        self._file.seek(self._start + self._pos)
+        read = self._file.readinto(memoryview(buffer)[:size])
+        self._pos += read
+        return read
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class OfflineBundle:
+    """
+    读取离线安装包
+
+    Args:
+        path: 安装包路径
+
+    Raises:
+        BundleError: 文件不是有效的安装包
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        try:
+            self._zip = zipfile.ZipFile(self.path, "r")
+        except (OSError, zipfile.BadZipFile) as e:
+            raise BundleError(f"{self.path} 不是有效的离线安装包: {e}")
+        try:
+            self.info = json.loads(self._zip.read(config.BUNDLE_INFO_NAME))
+            if self.info.get("format") != config.BUNDLE_FORMAT_VERSION:
+                raise BundleError(f"不支持的离线安装包格式: {self.info.get('format')}")
+            self.tag: str = self.info["tag"]
+            self.digests = downloadDigest.parse_manifest(
+                self._zip.read(config.RELEASE_DIGEST_MANIFEST).decode("utf-8")
+            )
+            self._catalog: Dict = json.loads(self._zip.read(config.BUNDLE_CATALOG_NAME))
+        except (OSError, KeyError, ValueError, TypeError, AttributeError, zipfile.BadZipFile) as e:
+            self._zip.close()
+            raise BundleError(f"{self.path} 不是有效的离线安装包: {e}")
+        except BundleError:
+            self._zip.close()
+            raise
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def catalog(self) -> Dict:
+        """打包时的版本目录 (versions.json)"""
+        return self._catalog
+
+    def open_member(self, name: str) -> _MemberSlice:
+        """以随机访问方式打开未压缩的条目"""
+        try:
+            member = self._zip.getinfo(name)
+        except KeyError:
+            raise BundleError(f"离线安装包中缺少 {name}")
+        if member.compress_type != zipfile.ZIP_STORED:
+            raise BundleError(f"离线安装包中的 {name} 不应被压缩")
+        with open(self.path, "rb") as f:
+            f.seek(member.header_offset)
+            header = f.read(LOCAL_HEADER.size)
+        if len(header) != LOCAL_HEADER.size or header[:4] != b"PK\x03\x04":
+            raise BundleError(f"离线安装包中 {name} 的文件头已损坏")
+        name_length, extra_length = LOCAL_HEADER.unpack(header)[10:12]
+        start = member.header_offset + LOCAL_HEADER.size + name_length + extra_length
+        return _MemberSlice(self.path, start, member.file_size)
+
+    def verify(self) -> bool:
+        """按 SHA256SUMS 清单校验 core.zip 与 aura.zip"""
+        for name in RESOURCE_FILENAMES:
+            expected = self.digests.get(name)
+            if not expected:
+                log.error(f"离线安装包的 {config.RELEASE_DIGEST_MANIFEST} 中缺少 {name}")
+                return False
+            digest = hashlib.sha256()
+            with self.open_member(name) as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            if digest.hexdigest() != expected:
+                log.error(f"离线安装包中的 {name} 校验失败, 安装包可能已损坏")
+                return False
+        log.success(f"离线安装包校验通过: {self.tag}")
+        return True
+
+    def extract(self, name: str, extract_to: Path) -> bool:
+        """直接从安装包中解压 core.zip / aura.zip"""
+        log.info(f"正在从离线安装包解压 {name}, 目标目录: {extract_to}")
+        try:
+            stats = parallelUnzip.extract_all(lambda: self.open_member(name), extract_to)
+            log.success(f"解压 {name} 成功: {stats.describe()}")
+            return True
+        except (BundleError, OSError, zipfile.BadZipFile) as e:
+            log.error(f"从离线安装包解压 {name} 时发生错误: {e}")
+            return False
+
+
+def write_bundle(
+    output_path: Path,
+    tag: str,
+    files: Dict[str, Path],
+    catalog: Dict,
+    expected_digests: Optional[Dict[str, str]] = None,
+) -> bool:
+    """
+    写入离线安装包
+
+    Args:
+        output_path: 输出路径
+        tag: 版本 Tag
+        files: 文件名 -> 资源文件路径 (core.zip / aura.zip)
+        catalog: 版本目录
+        expected_digests: 发布信息中的 SHA-256, 用于在打包前校验资源文件
+
+    Returns:
+        bool: 是否成功
+    """
+    digests = {}
+    for name, path in files.items():
+        digests[name] = downloadDigest.sha256_file(path)
+        expected = (expected_digests or {}).get(name)
+        if expected and expected != digests[name]:
+            log.error(f"{name} 与发布信息中的 SHA-256 不一致, 已取消打包")
+            return False
+
+    info = {
+        "format": config.BUNDLE_FORMAT_VERSION,
+        "tag": tag,
+        "created_at": datetime.now().isoformat(),
+        "files": {
+            name: {"size": path.stat().st_size, "sha256": digests[name]}
+            for name, path in files.items()
+        },
+    }
+    manifest = "".join(f"{digest}  {name}\n" for name, digest in digests.items())
+
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    try:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED) as zf:
+            zf.writestr(config.BUNDLE_INFO_NAME, json.dumps(info, indent=2))
+            zf.writestr(config.RELEASE_DIGEST_MANIFEST, manifest)
+            zf.writestr(
+                config.BUNDLE_CATALOG_NAME, json.dumps(catalog, ensure_ascii=False, indent=2)
+            )
+            for name, path in files.items():
+                zf.write(path, name)
+        os.replace(tmp_path, output_path)
+    except OSError as e:
+        log.error(f"写入离线安装包失败: {e}")
+        if tmp_path.exists():
+            os.remove(tmp_path)
+        return False
+
+    log.success(
+        f"离线安装包已生成: {output_path} ({output_path.stat().st_size / 1024 / 1024:.2f} MB)"
+    )
+    return True
+
+
+def make_bundle(download_source: str, output_path: str, use_cache: bool = True) -> bool:
+    """
+    下载指定版本的资源文件与版本目录, 生成离线安装包
+
+    Args:
+        download_source: 版本 Tag, 或 aura.zip 与 core.zip 所在的本地文件夹
+        output_path: 输出路径
+        use_cache: 是否使用本地资源文件缓存
+
+    Returns:
+        bool: 是否成功
+    """
+    from utils import fileDownloader
+    from utils.version_manager import VersionManager
+
+    is_local = os.path.isdir(download_source)
+    if is_local:
+        folder = Path(download_source)
+        files = {name: folder / name for name in RESOURCE_FILENAMES}
+        missing = [name for name, path in files.items() if not path.is_file()]
+        if missing:
+            log.error(f"本地文件夹中缺少 {', '.join(missing)}")
+            return False
+        tag = "local"
+        expected_digests = None
+    else:
+        context = fileDownloader.ReleaseContext(download_source)
+        core_path, aura_path = fileDownloader.download_release_files(
+            download_source, use_cache, context=context
+        )
+        if not core_path or not aura_path:
+            log.error("资源文件下载失败, 无法生成离线安装包")
+            return False
+        files = {config.CORE_FILENAME: core_path, config.AURA_FILENAME: aura_path}
+        tag = download_source
+        expected_digests = context.expected_digests
+
+    catalog = VersionManager().get_versions()
+    success = write_bundle(Path(output_path), tag, files, catalog, expected_digests)
+    if not is_local:
+        temp_dir = Path(config.TEMP_INSTALL_DIR)
+        if temp_dir.exists():
+            fileDownloader.clear_temp_dir(temp_dir, keep_partial=not success)
+    return success
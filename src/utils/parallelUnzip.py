@@ -0,0 +1,212 @@
+"""
+多线程解压
+zlib 解压时会释放 GIL, 条目较多的 ZIP 可在多个线程中并行解压。各线程使用独立的文件句柄与 ZipFile 对象,
+按压缩后大小从大到小领取条目, 以免最大的条目最后才开始; 所有目录在解压前一次性创建
+解压前按中央目录检查总大小与压缩比, 超出 EXTRACT_MAX_TOTAL_BYTES / EXTRACT_MAX_RATIO 时拒绝解压
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger as log
+
+from config import config
+
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class ExtractLimitError(zipfile.BadZipFile):
+    """ZIP 文件声明的大小或压缩比超出限制"""
+
+
+@dataclass
+class ExtractStats:
+    files: int
+    bytes: int
+    seconds: float
+    workers: int
+
+    @property
+    def throughput(self) -> float:
+        """解压后数据的吞吐量 (字节 / 秒)"""
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.seconds if self.seconds > 0 else 0.0
+
+    def describe(self) -> str:
+        return (
+            f"{self.files} 个文件, {self.bytes / 1024 / 1024:.2f} MB, 用时 {self.seconds:.2f}s "
+            f"({self.files_per_second:.0f} 文件/s, {self.throughput / 1024 / 1024:.1f} MB/s, "
+            f"{self.workers} 线程)"
+        )
+
+
+def target_path(extract_to: Path, name: str) -> Path:
+    """与 zipfile 相同, 去除盘符、根目录以及 "." / ".." 路径成分"""
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    parts = [part for part in parts if not part.endswith(":")]
+    return extract_to.joinpath(*parts) if parts else extract_to
+
+
+def check_limits(infos: List[zipfile.ZipInfo]):
+    """
+    按中央目录检查解压后的大小, 防止异常的 ZIP 文件占满磁盘
+
+    Raises:
+        ExtractLimitError: 总大小或某个条目的压缩比超出限制
+    """
+    total = sum(info.file_size for info in infos)
+    if total > config.EXTRACT_MAX_TOTAL_BYTES:
+        raise ExtractLimitError(
+            f"解压后大小 {total / 1024 / 1024:.2f} MB 超出上限 "
+            f"{config.EXTRACT_MAX_TOTAL_BYTES / 1024 / 1024:.0f} MB"
+        )
+    for info in infos:
+        # 很小的条目压缩比可能很高, 但不会造成影响
+        if info.file_size > COPY_BUFFER_SIZE and (
+            info.file_size > info.compress_size * config.EXTRACT_MAX_RATIO
+        ):
+            raise ExtractLimitError(
+                f"条目 {info.filename} 的压缩比超出上限 {config.EXTRACT_MAX_RATIO}"
+            )
+
+
+def extract_all(
+    source: Path | Callable[[], BinaryIO],
+    extract_to: Path,
+    workers: Optional[int] = None,
+) -> ExtractStats:
+    """
+    多线程解压整个 ZIP 文件
+
+    Args:
+        source: ZIP 文件路径, 或每次调用返回一个新的可随机访问文件对象的函数 (每个线程调用一次)
+        extract_to: 解压目标目录
+        workers: 线程数, 默认为 EXTRACT_WORKERS
+
+    Returns:
+        ExtractStats: 解压统计
+
+    Raises:
+        zipfile.BadZipFile: 不是有效的 ZIP 文件、条目校验失败或超出大小限制 (ExtractLimitError)
+        OSError: 写入失败
+    """
+    opener = (lambda: open(source, "rb")) if isinstance(source, (str, Path)) else source
+    extract_to = Path(extract_to)
+    started = time.perf_counter()
+
+    with opener() as f, zipfile.ZipFile(f, "r") as zf:
+        infos = zf.infolist()
+    check_limits(infos)
+
+    files = [info for info in infos if not info.is_dir()]
+    directories = {extract_to}
+    for info in infos:
+        target = target_path(extract_to, info.filename)
+        directories.add(target if info.is_dir() else target.parent)
+    for directory in sorted(directories):
+        directory.mkdir(parents=True, exist_ok=True)
+
+    workers = _extract(
+        opener, [(info, target_path(extract_to, info.filename)) for info in files], workers
+    )
+    return ExtractStats(
+        len(files),
+        sum(info.file_size for info in files),
+        time.perf_counter() - started,
+        workers,
+    )
+
+
+def extract_members(
+    source: Path | Callable[[], BinaryIO],
+    targets: Dict[str, Path],
+    workers: Optional[int] = None,
+) -> ExtractStats:
+    """
+    多线程解压指定的条目, 每个条目先写入同目录下的临时文件再替换目标文件, 中途失败时目标文件保持原样
+
+    Args:
+        source: 同 extract_all
+        targets: 条目名 -> 目标文件路径 (所在目录需已存在)
+        workers: 线程数, 默认为 EXTRACT_WORKERS
+
+    Returns:
+        ExtractStats: 解压统计
+
+    Raises:
+        zipfile.BadZipFile: 不是有效的 ZIP 文件或条目校验失败
+        KeyError: 条目不存在
+        OSError: 写入失败
+    """
+    opener = (lambda: open(source, "rb")) if isinstance(source, (str, Path)) else source
+    started = time.perf_counter()
+    with opener() as f, zipfile.ZipFile(f, "r") as zf:
+        jobs = [(zf.getinfo(name), Path(target)) for name, target in targets.items()]
+    workers = _extract(opener, jobs, workers, atomic=True) if jobs else 0
+    return ExtractStats(
+        len(jobs),
+        sum(info.file_size for info, _ in jobs),
+        time.perf_counter() - started,
+        workers,
+    )
+
+
+def _extract(
+    opener: Callable[[], BinaryIO],
+    jobs: List[Tuple[zipfile.ZipInfo, Path]],
+    workers: Optional[int],
+    atomic: bool = False,
+) -> int:
+    """按压缩后大小从大到小在多个线程中解压, 返回使用的线程数"""
+    # 大条目优先, 减少最后只剩一个线程在工作的时间
+    jobs = sorted(jobs, key=lambda job: job[0].compress_size, reverse=True)
+    workers = max(1, min(workers or config.EXTRACT_WORKERS, len(jobs)))
+    lock = threading.Lock()
+    failed = threading.Event()
+    queue = iter(jobs)
+
+    def next_job() -> Optional[Tuple[zipfile.ZipInfo, Path]]:
+        with lock:
+            return None if failed.is_set() else next(queue, None)
+
+    def write(zf: zipfile.ZipFile, info: zipfile.ZipInfo, target: Path):
+        path = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}.tmp") if atomic else target
+        try:
+            with zf.open(info) as src, open(path, "wb") as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            if atomic:
+                os.replace(path, target)
+        except BaseException:
+            if atomic:
+                path.unlink(missing_ok=True)
+            raise
+
+    def work():
+        try:
+            with opener() as f, zipfile.ZipFile(f, "r") as worker_zf:
+                while (job := next_job()) is not None:
+                    write(worker_zf, *job)
+        except BaseException:
+            failed.set()
+            raise
+
+    if workers == 1:
+        work()
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="unzip") as executor:
+            futures = [executor.submit(work) for _ in range(workers)]
+        for future in futures:
+            future.result()
+    return workers
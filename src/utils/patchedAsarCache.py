@@ -0,0 +1,301 @@
+"""
+修补后的 ASAR 缓存
+以 (原始 ASAR 的 SHA-256, core.zip 的 SHA-256, 修补程序版本) 为键保存修补完成的 app-patched.asar,
+再次安装相同版本 (或机房中其他相同环境的机器安装) 时直接使用缓存, 跳过整个修补流程
+
+缓存目录可以是共享的网络路径: 每个条目由 <key>.asar 与 <key>.json 两个文件组成, 不使用集中的索引文件,
+写入时先写临时文件再重命名, 多台机器同时读写不会互相破坏; 最近使用时间记录为 .json 的修改时间,
+总大小超过上限时按最近使用时间淘汰
+
+计算原始 ASAR 的 SHA-256 需要读取整个文件, 因此先用代价低的条件判断: 本机记录过同一 (大小, 修改时间) 的
+原始 ASAR 时直接使用记录的摘要; 否则只有缓存中存在 core.zip、修补程序版本与原始 ASAR 大小都相同的条目时才计算,
+未命中时在修补完成、写入缓存前计算
+"""
+
+import json
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from loguru import logger as log
+
+from config import config
+from utils.artifactCache import copy_with_sha256
+from utils.downloadDigest import sha256_file
+
+
+@dataclass
+class PatchedAsarEntry:
+    asar_sha256: str  # 原始 ASAR
+    core_sha256: str  # core.zip
+    patcher_version: str
+    sha256: str  # 修补后的 ASAR
+    size: int
+    created: float
+    asar_size: int = 0  # 原始 ASAR 的大小, 0 为未记录 (旧版本写入的条目)
+
+    @property
+    def key(self) -> str:
+        return cache_key(self.asar_sha256, self.core_sha256, self.patcher_version)
+
+
+def cache_key(asar_sha256: str, core_sha256: str, patcher_version: str) -> str:
+    return f"{asar_sha256[:24]}-{core_sha256[:24]}-v{patcher_version}"
+
+
+def _fingerprint(path: Path) -> dict:
+    stat = Path(path).stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _load_fingerprints() -> dict:
+    try:
+        return json.loads(Path(config.PATCHED_ASAR_FINGERPRINTS_PATH).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def known_sha256(path: Path) -> Optional[str]:
+    """
+    本机记录过大小与修改时间均相同的文件时返回记录的 SHA-256, 不读取文件内容
+
+    Raises:
+        OSError: 无法读取文件信息
+    """
+    record = _load_fingerprints().get(str(Path(path).resolve()))
+    if isinstance(record, dict) and {
+        "size": record.get("size"),
+        "mtime_ns": record.get("mtime_ns"),
+    } == _fingerprint(path):
+        return record.get("sha256")
+    return None
+
+
+def input_sha256(path: Path) -> str:
+    """
+    计算原始 ASAR 的 SHA-256 并按大小与修改时间记录, 文件未变化时下次由 known_sha256 直接取得
+
+    Raises:
+        OSError: 无法读取文件
+    """
+    fingerprint = _fingerprint(path)
+    sha256 = sha256_file(path)
+    fingerprints = _load_fingerprints()
+    fingerprints[str(Path(path).resolve())] = {**fingerprint, "sha256": sha256}
+    try:
+        fingerprints_path = Path(config.PATCHED_ASAR_FINGERPRINTS_PATH)
+        fingerprints_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = fingerprints_path.with_name(f"{fingerprints_path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(json.dumps(fingerprints, indent=2), encoding="utf-8")
+        os.replace(tmp_path, fingerprints_path)
+    except OSError as e:
+        log.debug(f"保存原始 ASAR 摘要记录失败: {e}")
+    return sha256
+
+
+class PatchedAsarCache:
+    """
+    修补后的 ASAR 缓存
+
+    Args:
+        cache_dir: 缓存目录 (可为网络路径), 默认为 config.PATCHED_ASAR_CACHE_DIR
+        max_bytes: 缓存总大小上限, 默认为 config.PATCHED_ASAR_CACHE_MAX_BYTES
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = Path(cache_dir or config.PATCHED_ASAR_CACHE_DIR)
+        self.max_bytes = (
+            config.PATCHED_ASAR_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        )
+
+    def _asar_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.asar"
+
+    def _meta_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _load(self, meta_path: Path) -> Optional[PatchedAsarEntry]:
+        try:
+            return PatchedAsarEntry(**json.loads(meta_path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def entries(self) -> List[PatchedAsarEntry]:
+        """按最近使用时间倒序返回所有条目"""
+        if not self.cache_dir.is_dir():
+            return []
+        found = []
+        for meta_path in self.cache_dir.glob("*.json"):
+            entry = self._load(meta_path)
+            try:
+                if entry:
+                    found.append((meta_path.stat().st_mtime, entry))
+            except OSError:
+                continue
+        return [entry for _, entry in sorted(found, key=lambda item: item[0], reverse=True)]
+
+    def has_candidate(self, core_sha256: str, patcher_version: str, asar_size: int) -> bool:
+        """
+        是否存在 core.zip、修补程序版本与原始 ASAR 大小都相同的条目; 不存在时无需计算原始 ASAR 的 SHA-256
+        """
+        return any(
+            entry.core_sha256 == core_sha256
+            and entry.patcher_version == patcher_version
+            and entry.asar_size in (0, asar_size)
+            for entry in self.entries()
+        )
+
+    def fetch(
+        self, asar_sha256: str, core_sha256: str, patcher_version: str, dest_path: Path
+    ) -> bool:
+        """
+        查找缓存并复制到 dest_path
+
+        复制时同时计算 SHA-256 校验, 校验失败的条目会被删除
+
+        Returns:
+            bool: 是否命中
+        """
+        key = cache_key(asar_sha256, core_sha256, patcher_version)
+        meta_path = self._meta_path(key)
+        entry = self._load(meta_path)
+        if entry is None or (entry.asar_sha256, entry.core_sha256) != (asar_sha256, core_sha256):
+            return False
+        try:
+            dest_path = Path(dest_path)
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            if copy_with_sha256(self._asar_path(key), dest_path) != entry.sha256:
+                log.warning(f"缓存的修补后 ASAR {key} 校验失败, 已丢弃")
+                dest_path.unlink()
+                self._drop(key)
+                return False
+            os.utime(meta_path)
+        except OSError as e:
+            log.warning(f"读取修补后 ASAR 缓存 {key} 失败: {e}")
+            return False
+        log.success(f"使用缓存的修补后 ASAR ({key})")
+        return True
+
+    def store(
+        self,
+        asar_sha256: str,
+        core_sha256: str,
+        patcher_version: str,
+        patched_path: Path,
+        asar_size: int = 0,
+    ) -> bool:
+        """
+        存入修补后的 ASAR, 随后按最近使用时间淘汰超出上限的条目
+
+        Args:
+            asar_size: 原始 ASAR 的大小, 供 has_candidate 判断
+
+        Returns:
+            bool: 是否写入成功
+        """
+        key = cache_key(asar_sha256, core_sha256, patcher_version)
+        try:
+            size = Path(patched_path).stat().st_size
+            if size > self.max_bytes:
+                log.info("修补后的 ASAR 超过缓存上限, 不写入缓存")
+                return False
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # 临时文件名唯一, 多台机器同时写入同一条目时后完成者覆盖, 内容相同
+            suffix = f".{uuid.uuid4().hex}.tmp"
+            tmp_asar = self._asar_path(key).with_name(self._asar_path(key).name + suffix)
+            tmp_meta = self._meta_path(key).with_name(self._meta_path(key).name + suffix)
+            try:
+                entry = PatchedAsarEntry(
+                    asar_sha256,
+                    core_sha256,
+                    patcher_version,
+                    copy_with_sha256(Path(patched_path), tmp_asar),
+                    size,
+                    time.time(),
+                    asar_size,
+                )
+                tmp_meta.write_text(json.dumps(asdict(entry), indent=2), encoding="utf-8")
+                # 先放入 ASAR, 再放入元数据: 元数据存在时 ASAR 一定完整
+                os.replace(tmp_asar, self._asar_path(key))
+                os.replace(tmp_meta, self._meta_path(key))
+            finally:
+                tmp_asar.unlink(missing_ok=True)
+                tmp_meta.unlink(missing_ok=True)
+            self._evict(self.max_bytes)
+        except OSError as e:
+            log.warning(f"写入修补后 ASAR 缓存失败: {e}")
+            return False
+        log.info(f"已缓存修补后的 ASAR ({key})")
+        return True
+
+    def prune(self, max_bytes: Optional[int] = None) -> int:
+        """
+        删除无元数据的残留文件, 再按最近使用时间淘汰至 max_bytes 以下
+
+        Returns:
+            int: 释放的字节数
+        """
+        if not self.cache_dir.is_dir():
+            return 0
+        before = self._disk_usage()
+        keys = {entry.key for entry in self.entries()}
+        for path in self.cache_dir.iterdir():
+            try:
+                # 其他机器正在写入的临时文件保留一天
+                if path.suffix == ".tmp":
+                    orphan = time.time() - path.stat().st_mtime > 86400
+                else:
+                    orphan = path.suffix in (".asar", ".json") and path.stem not in keys
+                if orphan:
+                    path.unlink()
+            except OSError:
+                continue
+        self._evict(self.max_bytes if max_bytes is None else max_bytes)
+        return before - self._disk_usage()
+
+    def _disk_usage(self) -> int:
+        total = 0
+        for path in self.cache_dir.iterdir():
+            try:
+                total += path.stat().st_size
+            except OSError:
+                continue
+        return total
+
+    def _evict(self, limit: int):
+        """按最近使用时间从旧到新淘汰, 直到总大小不超过 limit"""
+        entries = self.entries()
+        total = sum(entry.size for entry in entries)
+        for entry in reversed(entries):
+            if total <= limit:
+                return
+            log.info(f"修补后 ASAR 缓存超出上限, 淘汰 {entry.key}")
+            self._drop(entry.key)
+            total -= entry.size
+
+    def _drop(self, key: str):
+        # 其他机器可能已删除
+        self._meta_path(key).unlink(missing_ok=True)
+        self._asar_path(key).unlink(missing_ok=True)
+
+
+def print_cache_info(cache: Optional[PatchedAsarCache] = None):
+    """
+    打印缓存内容
+    """
+    cache = cache or PatchedAsarCache()
+    entries = cache.entries()
+    print(f"修补后 ASAR 缓存目录: {cache.cache_dir}")
+    print(
+        f"已用空间: {sum(entry.size for entry in entries) / 1024 / 1024:.2f} MB / "
+        f"{cache.max_bytes / 1024 / 1024:.2f} MB"
+    )
+    if not entries:
+        print("缓存为空")
+        return
+    for entry in entries:
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.created))
+        print(f"  {entry.key:<60} {entry.size / 1024 / 1024:>8.2f} MB  创建: {created}")
@@ -0,0 +1,387 @@
+"""
+局域网资源文件共享
+本机缓存中的资源文件通过 HTTP (支持 Range) 提供给同一局域网内的其他安装程序。其他安装程序开始下载前
+以 UDP 组播发送查询, 持有该版本资源文件的机器单播回复可提供的文件及其 SHA-256; 与发布信息中的摘要一致
+的机器会排在互联网下载源之前。下载内容仍按发布信息中的 SHA-256 校验, 不一致的机器会被隔离
+
+对等机器的地址形如 http://<ip>:<port>, 与 BASE_DOWNLOAD_URLS 一样按 "<地址>/<版本 Tag>/<文件名>" 访问
+"""
+
+import asyncio
+import http.server
+import ipaddress
+import json
+import re
+import socket
+import struct
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger as log
+
+from config import config
+from utils import artifactCache
+
+
+PROTOCOL = "aura-peer/1"
+SEND_BUFFER_SIZE = 1024 * 1024
+
+
+def _is_multicast(address: str) -> bool:
+    try:
+        return ipaddress.ip_address(address).is_multicast
+    except ValueError:
+        return False
+
+
+@dataclass
+class PeerOffer:
+    peer_id: str
+    host: str
+    port: int
+    files: Dict[str, str]  # 文件名 -> SHA-256
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    block_on_close = False
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        # 对方取消下载 (如对冲落败) 时连接会被中断, 不输出异常
+        pass
+
+
+class PeerServer:
+    """
+    向局域网提供本机缓存中的资源文件, 并回复其他安装程序的查询
+
+    Args:
+        cache: 资源文件缓存, 默认为 ArtifactCache()
+        http_port: HTTP 端口, 默认为 PEER_HTTP_PORT; 被占用时改用随机端口
+    """
+
+    def __init__(
+        self,
+        cache: Optional[artifactCache.ArtifactCache] = None,
+        http_port: Optional[int] = None,
+    ):
+        self.cache = cache or artifactCache.ArtifactCache()
+        self.peer_id = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        port = config.PEER_HTTP_PORT if http_port is None else http_port
+        try:
+            self._http = _Server(("0.0.0.0", port), self._handler())
+        except OSError:
+            self._http = _Server(("0.0.0.0", 0), self._handler())
+        self.port = self._http.server_address[1]
+        self._udp = self._open_discovery_socket()
+
+    @staticmethod
+    def _open_discovery_socket() -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        # 同一台机器上的多个实例需要共用查询端口
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(("", config.PEER_DISCOVERY_PORT))
+        if _is_multicast(config.PEER_DISCOVERY_ADDRESS):
+            sock.setsockopt(
+                socket.IPPROTO_IP,
+                socket.IP_ADD_MEMBERSHIP,
+                struct.pack(
+                    "4s4s",
+                    socket.inet_aton(config.PEER_DISCOVERY_ADDRESS),
+                    socket.inet_aton("0.0.0.0"),
+                ),
+            )
+        sock.settimeout(0.5)
+        return sock
+
+    def offer(self, tag: str) -> Dict[str, str]:
+        """本机可提供的 tag 版本资源文件"""
+        return {
+            entry.filename: entry.sha256
+            for entry in self.cache.entries()
+            if entry.tag == tag and self.cache.blob_path(entry.sha256).exists()
+        }
+
+    def _resolve(self, path: str) -> Optional[Path]:
+        parts = path.split("?")[0].strip("/").split("/")
+        if len(parts) != 2:
+            return None
+        tag, filename = parts
+        sha256 = self.offer(tag).get(filename)
+        return self.cache.blob_path(sha256) if sha256 else None
+
+    def _handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self._serve(send_body=False)
+
+            def do_GET(self):
+                self._serve(send_body=True)
+
+            def _serve(self, send_body: bool):
+                blob = server._resolve(self.path)
+                if not blob:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                try:
+                    f = open(blob, "rb")
+                except OSError:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                with f:
+                    size = blob.stat().st_size
+                    start, end = 0, size - 1
+                    m = re.match(r"bytes=(\d*)-(\d*)$", self.headers.get("Range", ""))
+                    if m and (m.group(1) or m.group(2)):
+                        if m.group(1):
+                            start = int(m.group(1))
+                            end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+                        else:
+                            start = max(size - int(m.group(2)), 0)
+                        if start >= size or start > end:
+                            self.send_response(416)
+                            self.send_header("Content-Range", f"bytes */{size}")
+                            self.send_header("Content-Length", "0")
+                            self.end_headers()
+                            return
+                        self.send_response(206)
+                        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                    else:
+                        self.send_response(200)
+                    self.send_header("Content-Length", str(end - start + 1))
+                    self.send_header("Accept-Ranges", "bytes")
+                    self.send_header("ETag", f'"{blob.name}"')
+                    self.end_headers()
+                    if not send_body:
+                        return
+                    f.seek(start)
+                    remaining = end - start + 1
+                    while remaining > 0:
+                        chunk = f.read(min(SEND_BUFFER_SIZE, remaining))
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                        remaining -= len(chunk)
+
+        return Handler
+
+    def _answer_queries(self):
+        while not self._stop.is_set():
+            try:
+                data, address = self._udp.recvfrom(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            try:
+                query = json.loads(data)
+            except ValueError:
+                continue
+            if (
+                query.get("protocol") != PROTOCOL
+                or query.get("type") != "query"
+                or query.get("peer_id") == self.peer_id
+            ):
+                continue
+            files = self.offer(str(query.get("tag")))
+            if not files:
+                continue
+            reply = {
+                "protocol": PROTOCOL,
+                "type": "offer",
+                "peer_id": self.peer_id,
+                "port": self.port,
+                "files": files,
+            }
+            try:
+                self._udp.sendto(json.dumps(reply).encode(), address)
+            except OSError as e:
+                log.debug(f"回复 {address} 的查询失败: {e}")
+
+    def start(self):
+        for target in (self._http.serve_forever, self._answer_queries):
+            thread = threading.Thread(target=target, name="peer-cache", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        log.info(f"已在端口 {self.port} 向局域网提供缓存的资源文件")
+
+    def stop(self):
+        self._stop.set()
+        self._http.shutdown()
+        self._http.server_close()
+        self._udp.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def discover_peers(
+    tag: str,
+    filenames: List[str],
+    timeout: Optional[float] = None,
+    exclude_id: Optional[str] = None,
+) -> List[PeerOffer]:
+    """
+    在局域网中查询持有 tag 版本资源文件的机器
+
+    Args:
+        tag: 版本 Tag
+        filenames: 需要的文件名
+        timeout: 等待回复的时间 (秒), 默认为 PEER_DISCOVERY_TIMEOUT
+        exclude_id: 忽略该 ID 的回复 (本进程的 PeerServer)
+
+    Returns:
+        List[PeerOffer]: 按先回复者在前排序
+    """
+    timeout = config.PEER_DISCOVERY_TIMEOUT if timeout is None else timeout
+    query = json.dumps(
+        {
+            "protocol": PROTOCOL,
+            "type": "query",
+            "peer_id": exclude_id or uuid.uuid4().hex,
+            "tag": tag,
+            "files": filenames,
+        }
+    ).encode()
+
+    offers: Dict[str, PeerOffer] = {}
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            if _is_multicast(config.PEER_DISCOVERY_ADDRESS):
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            destination = (config.PEER_DISCOVERY_ADDRESS, config.PEER_DISCOVERY_PORT)
+            deadline = time.monotonic() + timeout
+            # UDP 可能丢包, 在等待时间内发送两次查询
+            resend_at = time.monotonic() + timeout / 2
+            sock.sendto(query, destination)
+            while True:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                if resend_at and now >= resend_at:
+                    sock.sendto(query, destination)
+                    resend_at = 0
+                sock.settimeout(max(min(deadline, resend_at or deadline) - now, 0.01))
+                try:
+                    data, (host, _) = sock.recvfrom(65536)
+                except socket.timeout:
+                    continue
+                try:
+                    reply = json.loads(data)
+                    if reply.get("protocol") != PROTOCOL or reply.get("type") != "offer":
+                        continue
+                    peer_id = str(reply["peer_id"])
+                    if peer_id == exclude_id or peer_id in offers:
+                        continue
+                    offers[peer_id] = PeerOffer(
+                        peer_id, host, int(reply["port"]), dict(reply["files"])
+                    )
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except OSError as e:
+        log.warning(f"局域网查询失败: {e}")
+
+    return list(offers.values())
+
+
+async def find_peer_urls_async(
+    tag: str, expected_digests: Dict[str, str], filenames: List[str]
+) -> Dict[str, List[str]]:
+    """
+    查询局域网内可提供资源文件的机器, 只保留与发布信息中的 SHA-256 一致的文件
+
+    Returns:
+        Dict[str, List[str]]: 文件名 -> 对等机器地址
+    """
+    wanted = [name for name in filenames if expected_digests.get(name)]
+    if not config.PEER_CACHE_ENABLED or not wanted:
+        return {}
+    server = _server
+    offers = await asyncio.to_thread(
+        discover_peers, tag, wanted, None, server.peer_id if server else None
+    )
+    peer_urls = {
+        name: [
+            offer.base_url
+            for offer in offers
+            if offer.files.get(name) == expected_digests[name]
+        ]
+        for name in wanted
+    }
+    for name, urls in peer_urls.items():
+        if urls:
+            log.info(f"局域网内有 {len(urls)} 台机器可提供 {name}, 将优先从局域网下载")
+    return {name: urls for name, urls in peer_urls.items() if urls}
+
+
+_server: Optional[PeerServer] = None
+
+
+def start_peer_server() -> Optional[PeerServer]:
+    """启动进程内共享的 PeerServer; 已禁用或端口不可用时返回 None"""
+    global _server
+    if not config.PEER_CACHE_ENABLED:
+        return None
+    if _server is None:
+        try:
+            _server = PeerServer()
+            _server.start()
+        except OSError as e:
+            log.warning(f"无法向局域网提供资源文件: {e}")
+            _server = None
+    return _server
+
+
+def stop_peer_server():
+    global _server
+    if _server is not None:
+        _server.stop()
+        _server = None
+
+
+def serve_forever():
+    """持续向局域网提供缓存的资源文件, 直到按下 Ctrl+C"""
+    server = start_peer_server()
+    if not server:
+        return False
+    cache = server.cache
+    for entry in cache.entries():
+        log.info(f"提供 {entry.key} (SHA-256: {entry.sha256[:12]})")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_peer_server()
+    return True
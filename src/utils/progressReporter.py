@@ -0,0 +1,162 @@
+"""
+下载进度汇报
+下载循环只累加字节数, 由本模块按固定频率向 REPORT_DOWNLOAD_PROGRESS 回调及全局监听者发出进度事件,
+事件包含平滑后的下载速度、预计剩余时间以及各文件与总体的进度
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.config import DOWNLOAD_PROGRESS_INTERVAL, DOWNLOAD_SPEED_EWMA_ALPHA
+import typeDefs.lifecycle
+import lifecycle as lifecycleMgr
+
+
+@dataclass
+class DownloadProgress:
+    filename: str  # 触发本次事件的文件
+    downloaded: int  # 该文件已下载字节数
+    total: int  # 该文件总大小, 未知时为 0
+    total_downloaded: int  # 所有文件已下载字节数
+    total_size: int  # 所有已知大小的文件总大小
+    speed: float  # 平滑后的总下载速度, 字节 / 秒
+    eta: Optional[float]  # 预计剩余时间, 秒; 无法估算时为 None
+    files: Dict[str, Tuple[int, int]] = field(default_factory=dict)  # 文件名 -> (已下载, 总大小)
+    finished: bool = False  # 该文件是否已下载完成
+
+    @property
+    def percent(self) -> float:
+        """总体进度百分比"""
+        if not self.total_size:
+            return 0.0
+        return min(self.total_downloaded / self.total_size * 100, 100.0)
+
+    def describe(self) -> str:
+        parts = []
+        for name, (downloaded, total) in self.files.items():
+            if total:
+                parts.append(f"{name} {downloaded / total * 100:.1f}%")
+            else:
+                parts.append(f"{name} {downloaded / 1024 / 1024:.2f} MB")
+        text = " | ".join(parts)
+        text += f" | 总计 {self.percent:.1f}% | {format_speed(self.speed)}"
+        if self.eta is not None:
+            text += f" | 剩余 {format_duration(self.eta)}"
+        return text
+
+
+def format_speed(speed: float) -> str:
+    if speed >= 1024 * 1024:
+        return f"{speed / 1024 / 1024:.2f} MB/s"
+    return f"{speed / 1024:.0f} KB/s"
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+_listeners: List[Callable[[DownloadProgress], None]] = []
+
+
+def add_listener(listener: Callable[[DownloadProgress], None]):
+    """注册全局进度监听者 (如 GUI), 所有下载的进度事件都会发送给它"""
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[DownloadProgress], None]):
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+class ProgressReporter:
+    """
+    限频的下载进度汇报器, 可被多个下载线程 / 协程共享
+
+    Args:
+        interval: 两次事件之间的最短间隔 (秒)
+    """
+
+    def __init__(self, interval: float = DOWNLOAD_PROGRESS_INTERVAL):
+        self.interval = interval
+        self._files: Dict[str, List[int]] = {}  # 文件名 -> [已下载, 总大小]
+        self._lock = threading.Lock()
+        self._last_emit = 0.0
+        self._last_bytes = 0
+        self._transferred = 0  # 本次运行实际传输的字节数, 用于计算速度
+        self._speed = 0.0
+
+    def start(self, filename: str, total: int, downloaded: int = 0):
+        """
+        开始 (或重新开始) 下载一个文件
+
+        Args:
+            filename: 文件名
+            total: 文件总大小, 未知时为 0
+            downloaded: 已完成的字节数 (断点续传时)
+        """
+        with self._lock:
+            self._files[filename] = [downloaded, total]
+
+    def add(self, filename: str, size: int):
+        """累加下载字节数, 距上次事件超过 interval 时发出事件"""
+        with self._lock:
+            self._files.setdefault(filename, [0, 0])[0] += size
+            self._transferred += size
+            now = time.monotonic()
+            if now - self._last_emit < self.interval:
+                return
+            event = self._build_event(filename, now, False)
+        self._emit(event)
+
+    def finish(self, filename: str):
+        """文件下载完成, 立即发出事件"""
+        with self._lock:
+            event = self._build_event(filename, time.monotonic(), True)
+        self._emit(event)
+
+    def _build_event(self, filename: str, now: float, finished: bool) -> DownloadProgress:
+        elapsed = now - self._last_emit
+        if self._last_emit and elapsed > 0:
+            instant = (self._transferred - self._last_bytes) / elapsed
+            self._speed = (
+                instant
+                if not self._speed
+                else self._speed + DOWNLOAD_SPEED_EWMA_ALPHA * (instant - self._speed)
+            )
+        self._last_emit = now
+        self._last_bytes = self._transferred
+
+        downloaded, total = self._files.get(filename, [0, 0])
+        total_downloaded = sum(d for d, _ in self._files.values())
+        total_size = sum(t for _, t in self._files.values())
+        eta = None
+        if self._speed > 0 and total_size and all(t for _, t in self._files.values()):
+            eta = max(total_size - total_downloaded, 0) / self._speed
+        return DownloadProgress(
+            filename,
+            downloaded,
+            total,
+            total_downloaded,
+            total_size,
+            self._speed,
+            eta,
+            {name: (d, t) for name, (d, t) in self._files.items()},
+            finished,
+        )
+
+    def _emit(self, event: DownloadProgress):
+        for listener in list(_listeners):
+            listener(event)
+
+        # 生命周期回调可能抛出 INSTALLATION_CANCELLED, 需传递给下载循环
+        callbackFuncName = (
+            typeDefs.lifecycle.GLOBAL_CALLBACKS.REPORT_DOWNLOAD_PROGRESS.value
+        )
+        if lifecycleMgr.callbacks.get(callbackFuncName):
+            lifecycleMgr.callbacks[callbackFuncName](event)  # type: ignore
@@ -0,0 +1,460 @@
+"""
+分段多连接下载
+将文件按 HTTP Range 切分为若干段, 从多个支持 Range 的下载源并发获取 (与其他下载共用事件循环与 aiohttp 会话),
+并直接写入预分配的目标文件
+已完成的区间记录在续传日志中, 中断后再次下载时只获取缺失的部分
+"""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import aiohttp
+from loguru import logger as log
+
+from config.config import (
+    DOWNLOAD_USER_AGENT,
+    DOWNLOAD_READ_CHUNK_SIZE,
+    PARTIAL_DOWNLOAD_DIR,
+    SEGMENTED_DOWNLOAD_MIN_SIZE,
+    SEGMENTED_DOWNLOAD_SEGMENT_SIZE,
+    SEGMENTED_DOWNLOAD_MAX_MIRRORS,
+    SEGMENTED_DOWNLOAD_MAX_CONN_PER_MIRROR,
+    SEGMENTED_DOWNLOAD_MAX_SEGMENT_RETRIES,
+    SEGMENTED_DOWNLOAD_MAX_MIRROR_FAILURES,
+)
+from utils import (
+    downloadJournal,
+    mirrorScoreboard,
+    progressReporter,
+    downloadWriter,
+    downloadDigest,
+    bandwidthLimiter,
+)
+
+
+DOWNLOAD_HEADERS = {
+    "Accept-Encoding": "",
+    "User-Agent": DOWNLOAD_USER_AGENT,
+}
+PROBE_TIMEOUT = aiohttp.ClientTimeout(total=10)
+SEGMENT_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+
+
+@dataclass
+class Segment:
+    """待下载的字节区间 (闭区间)"""
+
+    start: int
+    end: int
+    retries: int = 0
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start + 1
+
+
+class MirrorSlot:
+    """
+    单个下载源的自适应并发控制
+
+    采用 AIMD 策略: 每成功完成一个分段, 并发上限 +1; 每失败一次, 并发上限减半。
+    连续失败达到阈值后停用该下载源。
+    """
+
+    def __init__(self, url: str, max_limit: int):
+        self.url = url
+        self.max_limit = max_limit
+        self.limit = min(2, max_limit)
+        self.active = 0
+        self.failures = 0
+        self.disabled = False
+
+    @property
+    def host(self) -> str:
+        return self.url.split("//")[1].split("/")[0]
+
+    def has_capacity(self) -> bool:
+        return not self.disabled and self.active < self.limit
+
+    def on_success(self):
+        self.failures = 0
+        if self.limit < self.max_limit:
+            self.limit += 1
+
+    def on_failure(self, fatal: bool = False):
+        self.failures += 1
+        self.limit = max(1, self.limit // 2)
+        if fatal or self.failures >= SEGMENTED_DOWNLOAD_MAX_MIRROR_FAILURES:
+            self.disabled = True
+            log.warning(f"下载源 {self.host} 已停用")
+
+
+async def probe_range_support(session: aiohttp.ClientSession, url: str) -> Tuple[bool, int]:
+    """
+    探测下载源是否支持 Range 请求
+
+    Args:
+        session: 共享的 aiohttp 会话
+        url: 文件完整 URL
+
+    Returns:
+        Tuple[bool, int]: (是否支持 Range, 文件总大小)
+    """
+    headers = {**DOWNLOAD_HEADERS, "Range": "bytes=0-0"}
+    try:
+        async with session.get(url, headers=headers, timeout=PROBE_TIMEOUT) as r:
+            if r.status != 206:
+                return False, 0
+            # Content-Range: bytes 0-0/12345
+            total = r.headers.get("content-range", "").rsplit("/", 1)[-1]
+            if not total.isdigit():
+                return False, 0
+            return True, int(total)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        log.debug(f"Range 探测失败 {url}: {e!r}")
+        return False, 0
+
+
+def split_segments(total_size: int, segment_size: int) -> List[Segment]:
+    return split_ranges([(0, total_size - 1)], segment_size)
+
+
+def split_ranges(ranges: List[Tuple[int, int]], segment_size: int) -> List[Segment]:
+    """将若干闭区间切分为不超过 segment_size 的分段"""
+    return [
+        Segment(start, min(start + segment_size - 1, range_end))
+        for range_start, range_end in ranges
+        for start in range(range_start, range_end + 1, segment_size)
+    ]
+
+
+def preallocate_file(dest_path: Path, total_size: int):
+    downloadWriter.ensure_free_space(dest_path.parent, total_size)
+    with open(dest_path, "wb") as f:
+        downloadWriter.preallocate(f, total_size)
+
+
+class SegmentedDownload:
+    """
+    分段下载任务, 所有分段在同一个事件循环上并发下载
+
+    Args:
+        session: 共享的 aiohttp 会话
+        slots: 参与下载的下载源 (均已确认支持 Range)
+        filename: 文件名
+        journal: 续传日志, 其 part_path 为写入目标 (需已预分配)
+        segments: 待下载的分段列表
+        cancel_event: 外部取消信号, 置位后所有分段停止下载
+        reporter: 进度汇报器
+        digest: 跟随从文件头开始连续完成的部分增量计算的摘要
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        slots: List[MirrorSlot],
+        filename: str,
+        journal: downloadJournal.DownloadJournal,
+        segments: List[Segment],
+        cancel_event: Optional[threading.Event] = None,
+        reporter: Optional[progressReporter.ProgressReporter] = None,
+        digest: Optional[downloadDigest.StreamDigest] = None,
+    ):
+        self.session = session
+        self.slots = slots
+        self.digest = digest
+        self.filename = filename
+        self.journal = journal
+        self.dest_path = journal.part_path
+        self.total_size = journal.content_length
+        self.pending = list(reversed(segments))
+        self.reporter = reporter or progressReporter.ProgressReporter()
+        self.reporter.start(
+            filename, self.total_size, self.total_size - sum(seg.size for seg in segments)
+        )
+        self.cancel_event = cancel_event or threading.Event()
+        self.failed = False
+        self._cond = asyncio.Condition()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    async def _acquire(self) -> Tuple[Optional[MirrorSlot], Optional[Segment]]:
+        async with self._cond:
+            while True:
+                if self.cancelled or self.failed or not self.pending:
+                    return None, None
+                if all(slot.disabled for slot in self.slots):
+                    log.error("所有参与分段下载的下载源均已停用")
+                    self.failed = True
+                    self._cond.notify_all()
+                    return None, None
+                available = [slot for slot in self.slots if slot.has_capacity()]
+                if available:
+                    slot = min(available, key=lambda s: s.active / s.limit)
+                    slot.active += 1
+                    return slot, self.pending.pop()
+                # 外部取消不会唤醒条件变量, 定期检查一次
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _release(self, slot: MirrorSlot, segment: Segment, ok: bool, fatal: bool):
+        async with self._cond:
+            slot.active -= 1
+            if ok:
+                slot.on_success()
+            elif not self.cancelled:
+                slot.on_failure(fatal)
+                segment.retries += 1
+                if segment.retries > SEGMENTED_DOWNLOAD_MAX_SEGMENT_RETRIES:
+                    log.error(
+                        f"分段 {segment.start}-{segment.end} 重试次数过多, 分段下载失败"
+                    )
+                    self.failed = True
+                else:
+                    self.pending.append(segment)
+            self._cond.notify_all()
+
+    def _record(self, start: int, end: int):
+        """将已写入磁盘的区间记入续传日志"""
+        if end < start:
+            return
+        self.journal.add_range(start, end)
+        try:
+            self.journal.save()
+        except OSError as e:
+            log.warning(f"保存续传日志失败: {e}")
+
+    async def _fetch(self, slot: MirrorSlot, segment: Segment) -> Tuple[bool, bool]:
+        """
+        下载单个分段, 返回 (是否成功, 是否为致命错误)
+
+        下载中断时会推进 segment.start, 重试时只需获取剩余部分
+        """
+        fetch_start = segment.start
+        try:
+            return await self._fetch_range(slot, segment)
+        finally:
+            # 写入器已在 _fetch_range 中关闭, segment.start 之前的数据均已落盘
+            self._record(fetch_start, segment.start - 1)
+
+    async def _fetch_range(self, slot: MirrorSlot, segment: Segment) -> Tuple[bool, bool]:
+        headers = {**DOWNLOAD_HEADERS, "Range": f"bytes={segment.start}-{segment.end}"}
+        scoreboard = mirrorScoreboard.get_scoreboard()
+        base_url = mirrorScoreboard.base_url_of(slot.url)
+        fetch_start = segment.start
+        request_start = time.perf_counter()
+        try:
+            async with self.session.get(
+                slot.url, headers=headers, timeout=SEGMENT_TIMEOUT
+            ) as r:
+                first_byte_at = time.perf_counter()
+                if r.status != 206:
+                    log.warning(
+                        f"下载源 {slot.host} 返回 {r.status}, 不再用于分段下载"
+                    )
+                    return False, True
+                limiter = bandwidthLimiter.get_limiter()
+                writer = downloadWriter.DownloadWriter(
+                    self.dest_path, segment.start, existing=True
+                )
+                try:
+                    async with writer:
+                        async for chunk in r.content.iter_chunked(DOWNLOAD_READ_CHUNK_SIZE):
+                            if self.cancelled or self.failed:
+                                return False, False
+                            chunk = chunk[: segment.end + 1 - writer.offset]
+                            await writer.write(chunk)
+                            self.reporter.add(self.filename, len(chunk))
+                            if limiter:
+                                await limiter.consume_async(len(chunk))
+                            if writer.offset > segment.end:
+                                break
+                finally:
+                    # 只推进到已写盘的位置, 重试时从此处继续
+                    segment.start = writer.flushed
+            if segment.start <= segment.end:
+                log.warning(f"下载源 {slot.host} 提前结束了分段响应")
+                scoreboard.record_failure(base_url)
+                return False, False
+            if not bandwidthLimiter.is_limited():
+                scoreboard.record_transfer(
+                    base_url,
+                    segment.start - fetch_start,
+                    time.perf_counter() - first_byte_at,
+                    first_byte_at - request_start,
+                )
+            return True, False
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.warning(f"从 {slot.host} 下载分段时发生网络错误: {e!r}")
+            scoreboard.record_failure(base_url)
+            return False, False
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if "INSTALLATION_CANCELLED" in str(e):
+                self.cancel_event.set()
+            else:
+                log.error(f"写入分段时发生意外错误: {e}")
+                self.failed = True
+            async with self._cond:
+                self._cond.notify_all()
+            return False, False
+
+    async def _worker(self):
+        while True:
+            slot, segment = await self._acquire()
+            if slot is None or segment is None:
+                return
+            ok, fatal = await self._fetch(slot, segment)
+            await self._release(slot, segment, ok, fatal)
+
+    async def _update_digest(self):
+        """将新完成的连续部分计入摘要, 此时数据刚写入, 通常仍在系统缓存中"""
+        if not self.digest:
+            return
+        try:
+            await asyncio.to_thread(
+                self.digest.catch_up, self.dest_path, self.journal.contiguous_bytes
+            )
+        except OSError as e:
+            log.warning(f"计算 {self.filename} 的摘要失败, 将在下载完成后计算: {e}")
+            self.digest = None
+
+    async def run(self) -> bool:
+        worker_count = sum(slot.max_limit for slot in self.slots)
+        workers = [asyncio.create_task(self._worker()) for _ in range(worker_count)]
+        try:
+            # 分段可能乱序完成, 跟随连续完成的部分计算摘要
+            while True:
+                _, not_done = await asyncio.wait(workers, timeout=0.2)
+                if not not_done:
+                    break
+                await self._update_digest()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        await self._update_digest()
+        return not (self.cancelled or self.failed or self.pending)
+
+
+async def select_range_mirrors(
+    session: aiohttp.ClientSession, base_urls: List[str], tag: str, filename: str
+) -> Tuple[List[MirrorSlot], int]:
+    """
+    并发探测下载源, 选出支持 Range 且文件大小一致的下载源
+
+    Returns:
+        Tuple[List[MirrorSlot], int]: (可用下载源, 文件总大小)
+    """
+    candidates = base_urls[: SEGMENTED_DOWNLOAD_MAX_MIRRORS * 2]
+    urls = [f"{base_url}/{tag}/{filename}" for base_url in candidates]
+    results = await asyncio.gather(*(probe_range_support(session, url) for url in urls))
+
+    sizes = [size for supported, size in results if supported and size > 0]
+    if not sizes:
+        return [], 0
+    # 以多数下载源给出的大小为准, 排除返回异常内容的代理
+    total_size = max(set(sizes), key=sizes.count)
+
+    slots = [
+        MirrorSlot(url, SEGMENTED_DOWNLOAD_MAX_CONN_PER_MIRROR)
+        for url, (supported, size) in zip(urls, results)
+        if supported and size == total_size
+    ]
+    return slots[:SEGMENTED_DOWNLOAD_MAX_MIRRORS], total_size
+
+
+async def download_file_segmented_async(
+    session: aiohttp.ClientSession,
+    base_urls: List[str],
+    tag: str,
+    filename: str,
+    dest_folder: str,
+    cancel_event: Optional[threading.Event] = None,
+    reporter: Optional[progressReporter.ProgressReporter] = None,
+    digest: Optional[downloadDigest.StreamDigest] = None,
+) -> Path | str | None:
+    """
+    分段多连接下载文件
+
+    Args:
+        session: 共享的 aiohttp 会话
+        base_urls: 下载源列表 (按优先级排序)
+        tag: 版本 Tag
+        filename: 文件名
+        dest_folder: 目标目录
+        cancel_event: 外部取消信号
+        reporter: 进度汇报器
+        digest: 下载过程中增量计算文件摘要, 由调用方校验
+
+    Returns:
+        Path | str | None: 成功时返回文件路径, 取消时返回 "DL_CANCEL", 磁盘空间不足时返回 "DL_NO_SPACE",
+        下载源不支持 Range 或分段下载失败时返回 None (调用方应回退为单连接下载)
+    """
+    slots, total_size = await select_range_mirrors(session, base_urls, tag, filename)
+    if not slots:
+        log.info(f"没有支持 Range 请求的下载源, 跳过分段下载 {filename}")
+        return None
+    if total_size < SEGMENTED_DOWNLOAD_MIN_SIZE:
+        log.info(f"文件 {filename} 较小, 跳过分段下载")
+        return None
+
+    dest_path = Path(dest_folder) / filename
+    part_path = Path(PARTIAL_DOWNLOAD_DIR) / filename
+
+    journal = downloadJournal.DownloadJournal.load(part_path)
+    if (
+        journal
+        and journal.matches(slots[0].url, total_size)
+        and part_path.stat().st_size == total_size
+    ):
+        segments = split_ranges(
+            journal.missing_ranges(), SEGMENTED_DOWNLOAD_SEGMENT_SIZE
+        )
+        log.info(
+            f"从续传记录恢复 {filename}, "
+            f"已完成 {journal.completed_bytes / 1024 / 1024:.2f} MB"
+        )
+    else:
+        downloadJournal.discard_partial(part_path)
+        try:
+            await asyncio.to_thread(preallocate_file, part_path, total_size)
+        except downloadWriter.InsufficientDiskSpaceError as e:
+            log.critical(f"无法下载 {filename}: {e}")
+            return "DL_NO_SPACE"
+        except OSError as e:
+            log.error(f"预分配文件 {part_path} 失败: {e}")
+            return None
+        journal = downloadJournal.DownloadJournal(part_path, slots[0].url, total_size)
+        journal.save()
+        segments = split_segments(total_size, SEGMENTED_DOWNLOAD_SEGMENT_SIZE)
+
+    log.info(
+        f"开始分段下载 {filename} ({total_size / 1024 / 1024:.2f} MB), "
+        f"下载源: {', '.join(slot.host for slot in slots)}"
+    )
+
+    task = SegmentedDownload(
+        session, slots, filename, journal, segments, cancel_event, reporter, digest
+    )
+    success = await task.run()
+
+    if task.cancelled:
+        return "DL_CANCEL"
+    if not success:
+        log.warning(f"分段下载 {filename} 失败, 已保存进度以便续传")
+        return None
+
+    await asyncio.to_thread(downloadJournal.finalize_partial, part_path, dest_path)
+    task.reporter.finish(filename)
+    log.success(f"文件 {filename} 分段下载成功。")
+    return dest_path
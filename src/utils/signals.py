@@ -13,4 +13,6 @@ class GlobalSignals(QObject):
     showVersionSelectorMainPage = pyqtSignal()
     showVersionSelectorAikariPage = pyqtSignal()
 
-global_signals = GlobalSignals()
\ No newline at end of file
+    downloadProgressUpdated = pyqtSignal(object)
+
+global_signals = GlobalSignals()
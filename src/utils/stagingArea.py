@@ -0,0 +1,85 @@
+"""
+暂存目录
+解压后的 aura / core 目录与修补后的 ASAR 最终要移动到希沃管家的 resources 目录。%TEMP% 与其不在同一磁盘时,
+每次移动都会变成完整复制再删除; 因此优先在目标所在磁盘上 (resources 的上级目录中) 建立暂存目录, 使最后的
+移动成为原子的重命名。无法在目标磁盘上写入时回退到临时文件夹
+"""
+
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+from loguru import logger as log
+
+from config import config
+
+
+def _existing(path: Path) -> Path:
+    """path 自身或最近的已存在的上级目录"""
+    path = Path(path).absolute()
+    while not path.exists() and path.parent != path:
+        path = path.parent
+    return path
+
+
+def same_volume(a: Path, b: Path) -> bool:
+    return os.stat(_existing(a)).st_dev == os.stat(_existing(b)).st_dev
+
+
+def _probe_writable(directory: Path):
+    """在 directory 中创建并删除一个文件, 不可写时抛出 OSError"""
+    probe = directory / f".probe-{uuid.uuid4().hex}"
+    with open(probe, "wb") as f:
+        f.write(b"\0")
+    os.remove(probe)
+
+
+def prepare_staging_dir(target_dir: Path, dry_run: bool = False) -> Path:
+    """
+    选择与 target_dir 位于同一磁盘的暂存目录并清空
+
+    Args:
+        target_dir: 最终的安装目录 (resources)
+        dry_run: 干跑模式下不在安装目录旁写入, 直接使用临时文件夹
+
+    Returns:
+        Path: 暂存目录; 与临时文件夹位于同一磁盘、干跑或目标磁盘不可写时为 TEMP_INSTALL_DIR
+    """
+    temp_dir = Path(config.TEMP_INSTALL_DIR)
+    if dry_run:
+        return temp_dir
+    try:
+        if same_volume(temp_dir, target_dir):
+            log.info("临时文件夹与安装目录位于同一磁盘, 直接在临时文件夹中解压")
+            return temp_dir
+    except OSError as e:
+        log.warning(f"无法判断 {target_dir} 所在的磁盘, 使用临时文件夹: {e}")
+        return temp_dir
+
+    staging_dir = Path(target_dir).parent / config.STAGING_DIR_NAME
+    try:
+        if staging_dir.exists():
+            # 上次安装中断时遗留的暂存内容
+            shutil.rmtree(staging_dir)
+        staging_dir.mkdir(parents=True)
+        _probe_writable(staging_dir)
+    except OSError as e:
+        log.warning(
+            f"无法在安装目录所在的磁盘上建立暂存目录 {staging_dir}: {e} | "
+            "将使用临时文件夹, 最后的移动需要跨磁盘复制"
+        )
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return temp_dir
+    log.info(f"临时文件夹与安装目录不在同一磁盘, 使用暂存目录: {staging_dir}")
+    return staging_dir
+
+
+def remove_staging_dir(staging_dir: Path):
+    """删除 prepare_staging_dir 建立的暂存目录 (临时文件夹由 cleanup_temp_files 处理)"""
+    if Path(staging_dir) == Path(config.TEMP_INSTALL_DIR) or not staging_dir.exists():
+        return
+    try:
+        shutil.rmtree(staging_dir)
+    except OSError as e:
+        log.warning(f"暂存目录清理失败: {e} | 请尝试手动删除 {staging_dir}")
@@ -0,0 +1,403 @@
+"""
+边下载边解压
+ZIP 文件的各条目按顺序写在文件前部, 中央目录位于末尾。本模块在下载过程中跟随续传日志公布的
+"从文件头开始连续完成的字节数" 依次解析本地文件头并流式解压各条目; 下载完成后再以中央目录核对
+已解压的条目, 缺失或不一致的条目用 zipfile 补充解压。解压的大小与压缩比受与 parallelUnzip 相同的限制
+"""
+
+import shutil
+import struct
+import threading
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from loguru import logger as log
+
+from config import config
+from utils import downloadJournal, parallelUnzip
+
+
+READ_CHUNK_SIZE = 1024 * 1024
+POLL_INTERVAL = 0.1
+
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+# 中央目录、数字签名、Zip64 中央目录结束记录、中央目录结束记录; 出现即表示条目数据已结束
+CENTRAL_SIGNATURES = (b"PK\x01\x02", b"PK\x05\x05", b"PK\x06\x06", b"PK\x05\x06")
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+ZIP64_EXTRA_ID = 0x0001
+
+FLAG_ENCRYPTED = 0x1
+FLAG_DATA_DESCRIPTOR = 0x8
+FLAG_UTF8 = 0x800
+
+
+class UnsupportedStream(Exception):
+    """条目无法流式解压 (加密、不支持的压缩方式等), 留待下载完成后处理"""
+
+
+class _Entry:
+    def __init__(
+        self,
+        name: str,
+        method: int,
+        flags: int,
+        crc: int,
+        compressed_size: int,
+        file_size: int,
+        zip64: bool,
+    ):
+        self.name = name
+        self.method = method
+        self.flags = flags
+        self.crc = crc
+        self.compressed_size = compressed_size
+        self.file_size = file_size
+        self.zip64 = zip64
+        self.consumed = 0
+        self.actual_crc = 0
+        self.size = 0
+        self.decompressor = zlib.decompressobj(-15) if method == zipfile.ZIP_DEFLATED else None
+        self.file = None
+
+    @property
+    def has_descriptor(self) -> bool:
+        return bool(self.flags & FLAG_DATA_DESCRIPTOR)
+
+    def write(self, data: bytes):
+        if data:
+            self.file.write(data)
+            self.actual_crc = zlib.crc32(data, self.actual_crc)
+            self.size += len(data)
+
+
+class StreamingExtractor:
+    """
+    在后台线程中跟随下载进度解压单个 ZIP 文件
+
+    Args:
+        part_path: 未完成的下载文件路径 (PARTIAL_DOWNLOAD_DIR 下)
+        extract_to: 解压目标目录
+    """
+
+    def __init__(self, part_path: Path, extract_to: Path):
+        self.part_path = Path(part_path)
+        self.extract_to = Path(extract_to)
+        self.extracted: Dict[str, Tuple[int, int]] = {}  # 条目名 -> (CRC32, 大小)
+        self.streamed_before_finish: Optional[int] = None  # 下载完成时已解压的条目数
+        self._zip_path: Optional[Path] = None
+        self._finished = threading.Event()
+        self._cancelled = threading.Event()
+        self._result = False
+        self._thread = threading.Thread(
+            target=self._run, name=f"unzip-{self.part_path.name}", daemon=True
+        )
+        self._reset(0)
+
+    def start(self):
+        self._thread.start()
+
+    def finish(self, zip_path: Path):
+        """下载完成, 处理剩余部分并核对中央目录"""
+        self._zip_path = Path(zip_path)
+        self._finished.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._finished.set()
+
+    def wait(self) -> bool:
+        """
+        等待解压完成
+
+        Returns:
+            bool: 全部条目均已解压且与中央目录一致
+        """
+        self._thread.join()
+        return self._result
+
+    def _reset(self, generation: int):
+        self._generation = generation
+        self._read_pos = 0  # 已读入缓冲区的文件位置
+        self._pending = bytearray()  # 已读入但尚未解析的数据
+        self._entry: Optional[_Entry] = None
+        self._state = "header"
+        self._streaming = True  # 遇到中央目录或无法流式解压的条目后停止
+        self._total_size = 0  # 已解压的总字节数
+        self._close_entry_file()
+        self.extracted = {}
+
+    def _close_entry_file(self):
+        entry = getattr(self, "_entry", None)
+        if entry and entry.file:
+            entry.file.close()
+
+    def _run(self):
+        try:
+            self._stream()
+            if self._cancelled.is_set():
+                return
+            self._result = self._verify()
+        except parallelUnzip.ExtractLimitError as e:
+            log.error(f"拒绝解压 {self.part_path.name}: {e}")
+            self._result = False
+        except Exception as e:
+            log.warning(f"边下载边解压 {self.part_path.name} 失败, 将在下载完成后重新解压: {e!r}")
+            self._result = False
+        finally:
+            self._close_entry_file()
+
+    def _stream(self):
+        while not self._cancelled.is_set():
+            finished = self._finished.is_set()
+            if finished:
+                if self.streamed_before_finish is None:
+                    self.streamed_before_finish = len(self.extracted)
+                source = self._zip_path
+                generation, watermark = self._generation, source.stat().st_size
+            else:
+                source = self.part_path
+                generation, watermark = downloadJournal.get_watermark(self.part_path)
+                if generation != self._generation:
+                    log.info(f"{self.part_path.name} 已重新开始下载, 重新解压")
+                    self._reset(generation)
+                    if self.extract_to.exists():
+                        shutil.rmtree(self.extract_to)
+
+            if self._streaming and watermark > self._read_pos:
+                try:
+                    self._feed(source, watermark)
+                except FileNotFoundError:
+                    # 下载文件已移动到目标位置, 等待 finish
+                    self._finished.wait(POLL_INTERVAL)
+                except UnsupportedStream as e:
+                    log.info(f"{self.part_path.name} {e}, 其余条目将在下载完成后解压")
+                    self._streaming = False
+                continue
+
+            if finished:
+                return
+            self._finished.wait(POLL_INTERVAL)
+
+    def _feed(self, source: Path, watermark: int):
+        with open(source, "rb") as f:
+            f.seek(self._read_pos)
+            while self._streaming and self._read_pos < watermark:
+                data = f.read(min(READ_CHUNK_SIZE, watermark - self._read_pos))
+                if not data:
+                    return
+                self._read_pos += len(data)
+                self._pending += data
+                self._parse()
+
+    def _parse(self):
+        while self._streaming:
+            if self._state == "header" and not self._parse_header():
+                return
+            if self._state == "data" and not self._parse_data():
+                return
+            if self._state == "descriptor" and not self._parse_descriptor():
+                return
+
+    def _parse_header(self) -> bool:
+        if len(self._pending) < 4:
+            return False
+        signature = bytes(self._pending[:4])
+        if signature in CENTRAL_SIGNATURES:
+            self._streaming = False
+            return False
+        if signature != LOCAL_HEADER_SIGNATURE:
+            raise UnsupportedStream("遇到无法识别的数据")
+        if len(self._pending) < LOCAL_HEADER.size:
+            return False
+        (
+            _,
+            _,
+            flags,
+            method,
+            _,
+            _,
+            crc,
+            compressed_size,
+            file_size,
+            name_length,
+            extra_length,
+        ) = LOCAL_HEADER.unpack_from(self._pending)
+        header_size = LOCAL_HEADER.size + name_length + extra_length
+        if len(self._pending) < header_size:
+            return False
+
+        raw_name = bytes(self._pending[LOCAL_HEADER.size : LOCAL_HEADER.size + name_length])
+        name = raw_name.decode("utf-8" if flags & FLAG_UTF8 else "cp437")
+        extra = bytes(self._pending[LOCAL_HEADER.size + name_length : header_size])
+        zip64 = False
+        if compressed_size == 0xFFFFFFFF:
+            file_size, compressed_size = _zip64_sizes(extra)
+            zip64 = True
+        if flags & FLAG_ENCRYPTED:
+            raise UnsupportedStream(f"条目 {name} 已加密")
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise UnsupportedStream(f"条目 {name} 使用了不支持的压缩方式 {method}")
+        if flags & FLAG_DATA_DESCRIPTOR and method == zipfile.ZIP_STORED:
+            raise UnsupportedStream(f"条目 {name} 未记录大小")
+
+        if not flags & FLAG_DATA_DESCRIPTOR:
+            # 大小记录在本地文件头中时, 开始写入前即按 check_limits 的规则检查
+            self._check_limits(name, file_size, compressed_size)
+
+        del self._pending[:header_size]
+        entry = _Entry(name, method, flags, crc, compressed_size, file_size, zip64)
+        target = self._target_path(name)
+        if name.endswith("/"):
+            target.mkdir(parents=True, exist_ok=True)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            entry.file = open(target, "wb")
+        self._entry = entry
+        self._state = "data"
+        return True
+
+    def _parse_data(self) -> bool:
+        entry = self._entry
+        if entry.has_descriptor:
+            # 大小未知, 由 deflate 流自身判断结束位置
+            data = bytes(self._pending)
+            self._pending.clear()
+            entry.consumed += len(data)
+            self._inflate(entry, data)
+            if not entry.decompressor.eof:
+                return False
+            self._pending += entry.decompressor.unused_data
+            self._state = "descriptor"
+            return True
+
+        size = min(len(self._pending), entry.compressed_size - entry.consumed)
+        data = bytes(self._pending[:size])
+        del self._pending[:size]
+        entry.consumed += size
+        if entry.decompressor:
+            self._inflate(entry, data)
+        else:
+            self._write(entry, data)
+        if entry.consumed < entry.compressed_size:
+            return False
+        if entry.decompressor:
+            self._write(entry, entry.decompressor.flush())
+        self._complete_entry(entry.crc)
+        return True
+
+    def _parse_descriptor(self) -> bool:
+        entry = self._entry
+        has_signature = bytes(self._pending[:4]) == DATA_DESCRIPTOR_SIGNATURE
+        size = (20 if entry.zip64 else 12) + (4 if has_signature else 0)
+        if len(self._pending) < max(size, 4):
+            return False
+        offset = 4 if has_signature else 0
+        (crc,) = struct.unpack_from("<I", self._pending, offset)
+        del self._pending[:size]
+        self._complete_entry(crc)
+        return True
+
+    def _inflate(self, entry: _Entry, data: bytes):
+        """分块解压, 每次输出不超过 READ_CHUNK_SIZE, 以便在写入前检查大小限制"""
+        decompressor = entry.decompressor
+        while not decompressor.eof:
+            output = decompressor.decompress(data, READ_CHUNK_SIZE)
+            self._write(entry, output)
+            data = decompressor.unconsumed_tail
+            if not data and len(output) < READ_CHUNK_SIZE:
+                return
+
+    def _write(self, entry: _Entry, data: bytes):
+        """
+        Raises:
+            ExtractLimitError: 解压后的总大小或该条目的压缩比超出限制
+        """
+        self._total_size += len(data)
+        if self._total_size > config.EXTRACT_MAX_TOTAL_BYTES:
+            raise parallelUnzip.ExtractLimitError(
+                f"解压后大小超出上限 {config.EXTRACT_MAX_TOTAL_BYTES / 1024 / 1024:.0f} MB"
+            )
+        size = entry.size + len(data)
+        if entry.has_descriptor:
+            # 大小未记录在本地文件头中, 按已读取的压缩数据检查
+            self._check_ratio(entry.name, size, entry.consumed)
+        elif size > entry.file_size:
+            raise UnsupportedStream(f"条目 {entry.name} 解压后的大小与文件头不符")
+        entry.write(data)
+
+    def _check_limits(self, name: str, file_size: int, compressed_size: int):
+        if self._total_size + file_size > config.EXTRACT_MAX_TOTAL_BYTES:
+            raise parallelUnzip.ExtractLimitError(
+                f"解压后大小超出上限 {config.EXTRACT_MAX_TOTAL_BYTES / 1024 / 1024:.0f} MB"
+            )
+        self._check_ratio(name, file_size, compressed_size)
+
+    def _check_ratio(self, name: str, file_size: int, compressed_size: int):
+        # 与 check_limits 相同, 很小的条目不检查压缩比
+        if file_size > parallelUnzip.COPY_BUFFER_SIZE and (
+            file_size > compressed_size * config.EXTRACT_MAX_RATIO
+        ):
+            raise parallelUnzip.ExtractLimitError(
+                f"条目 {name} 的压缩比超出上限 {config.EXTRACT_MAX_RATIO}"
+            )
+
+    def _complete_entry(self, expected_crc: int):
+        entry = self._entry
+        if entry.file:
+            entry.file.close()
+            entry.file = None
+            if entry.actual_crc != expected_crc:
+                raise UnsupportedStream(f"条目 {entry.name} CRC 校验失败")
+        self.extracted[entry.name] = (entry.actual_crc, entry.size)
+        self._entry = None
+        self._state = "header"
+
+    def _target_path(self, name: str) -> Path:
+        # 与 zipfile 相同, 去除盘符、根目录以及 "." / ".." 路径成分
+        parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+        parts = [part for part in parts if not part.endswith(":")]
+        return self.extract_to.joinpath(*parts) if parts else self.extract_to
+
+    def _verify(self) -> bool:
+        """以中央目录核对已解压的条目, 补充解压缺失或不一致的条目"""
+        with zipfile.ZipFile(self._zip_path, "r") as zf:
+            infos = zf.infolist()
+            parallelUnzip.check_limits(infos)
+            listed = {info.filename for info in infos}
+            repaired = 0
+            for info in infos:
+                if info.is_dir():
+                    self._target_path(info.filename).mkdir(parents=True, exist_ok=True)
+                    continue
+                if self.extracted.get(info.filename) == (info.CRC, info.file_size):
+                    continue
+                zf.extract(info, self.extract_to)
+                repaired += 1
+
+        for name in set(self.extracted) - listed:
+            # 中央目录中不存在的条目 (如被覆盖的旧条目) 不应保留
+            target = self._target_path(name)
+            if target.is_file():
+                target.unlink()
+
+        log.success(
+            f"解压 {self._zip_path.name} 成功: 下载完成时已解压 "
+            f"{self.streamed_before_finish}/{len(infos)} 个条目"
+            + (f", 补充解压 {repaired} 个条目" if repaired else "")
+        )
+        return True
+
+
+def _zip64_sizes(extra: bytes) -> Tuple[int, int]:
+    """返回 Zip64 扩展字段中的 (原始大小, 压缩后大小)"""
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, size = struct.unpack_from("<HH", extra, offset)
+        if header_id == ZIP64_EXTRA_ID and size >= 16:
+            # Zip64 扩展字段: 原始大小 (8) + 压缩后大小 (8)
+            return struct.unpack_from("<QQ", extra, offset + 4)
+        offset += 4 + size
+    raise UnsupportedStream("Zip64 条目缺少大小信息")
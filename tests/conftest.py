@@ -0,0 +1,10 @@
+"""
+测试配置: 源码位于 src 下, 以与运行时相同的方式 (from utils import ...) 导入
+"""
+
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
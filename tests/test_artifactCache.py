@@ -0,0 +1,61 @@
+import hashlib
+import os
+
+from utils import artifactCache
+
+
+def make_cache(tmp_path, max_bytes=1024 * 1024):
+    return artifactCache.ArtifactCache(str(tmp_path / "cache"), max_bytes)
+
+
+def make_file(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+def test_store_and_lookup(tmp_path):
+    cache = make_cache(tmp_path)
+    data = os.urandom(5000)
+    sha256 = cache.store("v1", "aura.zip", make_file(tmp_path, "aura.zip", data))
+    assert sha256 == hashlib.sha256(data).hexdigest()
+
+    digests = {}
+    result = cache.lookup("v1", "aura.zip", str(tmp_path / "dest"), digests)
+
+    assert result == tmp_path / "dest" / "aura.zip"
+    assert result.read_bytes() == data
+    assert digests == {"aura.zip": sha256}
+    assert cache.lookup("v2", "aura.zip", str(tmp_path / "dest2")) is None
+
+
+def test_lookup_drops_corrupted_entry(tmp_path):
+    cache = make_cache(tmp_path)
+    sha256 = cache.store("v1", "aura.zip", make_file(tmp_path, "aura.zip", b"original"))
+    cache.blob_path(sha256).write_bytes(b"tampered")
+
+    assert cache.lookup("v1", "aura.zip", str(tmp_path / "dest")) is None
+    assert not (tmp_path / "dest" / "aura.zip").exists()
+    assert cache.entries() == []
+    assert not cache.blob_path(sha256).exists()
+
+
+def test_lru_eviction_and_other_versions(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=2500)
+    for tag in ("v1", "v2", "v3"):
+        cache.store(tag, "aura.zip", make_file(tmp_path, f"{tag}.zip", os.urandom(1000)))
+
+    assert [entry.tag for entry in cache.entries()] == ["v3", "v2"]
+    assert cache.total_size() == 2000
+    others = cache.other_versions("aura.zip", "v3", 3)
+    assert others == [cache.blob_path(cache.entries()[1].sha256)]
+
+
+def test_copy_with_sha256(tmp_path):
+    data = os.urandom(3 * artifactCache.HASH_CHUNK_SIZE + 17)
+    source = make_file(tmp_path, "source", data)
+
+    digest = artifactCache.copy_with_sha256(source, tmp_path / "dest")
+
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert (tmp_path / "dest").read_bytes() == data
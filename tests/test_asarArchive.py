@@ -0,0 +1,93 @@
+import os
+import struct
+
+import pytest
+
+from utils import asarArchive
+
+
+def make_tree(root):
+    (root / "lib" / "nested").mkdir(parents=True)
+    (root / "main.js").write_text("console.log('main');\n", encoding="utf-8")
+    (root / "package.json").write_text('{"version": "1.2.3"}', encoding="utf-8")
+    (root / "empty.txt").write_bytes(b"")
+    (root / "lib" / "data.bin").write_bytes(os.urandom(70000))
+    (root / "lib" / "nested" / "中文.txt").write_text("内容", encoding="utf-8")
+    return {
+        path.relative_to(root).as_posix(): path.read_bytes()
+        for path in root.rglob("*")
+        if path.is_file()
+    }
+
+
+def test_create_and_read_round_trip(tmp_path):
+    files = make_tree(tmp_path / "src")
+    output = tmp_path / "app.asar"
+
+    assert asarArchive.create_archive(tmp_path / "src", output) == len(files)
+
+    with asarArchive.AsarArchive(output) as archive:
+        assert {entry.path for entry in archive.files()} == set(files)
+        for path, content in files.items():
+            view = archive.read(path)
+            assert bytes(view) == content
+            view.release()
+        assert archive.get("lib/nested").kind == asarArchive.DIRECTORY
+
+
+def test_extract_round_trip(tmp_path):
+    files = make_tree(tmp_path / "src")
+    output = tmp_path / "app.asar"
+    asarArchive.create_archive(tmp_path / "src", output)
+
+    with asarArchive.AsarArchive(output) as archive:
+        archive.extract(tmp_path / "out")
+
+    for path, content in files.items():
+        assert (tmp_path / "out" / path).read_bytes() == content
+
+
+def test_header_round_trip(tmp_path):
+    header = {"files": {"a.txt": {"size": 3, "offset": "0"}, "dir": {"files": {}}}}
+    path = tmp_path / "header.asar"
+    asarArchive.write_archive(path, header, [b"abc"])
+
+    with open(path, "rb") as f:
+        parsed, body_offset = asarArchive.read_header(f)
+        assert parsed == header
+        f.seek(body_offset)
+        assert f.read() == b"abc"
+    # Pickle 字符串按 4 字节对齐
+    assert (body_offset - 8) % 4 == 0
+
+
+@pytest.mark.skipif(os.name == "nt", reason="需要符号链接权限")
+def test_symlink_inside_archive(tmp_path):
+    make_tree(tmp_path / "src")
+    os.symlink(tmp_path / "src" / "lib", tmp_path / "src" / "alias")
+    output = tmp_path / "app.asar"
+    asarArchive.create_archive(tmp_path / "src", output)
+
+    with asarArchive.AsarArchive(output) as archive:
+        assert archive.get("alias").kind == asarArchive.LINK
+        view = archive.read("alias/data.bin")
+        assert bytes(view) == (tmp_path / "src" / "lib" / "data.bin").read_bytes()
+        view.release()
+
+
+def test_invalid_header_raises(tmp_path):
+    path = tmp_path / "bad.asar"
+    path.write_bytes(b"not an asar file")
+    with pytest.raises(asarArchive.AsarFormatError):
+        asarArchive.AsarArchive(path)
+
+    path.write_bytes(struct.pack("<II", 4, 1 << 20))
+    with pytest.raises(asarArchive.AsarFormatError):
+        asarArchive.AsarArchive(path)
+
+
+def test_offset_outside_body_raises(tmp_path):
+    path = tmp_path / "truncated.asar"
+    asarArchive.write_archive(path, {"files": {"a.txt": {"size": 10, "offset": "0"}}}, [b"abc"])
+    with pytest.raises(asarArchive.AsarFormatError):
+        asarArchive.AsarArchive(path)
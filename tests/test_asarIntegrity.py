@@ -0,0 +1,63 @@
+import hashlib
+import os
+
+from utils import asarArchive, asarIntegrity
+
+
+def test_small_file_has_single_block():
+    data = b"hello"
+    integrity = asarIntegrity.compute_integrity(data)
+    digest = hashlib.sha256(data).hexdigest()
+    assert integrity == {
+        "algorithm": "SHA256",
+        "hash": digest,
+        "blockSize": asarIntegrity.BLOCK_SIZE,
+        "blocks": [digest],
+    }
+
+
+def test_block_multiple_ends_with_empty_block():
+    data = os.urandom(2048)
+    integrity = asarIntegrity.compute_integrity(data, block_size=1024)
+    assert integrity["blocks"] == [
+        hashlib.sha256(data[:1024]).hexdigest(),
+        hashlib.sha256(data[1024:]).hexdigest(),
+        asarIntegrity.EMPTY_SHA256,
+    ]
+
+
+def test_compute_many_matches_compute_integrity():
+    buffers = [b"", b"x", os.urandom(5000), os.urandom(4096), os.urandom(10000)]
+    expected = [asarIntegrity.compute_integrity(buffer, block_size=1024) for buffer in buffers]
+    assert asarIntegrity.compute_many(buffers, block_size=1024, workers=4) == expected
+    assert asarIntegrity.compute_many(buffers, block_size=1024, workers=1) == expected
+
+
+def test_verify_archive_detects_tampering(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a.js").write_bytes(b"a" * 1000)
+    (src / "b.js").write_bytes(b"b" * 1000)
+    path = tmp_path / "app.asar"
+    asarArchive.create_archive(src, path)
+
+    with asarArchive.AsarArchive(path) as archive:
+        assert asarIntegrity.verify_archive(archive).ok
+        body_offset = archive.body_offset
+        offset = archive.get("b.js").offset
+
+    with open(path, "r+b") as f:
+        f.seek(body_offset + offset)
+        f.write(b"X")
+
+    with asarArchive.AsarArchive(path) as archive:
+        report = asarIntegrity.verify_archive(archive)
+    assert report.mismatched == ["b.js"]
+    assert report.checked == 2
+
+
+def test_trailing_empty_block_is_optional():
+    data = os.urandom(2048)
+    integrity = asarIntegrity.compute_integrity(data, block_size=1024)
+    assert asarIntegrity._blocks_match(integrity["blocks"], integrity["blocks"][:-1])
+    assert not asarIntegrity._blocks_match(integrity["blocks"], integrity["blocks"][:1])
@@ -0,0 +1,95 @@
+import os
+
+from utils import asarArchive, asarIntegrity, asarRepacker
+
+
+def build_archive(tmp_path):
+    src = tmp_path / "src"
+    (src / "lib").mkdir(parents=True)
+    (src / "main.js").write_text("start();\n", encoding="utf-8")
+    (src / "lib" / "a.bin").write_bytes(os.urandom(50000))
+    (src / "lib" / "b.bin").write_bytes(os.urandom(30000))
+    (src / "tool.sh").write_text("#!/bin/sh\n", encoding="utf-8")
+    input_path = tmp_path / "app.asar"
+    asarArchive.create_archive(src, input_path)
+    return src, input_path
+
+
+def read_all(path):
+    with asarArchive.AsarArchive(path) as archive:
+        contents = {}
+        for entry in archive.files():
+            view = archive.read(entry)
+            contents[entry.path] = bytes(view)
+            view.release()
+        return contents, archive.header
+
+
+def test_repack_replaces_and_overlays(tmp_path):
+    src, input_path = build_archive(tmp_path)
+    overlay = tmp_path / "core"
+    (overlay / "lib").mkdir(parents=True)
+    (overlay / "hook.js").write_text("hook();\n", encoding="utf-8")
+    (overlay / "lib" / "b.bin").write_bytes(b"overlaid")
+    output_path = tmp_path / "patched.asar"
+
+    stats = asarRepacker.repack(
+        input_path,
+        output_path,
+        {"main.js": lambda content: b"patched();\n" + content},
+        overlay,
+    )
+
+    contents, _ = read_all(output_path)
+    assert contents["main.js"] == b"patched();\nstart();\n"
+    assert contents["hook.js"] == b"hook();\n"
+    assert contents["lib/b.bin"] == b"overlaid"
+    assert contents["lib/a.bin"] == (src / "lib" / "a.bin").read_bytes()
+    assert contents["tool.sh"] == (src / "tool.sh").read_bytes()
+    assert stats.files == 5
+    assert stats.copied_bytes == 50000 + len(b"#!/bin/sh\n")
+
+
+def test_repack_without_changes_is_identical(tmp_path):
+    _, input_path = build_archive(tmp_path)
+    output_path = tmp_path / "copy.asar"
+
+    asarRepacker.repack(input_path, output_path)
+
+    assert output_path.read_bytes() == input_path.read_bytes()
+
+
+def test_replaced_entry_keeps_other_fields(tmp_path):
+    _, input_path = build_archive(tmp_path)
+    with asarArchive.AsarArchive(input_path) as archive:
+        header = archive.header
+        payloads = []
+        for path, entry in asarArchive.iter_files(header):
+            view = archive.read(path)
+            payloads.append(bytes(view))
+            view.release()
+    header["files"]["tool.sh"]["executable"] = True
+    marked_path = tmp_path / "marked.asar"
+    asarArchive.write_archive(marked_path, header, payloads)
+    output_path = tmp_path / "patched.asar"
+
+    asarRepacker.repack(marked_path, output_path, {"tool.sh": lambda content: content + b"exit 0\n"})
+
+    contents, header = read_all(output_path)
+    node = header["files"]["tool.sh"]
+    assert node["executable"] is True
+    assert node["size"] == len(contents["tool.sh"])
+    assert node["integrity"] == asarIntegrity.compute_integrity(contents["tool.sh"])
+
+
+def test_repacked_integrity_verifies(tmp_path):
+    _, input_path = build_archive(tmp_path)
+    output_path = tmp_path / "patched.asar"
+
+    asarRepacker.repack(input_path, output_path, {"main.js": lambda content: b"// patched\n"})
+
+    with asarArchive.AsarArchive(output_path) as archive:
+        report = asarIntegrity.verify_archive(archive)
+    assert report.ok
+    assert not report.missing
+    assert report.checked == 4
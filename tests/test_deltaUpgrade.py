@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import os
+import threading
+import zipfile
+
+import pytest
+
+from utils import deltaUpgrade, progressReporter
+
+
+def write_zip(path, files, compression=zipfile.ZIP_DEFLATED):
+    with zipfile.ZipFile(path, "w", compression) as zf:
+        for name, data in files.items():
+            info = zipfile.ZipInfo(name, date_time=(2024, 1, 1, 0, 0, 0))
+            info.compress_type = compression
+            zf.writestr(info, data)
+
+
+def assert_matches_zipfile(layout, path):
+    with zipfile.ZipFile(path) as zf:
+        infos = {info.filename: info for info in zf.infolist()}
+    assert {entry.name for entry in layout.entries} == set(infos)
+    for entry in layout.entries:
+        info = infos[entry.name]
+        assert (entry.crc, entry.compressed_size, entry.file_size, entry.header_offset) == (
+            info.CRC, info.compress_size, info.file_size, info.header_offset
+        )
+
+
+def rebuild(new_path, base_path):
+    """按 match_entries 的结果, 以旧 ZIP 的区间与新 ZIP 中需下载的区间拼出新 ZIP"""
+    new = deltaUpgrade.read_local_directory(new_path)
+    base = deltaUpgrade.read_local_directory(base_path)
+    copies, fetches = deltaUpgrade.match_entries(new, base)
+    new_bytes, base_bytes = new_path.read_bytes(), base_path.read_bytes()
+    output = bytearray(new.size)
+    output[new.central_dir_offset :] = new.trailer
+    for new_offset, old_offset, length in copies:
+        output[new_offset : new_offset + length] = base_bytes[old_offset : old_offset + length]
+    for start, end in deltaUpgrade.group_ranges(fetches):
+        output[start:end] = new_bytes[start:end]
+    return bytes(output), copies, fetches
+
+
+def test_read_local_directory(tmp_path):
+    path = tmp_path / "aura.zip"
+    write_zip(path, {"aura/": b"", "aura/a.js": b"a" * 1000, "aura/b.js": os.urandom(500)})
+
+    layout = deltaUpgrade.read_local_directory(path)
+
+    assert_matches_zipfile(layout, path)
+    assert layout.size == path.stat().st_size
+    assert layout.entries[-1].data_end == layout.central_dir_offset
+
+
+def test_read_local_directory_zip64(tmp_path, monkeypatch):
+    # 降低 Zip64 阈值, 让 zipfile 为小文件写出 Zip64 扩展字段与 Zip64 中央目录结束记录
+    monkeypatch.setattr(zipfile, "ZIP64_LIMIT", 64)
+    monkeypatch.setattr(zipfile, "ZIP_FILECOUNT_LIMIT", 2)
+    path = tmp_path / "aura.zip"
+    files = {f"aura/{index}.bin": os.urandom(200) for index in range(4)}
+    write_zip(path, files, zipfile.ZIP_STORED)
+    with open(path, "rb") as f:
+        assert b"PK\x06\x06" in f.read()
+
+    layout = deltaUpgrade.read_local_directory(path)
+
+    assert_matches_zipfile(layout, path)
+    assert len(layout.entries) == 4
+
+
+def test_not_a_zip_raises(tmp_path):
+    path = tmp_path / "bad.zip"
+    path.write_bytes(os.urandom(1000))
+    with pytest.raises(deltaUpgrade.DeltaUnavailable):
+        deltaUpgrade.read_local_directory(path)
+
+
+def test_identical_zips_need_no_fetch(tmp_path):
+    files = {"aura/a.js": b"a" * 1000, "aura/b.js": os.urandom(2000)}
+    write_zip(tmp_path / "old.zip", files)
+    write_zip(tmp_path / "new.zip", files)
+
+    rebuilt, copies, fetches = rebuild(tmp_path / "new.zip", tmp_path / "old.zip")
+
+    assert fetches == []
+    assert len(copies) == 1
+    assert rebuilt == (tmp_path / "new.zip").read_bytes()
+
+
+def test_changed_entries_are_fetched(tmp_path):
+    files = {f"aura/{index}.bin": os.urandom(3000) for index in range(10)}
+    write_zip(tmp_path / "old.zip", files)
+    files["aura/3.bin"] = os.urandom(100)
+    files["aura/new.bin"] = b"new" * 100
+    del files["aura/7.bin"]
+    write_zip(tmp_path / "new.zip", files)
+
+    rebuilt, copies, fetches = rebuild(tmp_path / "new.zip", tmp_path / "old.zip")
+
+    assert rebuilt == (tmp_path / "new.zip").read_bytes()
+    fetched = sum(end - start for start, end in fetches)
+    assert 0 < fetched < (tmp_path / "new.zip").stat().st_size // 2
+
+
+def test_group_ranges_merges_nearby(monkeypatch):
+    monkeypatch.setattr(deltaUpgrade.config, "DELTA_MERGE_GAP", 10)
+    monkeypatch.setattr(deltaUpgrade.config, "DELTA_MAX_REQUEST_BYTES", 100)
+    assert deltaUpgrade.group_ranges([(50, 60), (0, 10), (15, 20), (200, 290), (295, 320)]) == [
+        (0, 20),
+        (50, 60),
+        (200, 290),
+        (295, 320),
+    ]
+
+
+def test_strip_root():
+    assert deltaUpgrade.strip_root(["aura/aura/a.js", "aura/aura/b/c.js"]) == "aura/aura/"
+    assert deltaUpgrade.strip_root(["aura/a.js", "aura/aura/b.js"]) == ""
+    assert deltaUpgrade.strip_root([]) == ""
+
+
+def serve_and_apply(tmp_path, bases, cancel_event=None, reporter=None):
+    """以本地 HTTP 服务提供 tmp_path/releases/<tag>/aura.zip, 运行 apply_delta_async"""
+    web = pytest.importorskip("aiohttp.web")
+    aiohttp = pytest.importorskip("aiohttp")
+
+    async def run():
+        app = web.Application()
+        app.router.add_static("/", tmp_path / "releases")
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            async with aiohttp.ClientSession() as session:
+                return await deltaUpgrade.apply_delta_async(
+                    session,
+                    [f"http://127.0.0.1:{port}"],
+                    "v2",
+                    bases,
+                    tmp_path / "out" / "aura.zip",
+                    cancel_event=cancel_event,
+                    reporter=reporter,
+                )
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+def make_release(tmp_path):
+    files = {f"aura/{index}.bin": os.urandom(3000) for index in range(10)}
+    write_zip(tmp_path / "old.zip", files)
+    files["aura/3.bin"] = os.urandom(3000)
+    (tmp_path / "releases" / "v2").mkdir(parents=True)
+    write_zip(tmp_path / "releases" / "v2" / "aura.zip", files)
+    return tmp_path / "releases" / "v2" / "aura.zip"
+
+
+def test_apply_delta_reports_progress(tmp_path, monkeypatch):
+    new_path = make_release(tmp_path)
+    events = []
+    monkeypatch.setattr(progressReporter, "_listeners", [events.append])
+    reporter = progressReporter.ProgressReporter(interval=0)
+
+    sha256 = serve_and_apply(tmp_path, [tmp_path / "old.zip"], reporter=reporter)
+
+    assert sha256 == hashlib.sha256(new_path.read_bytes()).hexdigest()
+    assert (tmp_path / "out" / "aura.zip").read_bytes() == new_path.read_bytes()
+    assert events[-1].finished
+    assert events[-1].downloaded == events[-1].total > 0
+
+
+def test_apply_delta_stops_when_cancelled(tmp_path):
+    make_release(tmp_path)
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    assert serve_and_apply(tmp_path, [tmp_path / "old.zip"], cancel_event=cancel_event) is None
+    assert not (tmp_path / "out" / "aura.zip").exists()
+    assert not (tmp_path / "out" / "aura.zip.delta").exists()
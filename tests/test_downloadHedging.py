@@ -0,0 +1,65 @@
+import asyncio
+import os
+
+import pytest
+
+from utils import downloadHedging, progressReporter
+
+
+def test_advance_reported_counts_overlap_once():
+    primary = downloadHedging.StreamProgress("http://primary/v1/aura.zip")
+    primary.begin(1000, 100)
+    primary.add(200)
+    assert primary.advance_reported(primary.position) == 200
+    # 对冲请求从 250 开始, 追上原请求之前不重复计入
+    assert primary.advance_reported(280) == 0
+    assert primary.advance_reported(450) == 150
+    primary.add(100)
+    assert primary.advance_reported(primary.position) == 0
+    assert primary.reported == 450
+
+
+def test_hedge_reports_bytes_beyond_primary(tmp_path, monkeypatch):
+    web = pytest.importorskip("aiohttp.web")
+    aiohttp = pytest.importorskip("aiohttp")
+    data = os.urandom(300000)
+    (tmp_path / "srv" / "v1").mkdir(parents=True)
+    (tmp_path / "srv" / "v1" / "aura.zip").write_bytes(data)
+    events = []
+    monkeypatch.setattr(progressReporter, "_listeners", [events.append])
+    reporter = progressReporter.ProgressReporter(interval=0)
+    reporter.start("aura.zip", len(data), 0)
+
+    primary = downloadHedging.StreamProgress("http://primary/v1/aura.zip")
+    primary.begin(len(data), 0)
+    primary.add(120000)
+    reporter.add("aura.zip", primary.advance_reported(primary.position))
+
+    async def run():
+        app = web.Application()
+        app.router.add_static("/", tmp_path / "srv")
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{runner.addresses[0][1]}/v1/aura.zip"
+        try:
+            async with aiohttp.ClientSession() as session:
+                return await downloadHedging.fetch_remaining_async(
+                    session,
+                    url,
+                    tmp_path / "aura.zip.hedge",
+                    100000,
+                    len(data),
+                    None,
+                    downloadHedging.StreamProgress(url),
+                    primary,
+                    reporter,
+                    "aura.zip",
+                )
+        finally:
+            await runner.cleanup()
+
+    assert asyncio.run(run())
+    assert (tmp_path / "aura.zip.hedge").read_bytes() == data[100000:]
+    assert events[-1].downloaded == len(data)
@@ -0,0 +1,102 @@
+from utils import downloadJournal, fileDownloader
+
+URL = "https://mirror-a.example/releases/v1.0.0/aura.zip"
+
+
+def make_journal(tmp_path, **kwargs):
+    part_path = tmp_path / "aura.zip"
+    part_path.write_bytes(b"\0" * 100)
+    return downloadJournal.DownloadJournal(part_path, URL, 100, **kwargs)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    journal = make_journal(tmp_path, etag='"abc"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    journal.add_range(0, 9)
+    journal.add_range(50, 59)
+    journal.save()
+
+    loaded = downloadJournal.DownloadJournal.load(journal.part_path)
+    assert loaded is not None
+    assert (loaded.url, loaded.content_length, loaded.etag, loaded.last_modified) == (
+        URL, 100, '"abc"', "Mon, 01 Jan 2024 00:00:00 GMT"
+    )
+    assert loaded.ranges == [[0, 9], [50, 59]]
+    assert loaded.missing_ranges() == [(10, 49), (60, 99)]
+    assert loaded.contiguous_bytes == 10
+
+
+def test_ranges_merge_until_complete(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.add_range(10, 19)
+    assert journal.contiguous_bytes == 0
+    journal.add_range(0, 10)
+    journal.add_range(20, 99)
+    assert journal.ranges == [[0, 99]]
+    assert journal.completed_bytes == 100
+    assert journal.is_complete()
+    assert journal.missing_ranges() == []
+
+
+def test_load_without_part_or_with_corrupt_journal(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.save()
+    journal.journal_path.write_text("{", encoding="utf-8")
+    assert downloadJournal.DownloadJournal.load(journal.part_path) is None
+
+    journal.save()
+    journal.part_path.unlink()
+    assert downloadJournal.DownloadJournal.load(journal.part_path) is None
+
+
+def test_matches_across_mirrors(tmp_path):
+    journal = make_journal(tmp_path, etag='"abc"')
+    assert journal.matches(URL, 100, '"abc"')
+    assert not journal.matches(URL, 100, '"changed"')
+    assert not journal.matches(URL, 101, '"abc"')
+    # 其他下载源只比较 "<tag>/<filename>" 与大小
+    assert journal.matches("https://mirror-b.example/dl/v1.0.0/aura.zip", 100, '"other"')
+    assert not journal.matches("https://mirror-b.example/dl/v1.0.1/aura.zip", 100)
+
+
+def test_resume_request_and_response(tmp_path):
+    journal = make_journal(tmp_path, etag='"abc"')
+    journal.add_range(0, 39)
+
+    headers = fileDownloader._build_download_headers(journal, URL, journal.contiguous_bytes)
+    assert headers["Range"] == "bytes=40-"
+    assert headers["If-Range"] == '"abc"'
+    other = fileDownloader._build_download_headers(
+        journal, "https://mirror-b.example/dl/v1.0.0/aura.zip", 40
+    )
+    assert "If-Range" not in other
+
+    resumed = fileDownloader._resolve_journal(
+        206, {"content-range": "bytes 40-99/100", "etag": '"abc"'},
+        journal, URL, 40, journal.part_path, "aura.zip",
+    )
+    assert resumed == (journal, 100, 40)
+
+    # 返回的起始位置与请求不一致时不能续传
+    assert fileDownloader._resolve_journal(
+        206, {"content-range": "bytes 0-99/100"},
+        journal, URL, 40, journal.part_path, "aura.zip",
+    ) is None
+
+    # 下载源忽略 Range 时从头下载
+    restarted, total_size, start = fileDownloader._resolve_journal(
+        200, {"content-length": "100"}, journal, URL, 40, journal.part_path, "aura.zip"
+    )
+    assert (total_size, start, restarted.ranges) == (100, 0, [])
+
+
+def test_discard_and_finalize(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.save()
+    dest = tmp_path / "out" / "aura.zip"
+    assert downloadJournal.finalize_partial(journal.part_path, dest) == dest
+    assert dest.exists() and not journal.journal_path.exists()
+
+    journal = make_journal(tmp_path)
+    journal.save()
+    downloadJournal.discard_partial(journal.part_path)
+    assert not journal.part_path.exists() and not journal.journal_path.exists()
@@ -0,0 +1,76 @@
+import os
+import zipfile
+
+from utils import incrementalSync
+
+
+def write_zip(path, files):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+
+
+def write_tree(root, files):
+    for name, data in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+
+def read_tree(root):
+    return {
+        path.relative_to(root).as_posix(): path.read_bytes()
+        for path in root.rglob("*")
+        if path.is_file()
+    }
+
+
+OLD = {"a.js": b"a" * 1000, "lib/b.js": b"b" * 2000, "lib/same.bin": b"s" * 3000, "old.js": b"o"}
+NEW = {"a.js": b"a" * 999, "lib/b.js": b"B" * 2000, "lib/same.bin": b"s" * 3000, "lib/new/c.js": b"c"}
+
+
+def test_sync_from_zip_writes_only_changed(tmp_path):
+    write_tree(tmp_path / "installed", OLD)
+    write_zip(tmp_path / "aura.zip", NEW)
+
+    stats = incrementalSync.sync_from_zip(tmp_path / "aura.zip", tmp_path / "installed")
+
+    assert read_tree(tmp_path / "installed") == NEW
+    assert (stats.written_files, stats.skipped_files, stats.deleted_files) == (3, 1, 1)
+    assert stats.skipped_bytes == 3000
+    assert not stats.errors
+
+
+def test_stage_from_zip_links_unchanged_files(tmp_path):
+    installed = tmp_path / "installed"
+    write_tree(installed, OLD)
+    write_zip(tmp_path / "aura.zip", NEW)
+    staging = tmp_path / "staging" / "aura"
+
+    stats = incrementalSync.stage_from_zip(tmp_path / "aura.zip", installed, staging)
+
+    assert (stats.written_files, stats.skipped_files, stats.deleted_files) == (3, 1, 1)
+    assert read_tree(staging) == NEW
+    # 替换前已安装的目录保持不变, 未变化的文件不重新写入
+    assert read_tree(installed) == OLD
+    assert os.path.samefile(staging / "lib" / "same.bin", installed / "lib" / "same.bin")
+
+    incrementalSync.replace_tree(staging, installed)
+    assert read_tree(installed) == NEW
+    assert not staging.exists()
+    assert [path.name for path in tmp_path.iterdir() if path.name.startswith("installed")] == [
+        "installed"
+    ]
+
+
+def test_dry_run_only_counts(tmp_path):
+    write_tree(tmp_path / "installed", OLD)
+    write_zip(tmp_path / "aura.zip", NEW)
+
+    stats = incrementalSync.stage_from_zip(
+        tmp_path / "aura.zip", tmp_path / "installed", tmp_path / "staging", dry_run=True
+    )
+
+    assert stats.written_files == 3
+    assert not (tmp_path / "staging").exists()
+    assert read_tree(tmp_path / "installed") == OLD
@@ -0,0 +1,57 @@
+import pytest
+
+from utils import mainjsPatcher
+from utils.mainjsPatcher import PatchRule, RuleSet
+
+
+def test_apply_replaces_all_anchors_in_one_pass():
+    rule_set = RuleSet(
+        name="test",
+        prepend="// hook\n",
+        rules=(
+            PatchRule("short", "foo", "FOO"),
+            PatchRule("long", "foobar", "BAR", expected=1),
+        ),
+    )
+    content, report = mainjsPatcher.apply("foobar foo foo", rule_set)
+    # 较长的锚点优先匹配
+    assert content == "// hook\nBAR FOO FOO"
+    assert report.counts == {"short": 2, "long": 1}
+    assert not report.problems
+
+
+def test_missing_required_anchor_raises():
+    rule_set = RuleSet(name="test", rules=(PatchRule("missing", "notThere()", "x"),))
+    with pytest.raises(mainjsPatcher.PatchError, match="missing"):
+        mainjsPatcher.apply("app.start();", rule_set)
+
+
+def test_unexpected_count_raises():
+    rule_set = RuleSet(name="test", rules=(PatchRule("once", "a()", "b()", expected=1),))
+    with pytest.raises(mainjsPatcher.PatchError):
+        mainjsPatcher.apply("a(); a();", rule_set)
+
+
+def test_optional_anchor_is_reported_only():
+    rule_set = RuleSet(
+        name="test",
+        rules=(
+            PatchRule("present", "a()", "b()"),
+            PatchRule("optional", "c()", "d()", required=False),
+        ),
+    )
+    content, report = mainjsPatcher.apply("a();", rule_set)
+    assert content == "b();"
+    assert report.counts["optional"] == 0
+    assert len(report.problems) == 1
+
+
+def test_duplicate_anchors_rejected():
+    with pytest.raises(ValueError):
+        RuleSet(name="test", rules=(PatchRule("a", "x", "1"), PatchRule("b", "x", "2")))
+
+
+def test_select_rule_set_by_version():
+    assert mainjsPatcher.parse_version("v1.2.10-beta") == (1, 2, 10)
+    for version in (None, "1.0.0", "99.0.0"):
+        assert mainjsPatcher.select_rule_set(version).applies_to(version)
@@ -0,0 +1,81 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+from config import config
+from utils import offlineBundle
+
+
+def make_bundle(tmp_path):
+    files = {}
+    for name in offlineBundle.RESOURCE_FILENAMES:
+        files[name] = tmp_path / name
+        with zipfile.ZipFile(files[name], "w") as zf:
+            zf.writestr(f"{name}.txt", os.urandom(1000))
+    bundle_path = tmp_path / "HugoAura.bundle"
+    assert offlineBundle.write_bundle(bundle_path, "v1.0.0", files, {"versions": ["v1.0.0"]})
+    return bundle_path, files
+
+
+def rewrite_without(bundle_path, member):
+    output = bundle_path.with_name("broken.bundle")
+    with zipfile.ZipFile(bundle_path) as src, zipfile.ZipFile(output, "w") as dst:
+        for info in src.infolist():
+            if info.filename != member:
+                dst.writestr(info, src.read(info))
+    return output
+
+
+def test_bundle_round_trip(tmp_path):
+    bundle_path, files = make_bundle(tmp_path)
+
+    with offlineBundle.OfflineBundle(bundle_path) as bundle:
+        assert bundle.tag == "v1.0.0"
+        assert bundle.catalog() == {"versions": ["v1.0.0"]}
+        assert bundle.verify()
+        for name, path in files.items():
+            with bundle.open_member(name) as member:
+                assert member.read() == path.read_bytes()
+        assert bundle.extract(config.CORE_FILENAME, tmp_path / "core")
+    assert (tmp_path / "core" / f"{config.CORE_FILENAME}.txt").is_file()
+
+
+@pytest.mark.parametrize(
+    "member", [config.BUNDLE_INFO_NAME, config.RELEASE_DIGEST_MANIFEST, config.BUNDLE_CATALOG_NAME]
+)
+def test_missing_member_raises_bundle_error(tmp_path, monkeypatch, member):
+    bundle_path, _ = make_bundle(tmp_path)
+    broken = rewrite_without(bundle_path, member)
+
+    opened = []
+
+    class TrackedZipFile(zipfile.ZipFile):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+
+    monkeypatch.setattr(offlineBundle.zipfile, "ZipFile", TrackedZipFile)
+
+    with pytest.raises(offlineBundle.BundleError):
+        offlineBundle.OfflineBundle(broken)
+    # 打开失败时不应继续占用安装包文件
+    assert opened and all(zf.fp is None for zf in opened)
+
+
+def test_invalid_info_raises_bundle_error(tmp_path):
+    bundle_path, _ = make_bundle(tmp_path)
+    broken = rewrite_without(bundle_path, config.BUNDLE_INFO_NAME)
+    with zipfile.ZipFile(broken, "a") as zf:
+        zf.writestr(config.BUNDLE_INFO_NAME, json.dumps(["not", "a", "dict"]))
+
+    with pytest.raises(offlineBundle.BundleError):
+        offlineBundle.OfflineBundle(broken)
+
+
+def test_not_a_zip_raises_bundle_error(tmp_path):
+    path = tmp_path / "bad.bundle"
+    path.write_bytes(b"garbage")
+    with pytest.raises(offlineBundle.BundleError):
+        offlineBundle.OfflineBundle(path)
@@ -0,0 +1,83 @@
+import io
+import os
+import zipfile
+
+from config import config
+from utils import streamingUnzip
+
+
+def extract(tmp_path, zip_path):
+    extractor = streamingUnzip.StreamingExtractor(tmp_path / "missing.part", tmp_path / "out")
+    # 下载已完成: 直接从完整的文件流式解压, 再核对中央目录
+    extractor.finish(zip_path)
+    extractor.start()
+    return extractor.wait()
+
+
+def test_stream_extracts_all_entries(tmp_path):
+    files = {"aura/a.js": b"a" * 100000, "aura/b.bin": os.urandom(5000), "aura/empty": b""}
+    zip_path = tmp_path / "aura.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+
+    assert extract(tmp_path, zip_path)
+    for name, data in files.items():
+        assert (tmp_path / "out" / name).read_bytes() == data
+
+
+class UnseekableBuffer(io.BytesIO):
+    def seek(self, *args):
+        raise OSError("不可回退")
+
+    def tell(self):
+        raise OSError("不可回退")
+
+
+def write_streamed_zip(path, name, data):
+    # 写入不可回退的流时 zipfile 以数据描述符记录大小
+    buffer = UnseekableBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        with zf.open(name, "w") as f:
+            f.write(data)
+    path.write_bytes(buffer.getvalue())
+    with zipfile.ZipFile(path) as zf:
+        assert zf.getinfo(name).flag_bits & streamingUnzip.FLAG_DATA_DESCRIPTOR
+
+
+def test_stream_extracts_data_descriptor_entries(tmp_path):
+    data = os.urandom(100000) * 3
+    write_streamed_zip(tmp_path / "aura.zip", "aura/a.js", data)
+
+    assert extract(tmp_path, tmp_path / "aura.zip")
+    assert (tmp_path / "out" / "aura" / "a.js").read_bytes() == data
+
+
+def test_stream_rejects_high_ratio_entry(tmp_path):
+    zip_path = tmp_path / "bomb.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("zeros.bin", b"\0" * (8 * 1024 * 1024))
+
+    assert not extract(tmp_path, zip_path)
+    # 条目开始时即被拒绝, 不会写出
+    assert not (tmp_path / "out" / "zeros.bin").exists()
+
+
+def test_stream_rejects_high_ratio_data_descriptor_entry(tmp_path):
+    write_streamed_zip(tmp_path / "bomb.zip", "zeros.bin", b"\0" * (64 * 1024 * 1024))
+
+    assert not extract(tmp_path, tmp_path / "bomb.zip")
+    # 大小未知的条目在写出量超过已读取压缩数据的 EXTRACT_MAX_RATIO 倍时停止
+    limit = (tmp_path / "bomb.zip").stat().st_size * config.EXTRACT_MAX_RATIO
+    assert (tmp_path / "out" / "zeros.bin").stat().st_size <= limit
+
+
+def test_stream_rejects_oversized_total(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "EXTRACT_MAX_TOTAL_BYTES", 150000)
+    zip_path = tmp_path / "aura.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr("a.bin", os.urandom(100000))
+        zf.writestr("b.bin", os.urandom(100000))
+
+    assert not extract(tmp_path, zip_path)
+    assert not (tmp_path / "out" / "b.bin").exists()